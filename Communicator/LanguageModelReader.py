@@ -0,0 +1,227 @@
+"""
+Reader for the Communicator (SwiftKey "Fluency") dynamic language model, Prediction/dynamic.lm.
+
+The file is a tree of chunks. Every chunk is
+
+	tag        4 ASCII bytes, e.g. b'flue'
+	size       uint32, the bytes that follow (up to and including the closing tag)
+	hlen       uint32, then hlen bytes of protobuf header, then the tag again
+	payload    child chunks, or the chunk's own data
+	tag        the tag once more
+
+The file is one 'flue' chunk holding a 'voca' (vocabulary) and a 'dmap'
+(n-gram map) chunk. The 'voca' payload is
+
+	uint32 n, then n bytes of term text (all terms back to back)
+	uint32 t, then t bytes: each term's length (term 0 is empty)
+	uint32 (always 0 so far)
+	uint32 e, then e entries of (uint32 slot, uint32 count, uint16 term id)
+	0xFF padding up to the closing tag
+
+The term text is obfuscated, so terms come back as raw bytes; their lengths
+and counts are plain. Only chunk headers are read while walking the file, and
+the vocabulary is read into arrays when first asked for.
+
+	python LanguageModelReader.py Prediction/dynamic.lm --output vocabulary.csv
+"""
+import argparse
+import csv
+import os
+import struct
+from array import array
+from collections import namedtuple
+from itertools import accumulate
+
+CHUNK_HEAD = struct.Struct('<4sI')
+UINT32 = struct.Struct('<I')
+VOCABULARY_ENTRY = struct.Struct('<IIH')
+
+# Chunks whose payload is more chunks
+CONTAINER_TAGS = {b'flue'}
+
+Chunk = namedtuple('Chunk', ['tag', 'offset', 'end', 'header', 'payload_start', 'payload_end'])
+
+
+def parse_header_fields(header):
+	"""
+	Top-level fields of a chunk's protobuf header.
+
+	:return: Dictionary of field number to value (int for varints, bytes otherwise).
+	"""
+	fields = {}
+	position = 0
+	while position < len(header):
+		key, position = read_varint(header, position)
+		field, wire_type = key >> 3, key & 7
+		if wire_type == 0:
+			value, position = read_varint(header, position)
+		elif wire_type == 2:
+			length, position = read_varint(header, position)
+			value = header[position:position + length]
+			position += length
+		elif wire_type == 5:
+			value = header[position:position + 4]
+			position += 4
+		elif wire_type == 1:
+			value = header[position:position + 8]
+			position += 8
+		else:
+			break
+		fields[field] = value
+	return fields
+
+
+def read_varint(data, position):
+	value = shift = 0
+	while position < len(data):
+		byte = data[position]
+		position += 1
+		value |= (byte & 0x7F) << shift
+		shift += 7
+		if not byte & 0x80:
+			break
+	return value, position
+
+
+class LanguageModelFile:
+	"""An open dynamic.lm file; chunks and the vocabulary are read on demand."""
+
+	def __init__(self, file_path):
+		self.file_path = file_path
+		self.file = open(file_path, 'rb')
+		self.size = os.fstat(self.file.fileno()).st_size
+		self._vocabulary = None
+
+	def close(self):
+		self.file.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def read_at(self, offset, length):
+		self.file.seek(offset)
+		data = self.file.read(length)
+		if len(data) != length:
+			raise ValueError(f"{self.file_path}: unexpected end of file at {offset}")
+		return data
+
+	def read_chunk(self, offset):
+		"""The Chunk starting at ``offset``; reads only its tag, size and header."""
+		tag, size = CHUNK_HEAD.unpack(self.read_at(offset, CHUNK_HEAD.size))
+		end = offset + CHUNK_HEAD.size + size
+		if end > self.size:
+			raise ValueError(f"{self.file_path}: chunk {tag!r} at {offset} runs past the end of the file")
+		header_length, = UINT32.unpack(self.read_at(offset + CHUNK_HEAD.size, UINT32.size))
+		header_start = offset + CHUNK_HEAD.size + UINT32.size
+		header_and_tag = self.read_at(header_start, header_length + 4)
+		if header_and_tag[-4:] != tag or self.read_at(end - 4, 4) != tag:
+			raise ValueError(f"{self.file_path}: chunk {tag!r} at {offset} is not closed by its tag")
+		return Chunk(tag, offset, end, header_and_tag[:-4], header_start + header_length + 4, end - 4)
+
+	def chunks(self, parent=None):
+		"""Yield the chunks at the top of the file, or inside ``parent``."""
+		position, end = (0, self.size) if parent is None else (parent.payload_start, parent.payload_end)
+		while position + CHUNK_HEAD.size <= end:
+			chunk = self.read_chunk(position)
+			yield chunk
+			position = chunk.end
+
+	def walk(self, parent=None, depth=0):
+		"""Yield (depth, chunk) for every chunk, depth first."""
+		for chunk in self.chunks(parent):
+			yield depth, chunk
+			if chunk.tag in CONTAINER_TAGS:
+				yield from self.walk(chunk, depth + 1)
+
+	def find(self, tag):
+		"""The first chunk with the given tag (e.g. b'voca'), or None."""
+		for _, chunk in self.walk():
+			if chunk.tag == tag:
+				return chunk
+		return None
+
+	@property
+	def vocabulary(self):
+		if self._vocabulary is None:
+			chunk = self.find(b'voca')
+			if chunk is None:
+				raise ValueError(f"{self.file_path}: no vocabulary chunk")
+			self._vocabulary = Vocabulary(self, chunk)
+		return self._vocabulary
+
+
+class Vocabulary:
+	"""The terms of a 'voca' chunk: lengths and counts in arrays, term bytes read when asked for."""
+
+	def __init__(self, model, chunk):
+		self.model = model
+		position = chunk.payload_start
+		text_length, = UINT32.unpack(model.read_at(position, 4))
+		self.text_start = position + 4
+		position = self.text_start + text_length
+
+		term_count, = UINT32.unpack(model.read_at(position, 4))
+		self.lengths = array('B', model.read_at(position + 4, term_count))
+		position += 4 + term_count + 4  # skip the reserved uint32
+		self.offsets = array('I', accumulate(self.lengths, initial=0))
+		if self.offsets[-1] != text_length:
+			raise ValueError(f"{model.file_path}: term lengths don't add up to the term text")
+
+		entry_count, = UINT32.unpack(model.read_at(position, 4))
+		entries = model.read_at(position + 4, entry_count * VOCABULARY_ENTRY.size)
+		if position + 4 + len(entries) > chunk.payload_end:
+			raise ValueError(f"{model.file_path}: vocabulary entries run past the chunk")
+		self.slots = array('I')
+		self.counts = array('I', bytes(4 * term_count))
+		self.term_ids = array('H')
+		for slot, count, term_id in VOCABULARY_ENTRY.iter_unpack(entries):
+			self.slots.append(slot)
+			self.term_ids.append(term_id)
+			if term_id < term_count:
+				self.counts[term_id] = count
+
+	def __len__(self):
+		return len(self.lengths)
+
+	def term_bytes(self, term_id):
+		"""The (obfuscated) bytes of one term."""
+		start, end = self.offsets[term_id], self.offsets[term_id + 1]
+		return self.model.read_at(self.text_start + start, end - start)
+
+	def items(self):
+		"""Yield (term id, term bytes, count) for every non-empty term, reading the term text in one go."""
+		text = self.model.read_at(self.text_start, self.offsets[-1])
+		for term_id, length in enumerate(self.lengths):
+			if length:
+				start = self.offsets[term_id]
+				yield term_id, text[start:start + length], self.counts[term_id]
+
+
+def main():
+	parser = argparse.ArgumentParser(description='List the chunks and vocabulary of a Communicator dynamic.lm file.')
+	parser.add_argument('file', help='dynamic.lm file')
+	parser.add_argument('--output', type=str, help='CSV file to write the vocabulary to', default=None)
+	args = parser.parse_args()
+
+	with LanguageModelFile(args.file) as model:
+		for depth, chunk in model.walk():
+			descriptions = [value.decode('ascii') for value in parse_header_fields(chunk.header).values() if isinstance(value, bytes) and value.isascii() and value.decode('ascii').isprintable()]
+			print(f"{'  ' * depth}{chunk.tag.decode('ascii', 'replace')} at {chunk.offset}, {chunk.end - chunk.offset} bytes {' / '.join(descriptions)}")
+
+		vocabulary = model.vocabulary
+		rows = [{'Term Id': term_id, 'Length': len(term), 'Count': count, 'Term Bytes': term.hex()} for term_id, term, count in vocabulary.items()]
+		print(f"{len(rows)} terms, {sum(vocabulary.counts)} occurrences")
+		if args.output:
+			with open(args.output, mode='w', newline='', encoding='utf-8') as file:
+				writer = csv.DictWriter(file, fieldnames=['Term Id', 'Length', 'Count', 'Term Bytes'])
+				writer.writeheader()
+				writer.writerows(rows)
+		else:
+			for row in rows:
+				print(f"{row['Term Id']}\t{row['Length']}\t{row['Count']}\t{row['Term Bytes']}")
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,156 @@
+"""
+Reader for TobiiDynavox Communicator phrase files (.phr), e.g. "Speech history.phr".
+
+A .phr file is a 12-byte header of three little-endian uint32s (format
+version 2, a flag, and the number of phrases) followed by one record per
+phrase:
+
+	FF FE FF   Unicode string marker
+	length     characters, as a byte; FF means a uint16 follows, FFFF a uint32
+	text       UTF-16LE
+	value      uint32 (1000000 in speech history, 0 in the stock phrase lists)
+
+Large files are memory-mapped (small ones are read in one call) and walked
+once through a memoryview: each record's text is decoded straight from the
+buffer, and if a record doesn't start where the previous one ended the reader
+skips ahead to the next marker.
+
+	python PhraseReader.py "Phrases/" --output phrases.csv
+"""
+import argparse
+import codecs
+import csv
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+PHRASE_MARKER = b'\xff\xfe\xff'
+HEADER = struct.Struct('<III')
+UINT16 = struct.Struct('<H')
+UINT32 = struct.Struct('<I')
+MARKER_VALUE = UINT32.unpack(PHRASE_MARKER + b'\0')[0]
+
+# Smaller files are read in one call; mapping them costs more than it saves
+MMAP_THRESHOLD = 64 * 1024
+
+PhraseRecord = namedtuple('PhraseRecord', ['text', 'value', 'offset'])
+
+
+def iter_phrases(buffer):
+	"""
+	Yield a PhraseRecord for every phrase in the bytes of a .phr file.
+
+	:param buffer: Any bytes-like object (bytes, mmap, memoryview).
+	"""
+	searchable = buffer if hasattr(buffer, 'find') else bytes(buffer)
+	with memoryview(buffer) as view:
+		size = len(view)
+		if size < HEADER.size:
+			return
+		unpack_uint32 = UINT32.unpack_from
+		decode = codecs.utf_16_le_decode
+		position = HEADER.size
+		while position + 4 <= size:
+			# The marker and the length byte, read as one little-endian uint32
+			marker, = unpack_uint32(view, position)
+			if marker & 0xFFFFFF != MARKER_VALUE:
+				# Not where the last record ended: resynchronise on the next marker
+				position = searchable.find(PHRASE_MARKER, position + 1)
+				if position < 0 or position + 4 > size:
+					return
+				marker, = unpack_uint32(view, position)
+			offset = position
+			length = marker >> 24
+			position += 4
+			if length == 0xFF:
+				if position + 2 > size:
+					return
+				length, = UINT16.unpack_from(view, position)
+				position += 2
+				if length == 0xFFFF:
+					if position + 4 > size:
+						return
+					length, = unpack_uint32(view, position)
+					position += 4
+			end = position + 2 * length
+			if end + 4 > size:
+				return
+			value, = unpack_uint32(view, end)
+			yield PhraseRecord(decode(view[position:end])[0], value, offset)
+			position = end + 4
+
+
+def read_header(file_path):
+	"""Return (version, flag, phrase count) from a .phr header."""
+	with open(file_path, 'rb') as f:
+		return HEADER.unpack(f.read(HEADER.size))
+
+
+def read_phr(file_path):
+	"""Yield the PhraseRecords of one .phr file, reading it through a memory map if it's large."""
+	with open(file_path, 'rb') as f:
+		size = os.fstat(f.fileno()).st_size
+		if size < MMAP_THRESHOLD:
+			yield from iter_phrases(f.read())
+			return
+		with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+			yield from iter_phrases(mapped)
+
+
+def find_phrase_files(paths):
+	"""Expand files and directories (searched recursively) into a sorted list of .phr files."""
+	found = []
+	for path in paths:
+		if os.path.isdir(path):
+			for root, _, files in os.walk(path):
+				found.extend(os.path.join(root, name) for name in files if name.lower().endswith('.phr'))
+		else:
+			found.append(path)
+	return sorted(found)
+
+
+def build_corpus(file_paths):
+	"""
+	Read many .phr files into one corpus.
+
+	:return: List of dictionaries with the source file, its phrase list name, the phrase and its value.
+	"""
+	corpus = []
+	for file_path in file_paths:
+		phrase_list = os.path.splitext(os.path.basename(file_path))[0]
+		for record in read_phr(file_path):
+			corpus.append({'File': file_path, 'Phrase List': phrase_list, 'Phrase': record.text, 'Value': record.value})
+	return corpus
+
+
+def save_to_csv(data, filename):
+	with open(filename, mode='w', newline='', encoding='utf-8') as file:
+		writer = csv.DictWriter(file, fieldnames=['File', 'Phrase List', 'Phrase', 'Value'])
+		writer.writeheader()
+		for row in data:
+			writer.writerow(row)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Extract the phrases from TobiiDynavox Communicator .phr files.')
+	parser.add_argument('paths', nargs='+', help='.phr files, or directories to search for them')
+	parser.add_argument('--output', type=str, help='CSV file to write the phrases to', default=None)
+	args = parser.parse_args()
+
+	start = time.perf_counter()
+	file_paths = find_phrase_files(args.paths)
+	corpus = build_corpus(file_paths)
+	elapsed = time.perf_counter() - start
+	print(f"Read {len(corpus)} phrases from {len(file_paths)} files in {elapsed * 1000:.1f} ms", file=sys.stderr)
+
+	if args.output:
+		save_to_csv(corpus, args.output)
+	else:
+		for row in corpus:
+			print(f"{row['Phrase List']}\t{row['Phrase']}")
+
+if __name__ == "__main__":
+	main()
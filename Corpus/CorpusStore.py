@@ -0,0 +1,333 @@
+"""
+One SQLite corpus for the message histories collected from every AAC source in this repo.
+
+	sources     id, name                      ('grid3', 'communicator', 'nuvoice', ...)
+	users       id, name
+	texts       id, text                      every distinct message stored once
+	utterances  id, user_id, source_id, time, text_id, selections, corrections, core
+
+Times are epoch seconds (NULL when a source has none, e.g. phrase lists);
+sources that log the device's local clock are stored as if it were UTC, like
+their readers do. core is 0 for messages with obfuscated non-core words
+(CoughDrop .obla).
+
+Each source has an adapter that turns its files into CorpusRecords using the
+reader in that source's folder. Ingestion runs in one transaction, interns
+texts in memory and inserts in batches with executemany, so each statement is
+prepared once. Utterances are indexed by (user, time), (source, time) and time.
+
+	python CorpusStore.py corpus.db ingest nuvoice ../LAM-example.txt --user alice
+	python CorpusStore.py corpus.db ingest speakforyourself ../SpeakForYourself/HistoryData.csv --user bob
+	python CorpusStore.py corpus.db query --user alice --start 2021-05-01 --top 20
+"""
+import argparse
+import calendar
+import csv
+import datetime
+import importlib.util
+import os
+import sqlite3
+import sys
+import time
+from collections import namedtuple
+from itertools import islice
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Reader modules loaded by load_reader, by (folder, module name)
+READERS = {}
+
+CorpusRecord = namedtuple('CorpusRecord', ['time', 'text', 'selections', 'corrections', 'core'])
+
+# Rows per executemany() call during ingestion
+INSERT_BATCH_SIZE = 10000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS users (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS texts (id INTEGER PRIMARY KEY, text TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS utterances (
+	id INTEGER PRIMARY KEY,
+	user_id INTEGER NOT NULL REFERENCES users(id),
+	source_id INTEGER NOT NULL REFERENCES sources(id),
+	time REAL,
+	text_id INTEGER NOT NULL REFERENCES texts(id),
+	selections INTEGER,
+	corrections INTEGER,
+	core INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS utterances_user_time ON utterances(user_id, time);
+CREATE INDEX IF NOT EXISTS utterances_source_time ON utterances(source_id, time);
+CREATE INDEX IF NOT EXISTS utterances_time ON utterances(time);
+"""
+
+
+def load_reader(folder, name):
+	"""
+	Import a reader module from one of the repo's source folders by file path.
+
+	The folders aren't packages, and loading by path keeps them off sys.path,
+	where same-named modules in different folders could shadow each other.
+	"""
+	key = (folder, name)
+	if key not in READERS:
+		spec = importlib.util.spec_from_file_location(f"{folder}_{name}", os.path.join(REPO_ROOT, folder, f"{name}.py"))
+		module = importlib.util.module_from_spec(spec)
+		spec.loader.exec_module(module)
+		READERS[key] = module
+	return READERS[key]
+
+
+def grid3_records(file_paths):
+	"""Grid 3 history.sqlite: every spoken phrase with its time."""
+	read_history = load_reader('Grid3', 'HistoryExtractor').read_history
+	for file_path in file_paths:
+		for row in read_history(file_path):
+			yield CorpusRecord(row.time, row.text, None, None, True)
+
+
+def communicator_records(file_paths):
+	"""Communicator .phr phrase lists (files or folders); phrases have no times."""
+	reader = load_reader('Communicator', 'PhraseReader')
+	for file_path in reader.find_phrase_files(file_paths):
+		for record in reader.read_phr(file_path):
+			yield CorpusRecord(None, record.text, None, None, True)
+
+
+def nuvoice_records(file_paths):
+	"""NuVoice LAM logs, rebuilt into messages."""
+	reader = load_reader('NuVoice', 'LAMParser')
+	for utterance in reader.reconstruct_utterances(reader.iter_events(file_paths)):
+		yield CorpusRecord(utterance.start, utterance.text, utterance.selections, utterance.corrections, True)
+
+
+def speakforyourself_records(file_paths):
+	"""Speak for Yourself history exports: spoken and cleared messages, with the words selected for each."""
+	columns = load_reader('SpeakForYourself', 'HistoryImporter').read_history(file_paths)
+	selections = 0
+	for event in columns.events():
+		if event.operation in ('Selected word', 'Selected QWERTY'):
+			selections += 1
+		elif event.operation in ('Spoke message', 'Deleted message') and event.word:
+			yield CorpusRecord(event.time, event.word, selections, 0, True)
+			selections = 0
+
+
+def coughdrop_records(file_paths):
+	"""CoughDrop .obl/.obla logs, rebuilt into messages; obfuscated ones are kept with core=False."""
+	reader = load_reader('CoughDrop', 'OBLReader')
+	for utterance in reader.reconstruct_utterances(reader.iter_events(file_paths)):
+		yield CorpusRecord(utterance.start, utterance.text, utterance.selections, utterance.corrections, utterance.core)
+
+
+ADAPTERS = {
+	'grid3': grid3_records,
+	'communicator': communicator_records,
+	'nuvoice': nuvoice_records,
+	'speakforyourself': speakforyourself_records,
+	'coughdrop': coughdrop_records,
+}
+
+
+class CorpusStore:
+	"""A corpus database: bulk ingestion of CorpusRecords and indexed queries."""
+
+	def __init__(self, file_path):
+		self.connection = sqlite3.connect(file_path)
+		self.connection.execute("PRAGMA journal_mode=WAL")
+		self.connection.execute("PRAGMA synchronous=NORMAL")
+		self.connection.execute("PRAGMA cache_size=-65536")  # 64 MB, so the indexes stay in memory during big loads
+		self.connection.executescript(SCHEMA)
+		self.text_ids = None
+		self.last_text_id = 0
+
+	def close(self):
+		self.connection.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+	def name_id(self, table, name):
+		"""The id of a source or user, adding it if it's new."""
+		self.connection.execute(f"INSERT OR IGNORE INTO {table} (name) VALUES (?)", (name,))
+		return self.connection.execute(f"SELECT id FROM {table} WHERE name = ?", (name,)).fetchone()[0]
+
+	def ingest(self, source, user, records, batch_size=INSERT_BATCH_SIZE, replace=False):
+		"""
+		Add records from one source for one user, in a single transaction.
+
+		:param records: Iterable of CorpusRecord; consumed in batches, so it can be a generator over huge files.
+		:param replace: Remove the user's existing utterances from the source in the same transaction first,
+			so they are only lost if the new ones are stored.
+		:return: Number of utterances added.
+		"""
+		try:
+			return self.insert_records(source, user, records, batch_size, replace)
+		except BaseException:
+			# Texts interned during a rolled-back ingest were never stored
+			self.text_ids = None
+			raise
+
+	def insert_records(self, source, user, records, batch_size, replace=False):
+		connection = self.connection
+		count = 0
+		with connection:
+			connection.execute("BEGIN IMMEDIATE")
+			if replace:
+				self.delete_utterances(source, user)
+			if self.text_ids is None:
+				self.text_ids = {}
+				self.last_text_id = 0
+			# Pick up texts added since the last ingest (all of them the first time, or any another writer added)
+			text_ids = self.text_ids
+			for text_id, text in connection.execute("SELECT id, text FROM texts WHERE id > ?", (self.last_text_id,)):
+				text_ids[text] = text_id
+				self.last_text_id = max(self.last_text_id, text_id)
+			next_text_id = self.last_text_id + 1
+			source_id = self.name_id('sources', source)
+			user_id = self.name_id('users', user)
+			records = iter(records)
+			while True:
+				batch = list(islice(records, batch_size))
+				if not batch:
+					break
+				new_texts = []
+				rows = []
+				for record in batch:
+					text = record.text
+					text_id = text_ids.get(text)
+					if text_id is None:
+						text_id = text_ids[text] = next_text_id
+						next_text_id += 1
+						new_texts.append((text_id, text))
+					rows.append((user_id, source_id, record.time, text_id, record.selections, record.corrections, int(record.core)))
+				connection.executemany("INSERT INTO texts (id, text) VALUES (?, ?)", new_texts)
+				connection.executemany(
+					"INSERT INTO utterances (user_id, source_id, time, text_id, selections, corrections, core) VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+				count += len(rows)
+				self.last_text_id = next_text_id - 1
+		return count
+
+	def clear(self, source=None, user=None):
+		"""Remove the utterances of a source and/or user (to re-ingest their files, use ingest's replace instead)."""
+		with self.connection:
+			return self.delete_utterances(source, user)
+
+	def delete_utterances(self, source=None, user=None):
+		"""Delete the utterances of a source and/or user, and any texts no longer used, in the current transaction."""
+		where, parameters = self.filters(source, user)
+		count = self.connection.execute(f"DELETE FROM utterances WHERE id IN (SELECT utterances.id {self.FROM} {where})", parameters).rowcount
+		self.connection.execute("DELETE FROM texts WHERE id NOT IN (SELECT text_id FROM utterances)")
+		# Deleted texts may still be interned; reload them on the next ingest
+		self.text_ids = None
+		return count
+
+	FROM = "FROM utterances JOIN users ON users.id = utterances.user_id JOIN sources ON sources.id = utterances.source_id"
+
+	@staticmethod
+	def filters(source=None, user=None, start=None, end=None, core_only=False):
+		clauses, parameters = [], []
+		if user is not None:
+			clauses.append("users.name = ?")
+			parameters.append(user)
+		if source is not None:
+			clauses.append("sources.name = ?")
+			parameters.append(source)
+		if start is not None:
+			clauses.append("utterances.time >= ?")
+			parameters.append(start)
+		if end is not None:
+			clauses.append("utterances.time < ?")
+			parameters.append(end)
+		if core_only:
+			clauses.append("utterances.core = 1")
+		return ("WHERE " + " AND ".join(clauses)) if clauses else "", parameters
+
+	def utterances(self, source=None, user=None, start=None, end=None, core_only=False):
+		"""Yield (user, source, time, text, selections, corrections, core) rows in time order."""
+		where, parameters = self.filters(source, user, start, end, core_only)
+		cursor = self.connection.execute(
+			f"SELECT users.name, sources.name, utterances.time, texts.text, utterances.selections, utterances.corrections, utterances.core "
+			f"{self.FROM} JOIN texts ON texts.id = utterances.text_id {where} ORDER BY utterances.time", parameters)
+		while True:
+			rows = cursor.fetchmany(INSERT_BATCH_SIZE)
+			if not rows:
+				return
+			yield from rows
+
+	def text_counts(self, source=None, user=None, start=None, end=None, core_only=False, limit=None):
+		"""The most used messages: list of (text, count)."""
+		where, parameters = self.filters(source, user, start, end, core_only)
+		query = (
+			f"SELECT texts.text, counts.uses FROM (SELECT utterances.text_id, COUNT(*) AS uses {self.FROM} {where} GROUP BY utterances.text_id) AS counts "
+			f"JOIN texts ON texts.id = counts.text_id ORDER BY counts.uses DESC")
+		if limit:
+			query += f" LIMIT {int(limit)}"
+		return self.connection.execute(query, parameters).fetchall()
+
+	def summary(self):
+		"""Utterance counts and time span per user and source."""
+		return self.connection.execute(
+			f"SELECT users.name, sources.name, COUNT(*), MIN(utterances.time), MAX(utterances.time) {self.FROM} "
+			f"GROUP BY utterances.user_id, utterances.source_id ORDER BY users.name, sources.name").fetchall()
+
+
+def parse_date_argument(text):
+	"""Epoch seconds for an ISO date or date-time given on the command line."""
+	if text is None:
+		return None
+	return calendar.timegm(datetime.datetime.fromisoformat(text).timetuple())
+
+
+def format_time(seconds):
+	if seconds is None:
+		return ''
+	return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Collect AAC message histories into one SQLite corpus and query it.')
+	parser.add_argument('database', help='Corpus database file (created if missing)')
+	commands = parser.add_subparsers(dest='command', required=True)
+
+	ingest = commands.add_parser('ingest', help='Add files from one source')
+	ingest.add_argument('source', choices=sorted(ADAPTERS), help='Where the files come from')
+	ingest.add_argument('files', nargs='+', help='Files (or folders, for phrase lists) to add')
+	ingest.add_argument('--user', type=str, default='default', help='User the history belongs to')
+	ingest.add_argument('--replace', action='store_true', help="Replace this user's existing utterances from this source (in the same transaction as the new ones)")
+
+	query = commands.add_parser('query', help='Summarise or export utterances')
+	query.add_argument('--user', type=str, default=None)
+	query.add_argument('--source', choices=sorted(ADAPTERS), default=None)
+	query.add_argument('--start', type=str, default=None, help='From this date/time on (e.g. 2021-05-01)')
+	query.add_argument('--end', type=str, default=None, help='Before this date/time')
+	query.add_argument('--core-only', action='store_true', help='Leave out messages with obfuscated words')
+	query.add_argument('--top', type=int, default=20, help='Number of most used messages to list')
+	query.add_argument('--output', type=str, default=None, help='CSV file to export the matching utterances to')
+	args = parser.parse_args()
+
+	with CorpusStore(args.database) as store:
+		if args.command == 'ingest':
+			started = time.perf_counter()
+			count = store.ingest(args.source, args.user, ADAPTERS[args.source](args.files), replace=args.replace)
+			print(f"Added {count} utterances from {args.source} for {args.user} in {time.perf_counter() - started:.2f} s", file=sys.stderr)
+			return
+
+		start, end = parse_date_argument(args.start), parse_date_argument(args.end)
+		for user, source, count, first, last in store.summary():
+			print(f"{user}\t{source}\t{count} utterances\t{format_time(first)} - {format_time(last)}")
+		started = time.perf_counter()
+		top = store.text_counts(args.source, args.user, start, end, args.core_only, args.top)
+		print(f"Most used ({(time.perf_counter() - started) * 1000:.1f} ms): {top}")
+		if args.output:
+			with open(args.output, mode='w', newline='', encoding='utf-8') as file:
+				writer = csv.writer(file)
+				writer.writerow(['User', 'Source', 'Time', 'Utterance', 'Selections', 'Corrections', 'Core'])
+				for user, source, seconds, text, selections, corrections, core in store.utterances(args.source, args.user, start, end, args.core_only):
+					writer.writerow([user, source, format_time(seconds), text, selections, corrections, bool(core)])
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,291 @@
+"""
+Read CoughDrop / Open Board Logs (.obl, and anonymised .obla) into events and utterances.
+
+An OBL file is one JSON document (https://www.openboardformat.org/logs):
+
+	{"format": "open-board-log-0.1", "sessions": [
+		{"id": "...", "events": [
+			{"type": "button", "timestamp": "2021-06-22T08:54:03.000Z", "label": "want", "board_id": "1_2", "button_id": "4"},
+			{"type": "action", "action": ":backspace", ...},
+			{"type": "utterance", "text": "I want drink", ...}
+		]}
+	]}
+
+Exports can be very large, so the document isn't loaded whole: OBLStream reads
+the file in blocks and decodes one event object at a time, holding only the
+current event in memory. In .obla files the labels of words that aren't core
+for the user are replaced with gibberish, so their events and any utterance
+built from them are marked core=False (buttons flagged core_word: true keep
+core=True).
+
+Events and utterances have the same fields as the NuVoice LAM reader
+(NuVoice/LAMParser.py), so both can go into one corpus, plus the core flag.
+"""
+import argparse
+import csv
+import datetime
+import json
+import sys
+from collections import namedtuple
+
+# code is the OBL event type (button, action, utterance, note...); location is "board_id/button_id" for buttons
+LogEvent = namedtuple('LogEvent', ['time', 'code', 'location', 'label', 'text', 'core'])
+Utterance = namedtuple('Utterance', ['start', 'end', 'text', 'selections', 'corrections', 'core'])
+
+BLOCK_SIZE = 1 << 16
+WHITESPACE = ' \t\n\r'
+CLEAR_ACTIONS = {':clear'}
+DELETE_ACTIONS = {':backspace'}
+
+
+class OBLStream:
+	"""
+	An incremental JSON reader over a text file: values are decoded one at a
+	time from a buffer that's refilled as needed, so arrays of any length can be
+	walked element by element.
+	"""
+
+	def __init__(self, file, block_size=BLOCK_SIZE):
+		self.file = file
+		self.block_size = block_size
+		self.buffer = ''
+		self.position = 0
+		self.at_end = False
+		self.decoder = json.JSONDecoder()
+
+	def fill(self):
+		"""Read another block; False at end of file."""
+		if self.at_end:
+			return False
+		block = self.file.read(self.block_size)
+		if not block:
+			self.at_end = True
+			return False
+		# Drop what has been consumed before growing the buffer
+		self.buffer = self.buffer[self.position:] + block
+		self.position = 0
+		return True
+
+	def peek(self):
+		"""The next non-whitespace character ('' at end of file), without consuming it."""
+		while True:
+			while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+				self.position += 1
+			if self.position < len(self.buffer):
+				return self.buffer[self.position]
+			if not self.fill():
+				return ''
+
+	def expect(self, characters):
+		character = self.peek()
+		if not character or character not in characters:
+			raise ValueError(f"Expected one of {characters!r} in OBL data, found {character!r}")
+		self.position += 1
+		return character
+
+	def value(self):
+		"""Decode the next complete JSON value."""
+		self.peek()
+		while True:
+			try:
+				value, end = self.decoder.raw_decode(self.buffer, self.position)
+			except json.JSONDecodeError:
+				# Most likely the value runs past the buffer
+				if not self.fill():
+					raise
+				continue
+			# A number at the very end of the buffer may continue in the next block
+			if end == len(self.buffer) and self.fill():
+				continue
+			self.position = end
+			return value
+
+	def items(self):
+		"""Yield (key, stream) for each member of the object at the current position; the caller must read each value."""
+		self.expect('{')
+		if self.peek() == '}':
+			self.position += 1
+			return
+		while True:
+			key = self.value()
+			self.expect(':')
+			yield key, self
+			if self.expect(',}') == '}':
+				return
+
+	def elements(self):
+		"""Yield once per element of the array at the current position; the caller must read each element."""
+		self.expect('[')
+		if self.peek() == ']':
+			self.position += 1
+			return
+		while True:
+			yield self
+			if self.expect(',]') == ']':
+				return
+
+
+def parse_timestamp(value):
+	"""Epoch seconds for an OBL timestamp (ISO 8601, or already a number)."""
+	if isinstance(value, (int, float)):
+		return float(value)
+	if not value:
+		return None
+	moment = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+	if moment.tzinfo is None:
+		moment = moment.replace(tzinfo=datetime.timezone.utc)
+	return moment.timestamp()
+
+
+def normalise_event(event, anonymised):
+	"""A LogEvent for one OBL event object."""
+	code = event.get('type') or ''
+	location = label = text = None
+	if code == 'button':
+		label = event.get('label')
+		if event.get('board_id') is not None or event.get('button_id') is not None:
+			location = f"{event.get('board_id', '')}/{event.get('button_id', '')}"
+		text = event.get('vocalization') or label
+	elif code == 'utterance':
+		text = event.get('text')
+	elif code == 'action':
+		text = event.get('action')
+	elif code == 'note':
+		note = event.get('note')
+		text = note.get('text') if isinstance(note, dict) else note
+	# Only button labels say whether a word is core; an anonymised utterance's text can't be checked on its own
+	core = not anonymised or (code == 'button' and bool(event.get('core_word'))) or code not in ('button', 'utterance')
+	return LogEvent(parse_timestamp(event.get('timestamp')), code, location, label, text, core)
+
+
+def stream_events(file, anonymised=None):
+	"""
+	Yield a LogEvent for every event of every session in an open OBL file.
+
+	:param anonymised: Whether non-core labels are obfuscated; None reads the document's
+		"anonymized" flag (it must come before "sessions" to count).
+	"""
+	stream = OBLStream(file)
+	for key, _ in stream.items():
+		if key == 'anonymized' and anonymised is None:
+			anonymised = bool(stream.value())
+		elif key == 'sessions':
+			for _ in stream.elements():
+				for session_key, _ in stream.items():
+					if session_key == 'events':
+						for _ in stream.elements():
+							event = stream.value()
+							if isinstance(event, dict):
+								yield normalise_event(event, bool(anonymised))
+					else:
+						stream.value()
+				# A session boundary also ends any message being built
+				yield LogEvent(None, 'session-end', None, None, None, True)
+		else:
+			stream.value()
+
+
+def read_obl_file(file_path):
+	"""Yield the LogEvents of one .obl or .obla file (.obla labels are treated as obfuscated)."""
+	with open(file_path, encoding='utf-8-sig') as f:
+		yield from stream_events(f, True if file_path.lower().endswith('.obla') else None)
+
+
+def reconstruct_utterances(events):
+	"""
+	Rebuild messages from OBL events.
+
+	Utterance events are the messages the user spoke; the button presses since
+	the last message count as its selections, and :backspace actions before it
+	as corrections. Button labels are also collected, so a message is still
+	produced if a log has buttons but no utterance events (ending at :clear or
+	the end of a session). A message is core only if all its words were.
+
+	:return: Iterator of Utterance(start, end, text, selections, corrections, core).
+	"""
+	labels = []
+	start = end = None
+	selections = corrections = 0
+	core = True
+
+	def reset():
+		nonlocal labels, start, end, selections, corrections, core
+		labels = []
+		start = end = None
+		selections = corrections = 0
+		core = True
+
+	for event in events:
+		if event.code == 'button':
+			selections += 1
+			if start is None:
+				start = event.time
+			end = event.time
+			if event.text:
+				labels.append(event.text)
+			core = core and event.core
+		elif event.code == 'action' and event.text in DELETE_ACTIONS:
+			if labels:
+				labels.pop()
+				corrections += 1
+		elif event.code == 'utterance':
+			text = (event.text or ' '.join(labels)).strip()
+			if text:
+				yield Utterance(start if start is not None else event.time, event.time, text, max(selections, 1), corrections, core if selections else event.core)
+			reset()
+		elif (event.code == 'action' and event.text in CLEAR_ACTIONS) or event.code == 'session-end':
+			text = ' '.join(labels).strip()
+			if text:
+				yield Utterance(start, end, text, selections, corrections, core)
+			reset()
+	text = ' '.join(labels).strip()
+	if text:
+		yield Utterance(start, end, text, selections, corrections, core)
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def format_time(time):
+	"""Render an event time as "YYYY-MM-DD HH:MM:SS.mmm" (UTC)."""
+	if time is None:
+		return ''
+	return (EPOCH + datetime.timedelta(milliseconds=round(time * 1000))).isoformat(' ', 'milliseconds')
+
+
+def write_corpus(utterances, filename, include_non_core=False):
+	"""
+	Write utterances to a CSV message history, one row per message, as they arrive.
+
+	:param include_non_core: Also write messages with obfuscated (non-core) words.
+	:return: Number of utterances written.
+	"""
+	count = 0
+	with open(filename, mode='w', newline='', encoding='utf-8') as file:
+		writer = csv.writer(file)
+		writer.writerow(['Start', 'End', 'Utterance', 'Selections', 'Corrections', 'Core'])
+		for utterance in utterances:
+			if not utterance.core and not include_non_core:
+				continue
+			writer.writerow([format_time(utterance.start), format_time(utterance.end), utterance.text, utterance.selections, utterance.corrections, utterance.core])
+			count += 1
+	return count
+
+
+def iter_events(file_paths):
+	for file_path in file_paths:
+		yield from read_obl_file(file_path)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Turn CoughDrop .obl/.obla logs into a message-history corpus.')
+	parser.add_argument('logs', nargs='+', help='.obl or .obla files')
+	parser.add_argument('--output', type=str, help='CSV file to write the corpus to', default='obl_corpus.csv')
+	parser.add_argument('--include-non-core', action='store_true', help='Keep messages containing obfuscated non-core words')
+	args = parser.parse_args()
+
+	count = write_corpus(reconstruct_utterances(iter_events(args.logs)), args.output, args.include_non_core)
+	print(f"Wrote {count} utterances to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+	main()
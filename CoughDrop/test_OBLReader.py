@@ -0,0 +1,36 @@
+"""Tests for rebuilding messages from OBL events.
+
+    python -m pytest test_OBLReader.py
+"""
+import io
+import json
+
+from OBLReader import reconstruct_utterances, stream_events
+
+
+def button(label, second):
+    return {"type": "button", "label": label, "timestamp": f"2021-06-22T08:54:{second:02d}Z"}
+
+
+def action(name, second):
+    return {"type": "action", "action": name, "timestamp": f"2021-06-22T08:54:{second:02d}Z"}
+
+
+def utterances(*sessions):
+    log = {"format": "open-board-log-0.1", "sessions": [{"id": str(i), "events": events} for i, events in enumerate(sessions)]}
+    return list(reconstruct_utterances(stream_events(io.StringIO(json.dumps(log)))))
+
+
+def test_clear_ends_the_message():
+    [message] = utterances([button("I", 1), button("want", 2), action(":clear", 3)])
+    assert (message.text, message.selections, message.corrections) == ("I want", 2, 0)
+    assert message.end - message.start == 1
+
+
+def test_backspace_and_session_end():
+    first, second = utterances(
+        [button("go", 1), button("oops", 2), action(":backspace", 3)],
+        [button("more", 4)],
+    )
+    assert (first.text, first.selections, first.corrections) == ("go", 2, 1)
+    assert (second.text, second.selections, second.corrections) == ("more", 1, 0)
@@ -2,154 +2,396 @@ import xml.etree.ElementTree as ET
 import json
 import argparse
 import zipfile
+import mimetypes
 import os
-import tempfile
 import shutil
+import hashlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
-def parse_styles(styles_xml_path):
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def normalise_member_name(name):
+    """Gridsets made on Windows can use backslashes in member names."""
+    return name.replace('\\', '/')
+
+
+def find_grid_members(zin):
+    """
+    Map each grid name to its ``Grids/<name>/grid.xml`` member (reads the central directory only).
     """
-    Parse the styles XML file and create a mapping for button styles.
+    grids = {}
+    for info in zin.infolist():
+        parts = normalise_member_name(info.filename).split('/')
+        if len(parts) == 3 and parts[0] == "Grids" and parts[2] == "grid.xml":
+            grids[parts[1]] = info
+    return grids
+
+
+def index_members(zin):
+    """
+    Map every member path (lower case, forward slashes) to its ZipInfo, for lookups by path.
+    """
+    return {normalise_member_name(info.filename).lower(): info for info in zin.infolist()}
+
+
+def find_member(members, wanted):
+    """
+    Find a member by path, ignoring case and slash direction. Returns the ZipInfo or None.
+    """
+    return members.get(normalise_member_name(wanted).lower())
+
+
+def get_home_grid(zin, members, grids):
+    """
+    The StartGrid from Settings0/settings.xml, falling back to the first grid in the zip.
+    """
+    settings = find_member(members, "Settings0/settings.xml")
+    if settings is not None:
+        with zin.open(settings) as f:
+            start_grid = ET.parse(f).getroot().find(".//StartGrid")
+        if start_grid is not None and start_grid.text in grids:
+            return start_grid.text
+    return next(iter(grids), None)
+
+
+def colour_to_hex(colour):
+    """Grid 3 colours are #RRGGBBAA; OBF takes CSS colours."""
+    return colour[:7] if colour else None
+
+
+def parse_styles(styles_file):
+    """
+    Parse the styles XML file (path or file object) and create a mapping for button styles.
     """
     style_mapping = {}
-    if styles_xml_path and os.path.exists(styles_xml_path):
-        style_tree = ET.parse(styles_xml_path)
-        style_root = style_tree.getroot()
-        for style in style_root.findall(".//Style"):
-            key = style.attrib.get("Key")
-            back_colour = style.find("BackColour").text if style.find("BackColour") is not None else "#FFFFFFFF"
-            font_colour = style.find("FontColour").text if style.find("FontColour") is not None else "#000000FF"
-            style_mapping[key] = {
-                "backgroundColor": back_colour[:7],
-                "textColor": font_colour[:7]
-            }
+    if styles_file is None:
+        return style_mapping
+    style_root = ET.parse(styles_file).getroot()
+    for style in style_root.iter("Style"):
+        key = style.attrib.get("Key")
+        if key is None:
+            continue
+        style_mapping[key] = {
+            "background_color": colour_to_hex(style.findtext("BackColour") or "#FFFFFFFF"),
+            "border_color": colour_to_hex(style.findtext("BorderColour") or "#000000FF"),
+        }
     return style_mapping
 
-def parse_buttons(grid_root, style_mapping):
+
+class ImageTable:
+    """
+    Content-addressed images for one worker.
+
+    An image's OBF id and .obz path come from the SHA-1 of its bytes (or of the
+    reference, for symbol library images such as ``[widgit]hello.emf``, which
+    become OBF ``symbol`` entries). Every worker therefore gives the same
+    picture the same id without coordinating, and a symbol stored under many
+    page folders ends up in the .obz once. Hashes are remembered per member so
+    each file is read at most once per worker.
+    """
+
+    def __init__(self, zin, members):
+        self.zin = zin
+        self.members = members
+        self.entries = {}  # reference -> (OBF image dict, member name or None), or None if the image isn't in the gridset
+        self.needed = {}  # image id -> (.obz path, gridset member name), for images used since the last take_needed()
+
+    def image_for(self, grid_name, image_ref):
+        """Return the OBF image dict for an <Image> value on ``grid_name``, or None if it can't be found."""
+        image_ref = image_ref.strip()
+        if image_ref.startswith("["):
+            key = image_ref
+        else:
+            key = f"Grids/{grid_name}/{image_ref}"
+        if key not in self.entries:
+            self.entries[key] = self.hash_image(key, image_ref)
+        if self.entries[key] is None:
+            return None
+        image, member = self.entries[key]
+        if member is not None:
+            self.needed[image["id"]] = (image["path"], member)
+        return image
+
+    def hash_image(self, key, image_ref):
+        """Build the OBF image dict for a reference not seen before: ``(image, member name or None)``, or None."""
+        member = None
+        if image_ref.startswith("["):
+            digest = hashlib.sha1(image_ref.encode("utf-8")).hexdigest()
+            symbol_set, _, filename = image_ref[1:].partition("]")
+            image = {"id": f"image-{digest[:16]}", "symbol": {"set": symbol_set, "filename": filename}}
+        else:
+            info = find_member(self.members, key)
+            if info is None:
+                return None
+            sha1 = hashlib.sha1()
+            with self.zin.open(info) as f:
+                for chunk in iter(lambda: f.read(COPY_CHUNK_SIZE), b""):
+                    sha1.update(chunk)
+            digest = sha1.hexdigest()
+            extension = os.path.splitext(info.filename)[1].lower()
+            image = {"id": f"image-{digest[:16]}", "path": f"images/{digest}{extension}"}
+            member = info.filename
+        content_type = mimetypes.guess_type(image_ref.rpartition("]")[2])[0]
+        if content_type:
+            image["content_type"] = content_type
+        return image, member
+
+    def take_needed(self):
+        """Images (``{image id: (obz path, member name)}``) used since the last call."""
+        needed, self.needed = self.needed, {}
+        return needed
+
+
+def get_cell_text(cell):
+    """The text a cell speaks or inserts, if it has any."""
+    runs = cell.findall(".//Content/Commands/Command[@ID='Action.InsertText']/Parameter[@Key='text']//r")
+    text = ' '.join(r.text.strip() for r in runs if r.text and r.text.strip())
+    if not text:
+        speak = cell.find(".//Content/Commands/Command[@ID='Speech.SpeakNow']/Parameter[@Key='text']")
+        if speak is not None and speak.text:
+            text = speak.text.strip()
+    return text
+
+
+def parse_buttons(grid_root, grid_name, style_mapping, board_ids, image_table):
     """
-    Extract buttons and their metadata from the Grid XML file.
+    Extract buttons and the images they use from a Grid XML page.
+
+    :param board_ids: Dictionary of grid name -> OBF board id for every grid in the gridset,
+        used to turn Jump.To commands into load_board links.
+    :return: Tuple (buttons, images used on this page, grid names linked to).
     """
     buttons = []
-    images = []
-    button_counter = 1
+    images = {}
+    links = []
 
-    for cell in grid_root.findall(".//Cell"):
-        style_key = cell.find("StyleKey")
-        style = style_mapping.get(style_key.text, {}) if style_key is not None else {}
+    for button_counter, cell in enumerate(grid_root.iter("Cell"), start=1):
+        # Wordlist cells are filled in at runtime, not part of the layout
+        if cell.findtext(".//ContentSubType") == "WordList":
+            continue
 
-        label = ""
-        caption = cell.find("Caption")
-        if caption is not None:
-            label = caption.text
+        label = (cell.findtext(".//CaptionAndImage/Caption") or "").strip()
+        button = {
+            "id": f"button-{button_counter}",
+            "label": label,
+            "row": int(cell.get("Y", 0)),
+            "col": int(cell.get("X", 0)),
+        }
+
+        vocalization = get_cell_text(cell)
+        if vocalization and vocalization != label:
+            button["vocalization"] = vocalization
+
+        style_key = cell.findtext(".//Style/BasedOnStyle")
+        button.update(style_mapping.get(style_key, {}))
 
         # Extract images
-        image_tag = cell.find(".//Image")
-        if image_tag is not None:
-            image_path = image_tag.text.strip()
-            image_id = f"image-{button_counter}"
-            images.append({"id": image_id, "path": image_path})
+        image_ref = cell.findtext(".//CaptionAndImage/Image")
+        if image_ref and image_ref.strip():
+            image = image_table.image_for(grid_name, image_ref)
+            if image is not None:
+                button["image_id"] = image["id"]
+                images[image["id"]] = image
 
         # Extract navigation
-        navigation = None
-        navigation_command = cell.find(".//Command[@ID='Jump.To']")
-        if navigation_command is not None:
-            target_grid = navigation_command.find(".//Parameter[@Key='grid']")
-            if target_grid is not None:
-                navigation = {"jump_to": target_grid.text}
-
-        buttons.append({
-            "id": f"button-{button_counter}",
-            "label": label,
-            "row": int(cell.attrib.get("GridRow", 0)),
-            "col": int(cell.attrib.get("GridColumn", 0)),
-            "width": int(cell.attrib.get("GridWidth", 1)),
-            "height": int(cell.attrib.get("GridHeight", 1)),
-            "style": style,
-            "navigation": navigation
-        })
-        button_counter += 1
-
-    return buttons, images
-
-def grid_to_openboard(grid_xml_path, styles_xml_path=None, output_json_path="output.obf", locale="en"):
-    """
-    Convert a Grid 3 board to OpenBoard format.
-    """
-    # Parse grid and styles
-    grid_tree = ET.parse(grid_xml_path)
-    grid_root = grid_tree.getroot()
-    style_mapping = parse_styles(styles_xml_path)
-    
+        target_grid = cell.findtext(".//Command[@ID='Jump.To']/Parameter[@Key='grid']")
+        if target_grid in board_ids:
+            button["load_board"] = {
+                "id": board_ids[target_grid],
+                "name": target_grid,
+                "path": board_path(board_ids[target_grid]),
+            }
+            links.append(target_grid)
+
+        if label or "image_id" in button or "load_board" in button or vocalization:
+            buttons.append(button)
+
+    return buttons, list(images.values()), links
+
+
+def board_path(board_id):
+    return f"boards/{board_id}.obf"
+
+
+def grid_to_openboard(grid_root, grid_name, board_id, style_mapping, board_ids, image_table, locale="en"):
+    """
+    Convert one Grid 3 page to an OpenBoard board.
+
+    :return: Tuple (OBF board dictionary, grid names linked to).
+    """
     # Extract grid dimensions
-    rows = len(grid_root.find(".//RowDefinitions").findall("RowDefinition"))
-    columns = len(grid_root.find(".//ColumnDefinitions").findall("ColumnDefinition"))
-    
+    rows = len(grid_root.findall("./RowDefinitions/RowDefinition"))
+    columns = len(grid_root.findall("./ColumnDefinitions/ColumnDefinition"))
+
     # Extract buttons and images
-    buttons, images = parse_buttons(grid_root, style_mapping)
-    
-    # Initialize OBF structure
+    buttons, images, links = parse_buttons(grid_root, grid_name, style_mapping, board_ids, image_table)
+
+    # Populate grid order with button IDs; OBF has no spans, so spanned cells sit at their top-left slot
+    order = [[None] * columns for _ in range(rows)]
+    for button in buttons:
+        row, col = button.pop("row"), button.pop("col")
+        if 0 <= row < rows and 0 <= col < columns:
+            order[row][col] = button["id"]
+
     obf_data = {
         "format": "open-board-0.1",
-        "id": "board",
+        "id": board_id,
         "locale": locale,
-        "name": "Converted Grid",
+        "name": grid_name,
         "description_html": "Converted from Grid XML format.",
         "buttons": buttons,
         "grid": {
             "rows": rows,
             "columns": columns,
-            "order": []
+            "order": order
         },
         "images": images,
     }
-    
-    # Populate grid order with button IDs
-    button_positions = {f"{b['row']}-{b['col']}": b["id"] for b in buttons}
-    for row in range(rows):
-        row_order = []
-        for col in range(columns):
-            button_id = button_positions.get(f"{row}-{col}", None)
-            row_order.append(button_id)
-        obf_data["grid"]["order"].append(row_order)
-    
-    # Save OBF JSON file
-    with open(output_json_path, "w", encoding="utf-8") as f:
-        json.dump(obf_data, f, indent=4)
-    return output_json_path
-
-def extract_gridset(gridset_path, extract_to):
-    """
-    Extract a Gridset ZIP file to a temporary directory.
-    """
-    with zipfile.ZipFile(gridset_path, "r") as zip_ref:
-        zip_ref.extractall(extract_to)
-    return extract_to
+    return obf_data, links
+
+
+def write_json(zout, path, data):
+    with zout.open(path, "w") as f:
+        f.write(json.dumps(data, indent=2).encode("utf-8"))
+
+
+def copy_member(zin, zout, info, path):
+    """Stream one member from the gridset into the .obz under ``path`` without holding it in memory."""
+    new_info = zipfile.ZipInfo(path, date_time=info.date_time)
+    new_info.compress_type = info.compress_type
+    with zin.open(info) as src, zout.open(new_info, "w") as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+# Per-process conversion state, set up once by init_worker so each task only names a grid
+_worker = {}
+
+
+def init_worker(gridset_path, style_mapping, board_ids, locale):
+    """Open the gridset in this process and keep the shared tables for convert_page."""
+    zin = zipfile.ZipFile(gridset_path, "r")
+    members = index_members(zin)
+    _worker.update(
+        zin=zin,
+        grids=find_grid_members(zin),
+        image_table=ImageTable(zin, members),
+        style_mapping=style_mapping,
+        board_ids=board_ids,
+        locale=locale,
+    )
+
+
+def convert_page(grid_name):
+    """
+    Convert one grid page in a worker.
+
+    :return: Tuple (grid name, board JSON bytes, grid names linked to, images used as from ImageTable.take_needed).
+    """
+    with _worker["zin"].open(_worker["grids"][grid_name]) as f:
+        grid_root = ET.parse(f).getroot()
+    board_id = _worker["board_ids"][grid_name]
+    board, links = grid_to_openboard(
+        grid_root, grid_name, board_id, _worker["style_mapping"], _worker["board_ids"], _worker["image_table"], _worker["locale"]
+    )
+    return grid_name, json.dumps(board, indent=2).encode("utf-8"), links, _worker["image_table"].take_needed()
+
+
+def gridset_to_obz(gridset_path, output_path, home_grid=None, locale="en", workers=None):
+    """
+    Convert every page reachable from the home grid into an .obz, streaming from zip to zip.
+
+    Pages are converted in parallel, each worker reading its pages straight
+    out of the gridset; styles are parsed once and handed to every worker.
+    Boards are written to the .obz as they come back and each distinct image
+    (by content hash) is copied across once, so memory stays bounded by a few
+    pages rather than the whole gridset.
+
+    :param workers: Number of worker processes (default: all cores); 1 converts in this process.
+    :return: Tuple (number of boards written, number of images written).
+    """
+    with zipfile.ZipFile(gridset_path, "r") as zin, zipfile.ZipFile(output_path, "w", zipfile.ZIP_DEFLATED) as zout:
+        members = index_members(zin)
+        grids = find_grid_members(zin)
+        home_grid = home_grid or get_home_grid(zin, members, grids)
+        if home_grid not in grids:
+            raise ValueError(f"Home grid '{home_grid}' not found in {gridset_path}")
+
+        styles = find_member(members, "Settings0/Styles/styles.xml") or find_member(members, "Settings0/styles.xml")
+        if styles is not None:
+            with zin.open(styles) as f:
+                style_mapping = parse_styles(f)
+        else:
+            style_mapping = {}
+
+        board_ids = {name: str(i) for i, name in enumerate(grids, start=1)}
+        board_paths = {}
+        image_paths = {}
+
+        def write_page(result):
+            """Write one converted board plus any images not already in the .obz; return its links."""
+            grid_name, board_json, links, images = result
+            board_id = board_ids[grid_name]
+            with zout.open(board_path(board_id), "w") as f:
+                f.write(board_json)
+            board_paths[board_id] = board_path(board_id)
+            for image_id, (path, member) in images.items():
+                if image_id not in image_paths:
+                    copy_member(zin, zout, zin.getinfo(member), path)
+                    image_paths[image_id] = path
+            return links
+
+        # Every page reachable from the home grid, like build_navigation_map_and_find_relevant_files;
+        # pages are queued as soon as a link to them is seen
+        seen = {home_grid}
+        workers = workers or os.cpu_count() or 1
+        init_args = (gridset_path, style_mapping, board_ids, locale)
+        if workers == 1:
+            init_worker(*init_args)
+            queue = deque([home_grid])
+            while queue:
+                for target_grid in write_page(convert_page(queue.popleft())):
+                    if target_grid not in seen:
+                        seen.add(target_grid)
+                        queue.append(target_grid)
+            _worker["zin"].close()
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=init_args) as executor:
+                pending = {executor.submit(convert_page, home_grid)}
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for target_grid in write_page(future.result()):
+                            if target_grid not in seen:
+                                seen.add(target_grid)
+                                pending.add(executor.submit(convert_page, target_grid))
+
+        manifest = {
+            "format": "open-board-0.1",
+            "root": board_path(board_ids[home_grid]),
+            "paths": {
+                "boards": board_paths,
+                "images": image_paths,
+                "sounds": {}
+            }
+        }
+        write_json(zout, "manifest.json", manifest)
+    return len(board_paths), len(image_paths)
+
 
 def main():
-    parser = argparse.ArgumentParser(description="Convert Grid 3 files to Open Board Format (OBF).")
+    parser = argparse.ArgumentParser(description="Convert a Grid 3 gridset to an Open Board Format package (.obz).")
     parser.add_argument("gridset_path", help="Path to the Gridset (ZIP) file.")
-    parser.add_argument("--styles", help="Path to the styles XML file.", default=None)
-    parser.add_argument("--output", help="Path to save the converted OpenBoard JSON file.", default="output.obf")
-    parser.add_argument("--locale", help="Language locale for the OpenBoard file.", default="en")
+    parser.add_argument("--output", help="Path to save the .obz file (default: next to the gridset).", default=None)
+    parser.add_argument("--home", help="Override the home grid name.", default=None)
+    parser.add_argument("--locale", help="Language locale for the OpenBoard files.", default="en")
+    parser.add_argument("--workers", type=int, help="Worker processes (default: all cores; 1 to convert in one process).", default=None)
     args = parser.parse_args()
 
-    # Create a temporary directory to extract the Gridset
-    with tempfile.TemporaryDirectory() as temp_dir:
-        extract_gridset(args.gridset_path, temp_dir)
-        
-        # Find the main grid XML file
-        grid_xml_path = os.path.join(temp_dir, "Grids", "grid.xml")  # Adjust as needed
-        if not os.path.exists(grid_xml_path):
-            print("Error: Could not find grid.xml in the Gridset.")
-            return
-        
-        # Convert to OpenBoard format
-        output_path = grid_to_openboard(
-            grid_xml_path=grid_xml_path,
-            styles_xml_path=args.styles,
-            output_json_path=args.output,
-            locale=args.locale
-        )
-        print(f"OpenBoard file saved to {output_path}")
+    output_path = args.output or os.path.splitext(args.gridset_path)[0] + ".obz"
+    boards, images = gridset_to_obz(args.gridset_path, output_path, home_grid=args.home, locale=args.locale, workers=args.workers)
+    print(f"OpenBoard package saved to {output_path} ({boards} boards, {images} images)")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
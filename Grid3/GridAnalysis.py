@@ -9,6 +9,11 @@ from collections import defaultdict
 import csv
 import subprocess
 import sys
+from OBFReader import OBFPage, is_obf_path, build_navigation_map_and_find_relevant_pages
+import TouchChatReader
+import numpy as np
+from GridGeometry import PageGeometry, page_movement_times, movement_times, sequence_movement_times
+from ScoringProfiles import DEFAULT_PROFILE, load_profiles
 
 
 def install_and_import_nltk():
@@ -174,7 +179,7 @@ def calculate_button_coordinates(button_position, grid_rows, grid_cols, screen_d
 
 	return round(x,2), round(y,2)
 
-def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_position, screen_dimensions, home_grid, button_grid, navigation_map):
+def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_position, screen_dimensions, home_grid, button_grid, navigation_map, button_rectangle=None, start_position=None, profile=DEFAULT_PROFILE):
 	"""
 	Calculate the effort score for a button in a gridset using direct selection technique.
 	
@@ -186,23 +191,32 @@ def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_po
 	:param home_grid: Name of the home grid.
 	:param button_grid: Name of the grid where the button is located.
 	:param navigation_map: A dictionary representing the navigation paths between grids.
+	:param button_rectangle: Optional (left, top, width, height) of the button from GridGeometry; when given,
+		the button's real size (spans and row/column sizes) and centre are used instead of one grid cell.
+	:param start_position: Optional (x, y) the distance is measured from (default: the bottom-right corner).
+	:param profile: ScoringProfile whose weights are used (default: DEFAULT_PROFILE).
 	:return: Total effort score for the button.
 	"""
-	BUTTON_SIZE_WEIGHT = 0.003
-	FIELD_SIZE_WEIGHT = 0.007
-	PRIOR_SCAN_WEIGHT = 0.001
-	NAVIGATION_STEP_WEIGHT = 1.0 
+	BUTTON_SIZE_WEIGHT = profile.button_size_weight
+	FIELD_SIZE_WEIGHT = profile.field_size_weight
+	PRIOR_SCAN_WEIGHT = profile.prior_scan_weight
+	NAVIGATION_STEP_WEIGHT = profile.navigation_step_weight
 
-	button_size = BUTTON_SIZE_WEIGHT * grid_rows * grid_cols
+	screen_width, screen_height = screen_dimensions
+	if button_rectangle is not None:
+		# How many buttons of this size would fill the screen
+		left, top, width, height = button_rectangle
+		button_size = BUTTON_SIZE_WEIGHT * (screen_width * screen_height) / (width * height) if width and height else 0
+		end_x, end_y = left + width / 2, top + height / 2
+	else:
+		button_size = BUTTON_SIZE_WEIGHT * grid_rows * grid_cols
+		end_x, end_y = calculate_button_coordinates(button_position, grid_rows, grid_cols, screen_dimensions)
 	field_size = FIELD_SIZE_WEIGHT * total_visible_buttons
 	# Calculate the linear scan position (assuming left-to-right, top-to-bottom scanning)
 	linear_position = (button_position[0] - 1) * grid_cols + button_position[1]
 	prior_scan = PRIOR_SCAN_WEIGHT * linear_position
 
-	button_coordinates = calculate_button_coordinates(button_position, grid_rows, grid_cols, screen_dimensions)
-	screen_width, screen_height = screen_dimensions
-	end_x, end_y = button_coordinates
-	start_x, start_y = screen_width, screen_height	# Default starting position
+	start_x, start_y = start_position or (screen_width, screen_height)	# Default starting position
 	distance = math.sqrt(((start_x - end_x) / screen_width) ** 2 + ((start_y - end_y) / screen_height) ** 2) / math.sqrt(2)
 
 	# Calculate the number of steps to the button's grid and the associated effort
@@ -210,11 +224,10 @@ def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_po
 	navigation_steps = len(path_to_button) - 1 if path_to_button else 0
 	navigation_effort = NAVIGATION_STEP_WEIGHT * navigation_steps
 
-	prior_effort = len(path_to_button) - 1 if path_to_button else 0
 	hits = len(path_to_button) if path_to_button else 1	 # Number of hits
 	
 	#print(f"Path from {home_grid} to {button_grid}: {path_to_button}, Hits: {hits}")
-	total_effort = button_size + field_size + prior_scan + distance + prior_effort
+	total_effort = button_size + field_size + prior_scan + distance + navigation_effort
 	return round(total_effort,2), hits
 
 def calculate_scanning_effort(button_position, scan_time_per_unit, selection_time):
@@ -250,34 +263,31 @@ def get_home_grid_from_settings(settings_file):
 		return None
 
 
-def extract_combined_cell_and_wordlist_contents(xml_root, grid_name, screen_dimensions):
+def extract_combined_cell_and_wordlist_contents(xml_root, grid_name):
 	"""
 	Extracts a combined list of cell contents and wordlist items, along with additional details.
 
+	On-screen positions are worked out from the page geometry in process_single_grid_file.
+
 	:param xml_root: The root of the XML tree.
 	:param grid_name: The name of the grid.
-	:param screen_dimensions: Tuple (width, height) of the screen.
 	:return: A list of dictionaries, each containing details about a cell or wordlist item.
 	"""
 	combined_contents = []
-	wordlist_positions = []
 	wordlist_grid_positions = []
-
-	# Extract grid rows and columns
-	grid_rows = len(xml_root.findall(".//RowDefinitions/RowDefinition"))
-	grid_cols = len(xml_root.findall(".//ColumnDefinitions/ColumnDefinition"))
+	wordlist_spans = []
 
 	# Extract text and positions from cells
 	for cell in xml_root.findall(".//Cell"):
 		cell_data = {}
 		cell_x = int(cell.get('X', '1'))  # Default to 1 if not specified
 		cell_y = int(cell.get('Y', '1'))  # Default to 1 if not specified
-		cell_position = calculate_button_coordinates((cell_x, cell_y), grid_rows, grid_cols, screen_dimensions)
+		cell_span = (int(cell.get('ColumnSpan', '1')), int(cell.get('RowSpan', '1')))
 		
 		# Check for wordlist cells
 		if cell.find(".//ContentSubType") is not None and cell.find(".//ContentSubType").text == "WordList":
-			wordlist_positions.append(cell_position)
 			wordlist_grid_positions.append((cell_x, cell_y))
+			wordlist_spans.append(cell_span)
 			continue
 
 		# Handle regular cells
@@ -285,14 +295,14 @@ def extract_combined_cell_and_wordlist_contents(xml_root, grid_name, screen_dime
 		full_text = ' '.join([elem.text.strip() for elem in text_elements if elem.text and elem.text.strip()])
 		if full_text:
 			cell_data['Text'] = full_text
-			cell_data['Position'] = cell_position
 			cell_data['XY'] = (cell_x, cell_y)
+			cell_data['Span'] = cell_span
 			cell_data['PageName'] = grid_name
 			cell_data['CellType'] = 'Regular'
 			combined_contents.append(cell_data)
 
 	# Skip wordlist processing if no WordList ContentSubType cells are found
-	if not wordlist_positions:
+	if not wordlist_grid_positions:
 		return combined_contents
 
 	# Extract items from wordlists
@@ -301,12 +311,12 @@ def extract_combined_cell_and_wordlist_contents(xml_root, grid_name, screen_dime
 		full_text = ' '.join([word_text.text.strip() for word_text in word_texts if word_text.text and word_text.text.strip()])
 
 		if full_text:
-			position = wordlist_positions.pop(0) if wordlist_positions else 'N/A'
 			grid_position = wordlist_grid_positions.pop(0) if wordlist_grid_positions else 'N/A'
+			span = wordlist_spans.pop(0) if wordlist_spans else (1, 1)
 			wordlist_data = {
 				'Text': full_text,
-				'Position': position,
 				'XY': grid_position,
+				'Span': span,
 				'PageName': grid_name,
 				'CellType': 'WordList'
 			}
@@ -314,11 +324,121 @@ def extract_combined_cell_and_wordlist_contents(xml_root, grid_name, screen_dime
 	return combined_contents
 
 
-def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time):
+def extract_obf_page_contents(page):
+	"""
+	The OBF counterpart of extract_combined_cell_and_wordlist_contents: cell dictionaries for a board's buttons.
+
+	Buttons that only open another board (a load_board link and no text of their
+	own) are navigation, like Grid 3 Jump.To cells, so they are left out.
+
+	:param page: An OBFPage from OBFReader.
+	"""
+	combined_contents = []
+	for cell in page.cells:
+		if not cell['Text'] or cell['LoadBoard']:
+			continue
+		cell_x, cell_y = cell['X'], cell['Y']
+		combined_contents.append({
+			'Text': cell['Text'],
+			'XY': (cell_x, cell_y),
+			'Span': cell.get('Span', (1, 1)),
+			'PageName': page.name,
+			'CellType': 'Regular'
+		})
+	return combined_contents
+
+
+def load_grid_page(file, screen_dimensions):
+	"""
+	Read one page, either a Grid 3 grid.xml path or an OBFPage.
+
+	:return: Tuple (grid name, rows, columns, number of cells, combined contents, GridGeometry.PageGeometry).
+	"""
+	if isinstance(file, OBFPage):
+		geometry = PageGeometry.uniform(file.rows, file.cols, screen_dimensions)
+		return file.name, file.rows, file.cols, file.cell_count, extract_obf_page_contents(file), geometry
 	root = parse_xml(file)
 	grid_name = get_grid_name_from_path(file)
+	rows = len(root.findall(".//RowDefinitions/RowDefinition"))
+	cols = len(root.findall(".//ColumnDefinitions/ColumnDefinition"))
+	cells = len(root.findall(".//Cell"))
+	geometry = PageGeometry.from_xml(root, screen_dimensions)
+	return grid_name, rows, cols, cells, extract_combined_cell_and_wordlist_contents(root, grid_name), geometry
+
+
+def navigation_button_rectangles(pages, screen_dimensions):
+	"""
+	Where the navigation buttons are on each page, for the movement time of a whole navigation path.
+
+	:param pages: grid.xml paths or OBFPages.
+	:param screen_dimensions: Tuple (width, height) of the screen.
+	:return: Dictionary of (page name, linked page name) -> (left, top, width, height) of the first button opening it.
+	"""
+	rectangles = {}
+	for page in pages:
+		if isinstance(page, OBFPage):
+			page_name = page.name
+			geometry = PageGeometry.uniform(page.rows, page.cols, screen_dimensions)
+			links = [(cell['LoadBoard'], cell['X'], cell['Y'], cell.get('Span', (1, 1))) for cell in page.cells if cell['LoadBoard']]
+		else:
+			root = parse_xml(page)
+			page_name = get_grid_name_from_path(page)
+			geometry = PageGeometry.from_xml(root, screen_dimensions)
+			links = []
+			for cell in root.findall('.//Cell'):
+				jump_to_command = cell.find(".//Commands/Command[@ID='Jump.To']/Parameter[@Key='grid']")
+				if jump_to_command is not None and jump_to_command.text:
+					cell_span = (int(cell.get('ColumnSpan', '1')), int(cell.get('RowSpan', '1')))
+					links.append((jump_to_command.text, int(cell.get('X', '1')), int(cell.get('Y', '1')), cell_span))
+		if not links:
+			continue
+		lefts, tops, widths, heights = geometry.rectangles(
+			[x for _, x, _, _ in links],
+			[y for _, _, y, _ in links],
+			[span[0] for _, _, _, span in links],
+			[span[1] for _, _, _, span in links],
+		)
+		for i, (target, _, _, _) in enumerate(links):
+			rectangles.setdefault((page_name, target), (lefts[i], tops[i], widths[i], heights[i]))
+	return rectangles
+
+
+def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time, navigation_buttons=None):
+	"""
+	Score every button on one page.
+
+	:param navigation_buttons: Optional result of navigation_button_rectangles; when given, 'Path Movement Time'
+		is the Fitts' law time of the whole selection sequence, from the screen centre through the navigation
+		button on each page along the path from home, and then to the button.
+	"""
+	grid_name, rows, cols, cells, combined_contents, geometry = load_grid_page(file, screen_dimensions)
+	path_to_page = find_path(home_grid, grid_name, navigation_map)
+	path_str = ' -> '.join(path_to_page)
 
-	combined_contents = extract_combined_cell_and_wordlist_contents(root, grid_name, screen_dimensions)
+	# Move through the navigation buttons along the path; the last one is where the pointer starts on this page
+	screen_width, screen_height = screen_dimensions
+	path_start = (screen_width / 2, screen_height / 2)
+	navigation_time = 0.0
+	hops = [navigation_buttons[hop] for hop in zip(path_to_page, path_to_page[1:]) if hop in (navigation_buttons or {})]
+	if hops:
+		hop_lefts, hop_tops, hop_widths, hop_heights = (np.asarray(values) for values in zip(*hops))
+		navigation_time = float(sequence_movement_times(hop_lefts, hop_tops, hop_widths, hop_heights, path_start).sum())
+		path_start = (hop_lefts[-1] + hop_widths[-1] / 2, hop_tops[-1] + hop_heights[-1] / 2)
+
+	# Button rectangles and Fitts' law movement times for the whole page at once
+	placed = [data for data in combined_contents if data['XY'] != 'N/A']
+	button_times, (lefts, tops, widths, heights) = page_movement_times(
+		geometry,
+		[data['XY'][0] for data in placed],
+		[data['XY'][1] for data in placed],
+		[data['Span'][0] for data in placed],
+		[data['Span'][1] for data in placed],
+	)
+	path_times = navigation_time + movement_times(path_start[0], path_start[1], lefts + widths / 2, tops + heights / 2, widths, heights)
+	page_geometry = {
+		id(data): (float(button_times[i]), float(path_times[i]), (lefts[i], tops[i], widths[i], heights[i]))
+		for i, data in enumerate(placed)
+	}
 
 	word_count = Counter()
 	phrase_count = 0
@@ -331,14 +451,12 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
 		word_count.update(data['Text'].split())
 		phrase_count += 1 if len(data['Text'].split()) > 1 else 0
 		grid_position = data.get('XY', (1, 1))	# Default to (1, 1) if not specified
-		path_to_button = find_path(home_grid, grid_name, navigation_map)
-		path_str = ' -> '.join(path_to_button)
-		rows = len(root.findall(".//RowDefinitions/RowDefinition"))
-		cols = len(root.findall(".//ColumnDefinitions/ColumnDefinition"))
-		cells = len(root.findall(".//Cell"))
 		
 		if data['XY'] != 'N/A':
 			grid_position = data['XY']		
+			movement_time, path_movement_time, button_rectangle = page_geometry[id(data)]
+			left, top, width, height = button_rectangle
+			position = (round(float(left + width / 2), 2), round(float(top + height / 2), 2))
 			effort_score, hits = calculate_grid_effort(
 				rows,
 				cols,
@@ -347,7 +465,8 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
 				screen_dimensions,
 				home_grid,
 				grid_name,
-				navigation_map
+				navigation_map,
+				button_rectangle
 			)
 			total_hits += hits
 
@@ -360,6 +479,9 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
 			# Handle the 'N/A' case - either skip or set a default effort score
 			scanning_effort_score = 0  # Example default value, adjust as needed
 			effort_score = 0
+			movement_time = 0
+			path_movement_time = 0
+			position = 'N/A'
 		num_cells += 1
 		
 		# Check if the text is a phrase (more than one word) or a single word
@@ -369,12 +491,14 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
 			'text': data['Text'],
 			'effort_score': effort_score,
 			'Scanning Effort Score': scanning_effort_score,
+			'Movement Time': round(movement_time, 3),
+			'Path Movement Time': round(path_movement_time, 3),
 			'hits': hits,
 			'grid_name': grid_name,
-			'position_x': data['Position'][0],
-			'position_y': data['Position'][1],
+			'position_x': position[0] if position != 'N/A' else 'N/A',
+			'position_y': position[1] if position != 'N/A' else 'N/A',
 			'xy': data['XY'],
-			'position': data['Position'],
+			'position': position,
 			'path': path_str,
 			'cell_type': data['CellType'],
 			'word_type':word_type
@@ -388,11 +512,13 @@ def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, naviga
 	word_counts_2, phrase_counts_2, effort_scores_2, cell_data_2, total_hits_2, num_cells_2 = Counter(), 0, [], [], 0, 0
 	total_word_type_count1 = Counter()
 	total_word_type_count2 = Counter()
+	navigation_buttons_1 = navigation_button_rectangles(grid_xml_files_1, screen_dimensions)
+	navigation_buttons_2 = navigation_button_rectangles(grid_xml_files_2, screen_dimensions)
 	
 	# Process each file in gridset 1
 	for file in grid_xml_files_1:
 		word_count, phrase_count, cell_data, hits, num_cells, word_type_count = process_single_grid_file(
-			file, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time
+			file, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time, navigation_buttons_1
 		)
 		word_counts_1.update(word_count)
 		phrase_counts_1 += phrase_count
@@ -405,7 +531,7 @@ def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, naviga
 	# Process each file in gridset 2
 	for file in grid_xml_files_2:
 		word_count, phrase_count, cell_data, hits, num_cells, word_type_count = process_single_grid_file(
-			file, navigation_map2, screen_dimensions, home_grid2, scan_time_per_unit, selection_time
+			file, navigation_map2, screen_dimensions, home_grid2, scan_time_per_unit, selection_time, navigation_buttons_2
 		)
 		word_counts_2.update(word_count)
 		phrase_counts_2 += phrase_count
@@ -457,10 +583,11 @@ def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, naviga
 def analyze_single_gridset(grid_xml_files, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time):
 	word_counts, phrase_counts, cell_data, total_hits, num_cells = Counter(), 0, [], 0, 0
 	total_word_type_count = Counter()
+	navigation_buttons = navigation_button_rectangles(grid_xml_files, screen_dimensions)
 	
 	# Process each file in the gridset
 	for file in grid_xml_files:
-		word_count, phrase_count, cells, hits, cells_count, word_type_count = process_single_grid_file(file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time)
+		word_count, phrase_count, cells, hits, cells_count, word_type_count = process_single_grid_file(file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time, navigation_buttons)
 		word_counts.update(word_count)
 		phrase_counts += phrase_count
 		cell_data.extend(cells)
@@ -488,17 +615,20 @@ def analyze_single_gridset(grid_xml_files, navigation_map, screen_dimensions, ho
 def process_gridset_for_csv(grid_xml_files, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time):
 	# Initialize list for CSV data
 	csv_data = []
+	navigation_buttons = navigation_button_rectangles(grid_xml_files, screen_dimensions)
 
 	# Process grid files
 	for file in grid_xml_files:
 		_, _, cell_data, _, _, _ = process_single_grid_file(
-			file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time
+			file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time, navigation_buttons
 		)
 		for data in cell_data:
 			csv_data.append({
 				'Word/Phrase': data['text'],
 				'Effort Score': data['effort_score'],
 				'Scanning Effort Score': data['Scanning Effort Score'],
+				'Movement Time': data['Movement Time'],
+				'Path Movement Time': data['Path Movement Time'],
 				'Hits': data['hits'],
 				'Grid Name': data['grid_name'],
 				'Actual Position X': data['position_x'],
@@ -512,6 +642,108 @@ def process_gridset_for_csv(grid_xml_files, navigation_map, screen_dimensions, h
 	return csv_data
 
 
+def collect_gridset_cells(grid_xml_files, navigation_map, home_grid):
+	"""
+	Parse every page once and gather what the effort scores need, so a gridset can be scored under many profiles.
+
+	Button rectangles are kept as fractions of the screen, so each profile only
+	has to scale them to its own screen size.
+
+	:return: Tuple (list of per-cell dictionaries for the CSV, dictionary of NumPy arrays with one entry per cell).
+	"""
+	records = []
+	columns = defaultdict(list)
+	word_types = {}
+	for file in grid_xml_files:
+		grid_name, rows, cols, cells, combined_contents, geometry = load_grid_page(file, (1, 1))
+		path_to_button = find_path(home_grid, grid_name, navigation_map)
+		path_str = ' -> '.join(path_to_button)
+		steps = len(path_to_button) - 1 if path_to_button else 0
+		hits = len(path_to_button) if path_to_button else 1
+
+		placed = [data['XY'] != 'N/A' for data in combined_contents]
+		xs = [data['XY'][0] if is_placed else 0 for data, is_placed in zip(combined_contents, placed)]
+		ys = [data['XY'][1] if is_placed else 0 for data, is_placed in zip(combined_contents, placed)]
+		left, top, width, height = geometry.rectangles(
+			xs, ys,
+			[data.get('Span', (1, 1))[0] for data in combined_contents],
+			[data.get('Span', (1, 1))[1] for data in combined_contents])
+
+		for data in combined_contents:
+			text = data['Text']
+			if text not in word_types:
+				word_types[text] = 'PHRASE' if len(text.split()) > 1 else get_word_type(text)
+			records.append({
+				'Word/Phrase': text,
+				'Hits': hits if data['XY'] != 'N/A' else 0,
+				'Grid Name': grid_name,
+				'XY': data['XY'],
+				'Path': path_str,
+				'Cell Type': data['CellType'],
+				'Word Type': word_types[text],
+			})
+		count = len(combined_contents)
+		columns['placed'].extend(placed)
+		columns['x'].extend(xs)
+		columns['y'].extend(ys)
+		columns['left'].extend(left)
+		columns['top'].extend(top)
+		columns['width'].extend(width)
+		columns['height'].extend(height)
+		columns['cols'].extend([cols] * count)
+		columns['cells'].extend([cells] * count)
+		columns['steps'].extend([steps] * count)
+	return records, {key: np.asarray(values, dtype=bool if key == 'placed' else np.float64) for key, values in columns.items()}
+
+
+def score_profile(columns, profile):
+	"""
+	The effort scores of calculate_grid_effort and calculate_scanning_effort, plus Fitts' law movement
+	times, for every cell from collect_gridset_cells at once under one profile.
+
+	:return: Tuple of arrays (effort scores, scanning effort scores, movement times); unplaced cells score 0.
+	"""
+	if not columns:
+		return np.zeros(0), np.zeros(0), np.zeros(0)
+	screen_width, screen_height = profile.screen_dimensions
+	left = columns['left'] * screen_width
+	top = columns['top'] * screen_height
+	width = columns['width'] * screen_width
+	height = columns['height'] * screen_height
+	centre_x, centre_y = left + width / 2, top + height / 2
+
+	area = width * height
+	with np.errstate(divide='ignore', invalid='ignore'):
+		button_size = np.where(area > 0, profile.button_size_weight * (screen_width * screen_height) / area, 0)
+	field_size = profile.field_size_weight * columns['cells']
+	prior_scan = profile.prior_scan_weight * ((columns['x'] - 1) * columns['cols'] + columns['y'])
+	distance = np.sqrt(((screen_width - centre_x) / screen_width) ** 2 + ((screen_height - centre_y) / screen_height) ** 2) / math.sqrt(2)
+	navigation_effort = profile.navigation_step_weight * columns['steps']
+	effort = np.round(button_size + field_size + prior_scan + distance + navigation_effort, 2)
+
+	scanning = (columns['x'] - 1) * profile.scan_time_per_unit + (columns['y'] - 1) * profile.scan_time_per_unit + profile.selection_time
+	movement = np.round(movement_times(screen_width / 2, screen_height / 2, centre_x, centre_y, width, height, profile.fitts_intercept, profile.fitts_slope), 3)
+
+	placed = columns['placed']
+	return np.where(placed, effort, 0), np.where(placed, scanning, 0), np.where(placed, movement, 0)
+
+
+def process_gridset_for_profiles(grid_xml_files, navigation_map, home_grid, profiles):
+	"""
+	Score a gridset under several scoring profiles, parsing it only once.
+
+	:return: CSV rows with an effort, scanning effort and movement time column per profile.
+	"""
+	records, columns = collect_gridset_cells(grid_xml_files, navigation_map, home_grid)
+	for profile in profiles:
+		effort, scanning, movement = score_profile(columns, profile)
+		for i, record in enumerate(records):
+			record[f'Effort Score [{profile.name}]'] = float(effort[i])
+			record[f'Scanning Effort Score [{profile.name}]'] = float(scanning[i])
+			record[f'Movement Time [{profile.name}]'] = float(movement[i])
+	return records
+
+
 def save_to_csv(data, filename):
 	"""
 	Save data to a CSV file.
@@ -551,35 +783,73 @@ def find_unique_words(grid_data1, grid_data2):
 
 	return unique_dicts_in_list1
 
+def load_pageset(file_path, extract_to, home_override=None):
+	"""
+	Find the home page, navigation map and reachable pages of a .gridset, .obz, .obf or TouchChat .ce.
+
+	Gridsets are extracted to ``extract_to`` and their pages are grid.xml paths;
+	OBF board sets and TouchChat vocabularies are read from the file and their pages are OBFPage records.
+	Either kind can be passed to process_gridset_for_csv and friends.
+
+	:return: Tuple (home grid name, navigation map, list of pages).
+	"""
+	if is_obf_path(file_path):
+		home_grid, navigation_map, pages = build_navigation_map_and_find_relevant_pages(file_path)
+		if home_override:
+			home_grid = home_override
+		return home_grid, navigation_map, pages
+	if TouchChatReader.is_touchchat_path(file_path):
+		return TouchChatReader.build_navigation_map_and_find_relevant_pages(file_path, home_override)
+
+	extract_gridset_contents(file_path, extract_to)
+	home_grid = home_override or get_home_grid_from_settings(os.path.join(extract_to, "Settings0/settings.xml"))
+	navigation_map, relevant_files = build_navigation_map_and_find_relevant_files(os.path.join(extract_to, "Grids", home_grid, "grid.xml"))
+	return home_grid, navigation_map, relevant_files
+
+
+def score_pagesets_for_profiles(args):
+	"""Multi-profile mode: one CSV per gridset with an effort column per profile, and each profile's average effort."""
+	profiles = load_profiles(args.profiles)
+	output = args.output or '.'
+	pagesets = [(args.gridset1, args.gridset1home)]
+	if args.gridset2:
+		pagesets.append((args.gridset2, args.gridset2home))
+	for number, (pageset, home_override) in enumerate(pagesets, start=1):
+		home_grid, navigation_map, pages = load_pageset(pageset, os.path.join(output, f"ExtractedGrids/extracted{number}"), home_override)
+		data = process_gridset_for_profiles(pages, navigation_map, home_grid, profiles)
+		if data:
+			save_to_csv(data, os.path.join(output, f"gridset{number}_profiles.csv"))
+		print(f"{pageset}:")
+		for profile in profiles:
+			scores = [row[f'Effort Score [{profile.name}]'] for row in data if row['XY'] != 'N/A']
+			average = round(sum(scores) / len(scores), 2) if scores else 0
+			print(f"  Average Effort Score [{profile.name}]: {average}")
+
+
 def main():
-	parser = argparse.ArgumentParser(description='Compare the language content of two .gridset files.')
-	parser.add_argument('gridset1', type=str, help='Path to the first .gridset file')
-	parser.add_argument('gridset2', nargs='?', type=str, help='Path to the second .gridset file')
+	parser = argparse.ArgumentParser(description='Compare the language content of two .gridset (or .obz/.obf, or TouchChat .ce/.c4v) files.')
+	parser.add_argument('gridset1', type=str, help='Path to the first .gridset, .obz, .obf, .ce or .c4v file')
+	parser.add_argument('gridset2', nargs='?', type=str, help='Path to the second .gridset, .obz, .obf, .ce or .c4v file')
 	parser.add_argument('--gridset1home', type=str, help='Override home grid name for the first gridset', default=None)
 	parser.add_argument('--gridset2home', type=str, help='Override home grid name for the second gridset', default=None)
 	parser.add_argument('--output', type=str, help='output directory for csv files', default=None)
+	parser.add_argument('--profiles', type=str, help='JSON file of scoring profiles; scores every gridset under each of them (see ScoringProfiles.py)', default=None)
 
 	args = parser.parse_args()
-	screen_dimensions = (1920, 1080)  # Define screen dimensions
+	if args.profiles:
+		score_pagesets_for_profiles(args)
+		return
 
-	scan_time_per_unit = 1	# Example value, adjust as needed
-	selection_time = 0.5  # Example value, adjust as needed
+	screen_dimensions = DEFAULT_PROFILE.screen_dimensions
+	scan_time_per_unit = DEFAULT_PROFILE.scan_time_per_unit
+	selection_time = DEFAULT_PROFILE.selection_time
 	
-	extract_gridset_contents(args.gridset1, os.path.join(args.output,"ExtractedGrids/extracted1"))
-
-	home_grid1 = args.gridset1home or get_home_grid_from_settings(os.path.join(args.output,"ExtractedGrids/extracted1/Settings0/settings.xml"))
-	navigation_map1, relevant_xml_files_1 = build_navigation_map_and_find_relevant_files(os.path.join(args.output,"ExtractedGrids/extracted1/Grids", home_grid1, "grid.xml"))
+	home_grid1, navigation_map1, relevant_xml_files_1 = load_pageset(args.gridset1, os.path.join(args.output,"ExtractedGrids/extracted1"), args.gridset1home)
 
 	
 	if args.gridset2:	
-		extract_gridset_contents(args.gridset2, os.path.join(args.output,"ExtractedGrids/extracted2"))
-
-		# Extract home grid names from settings files of each gridset
-	
-		home_grid2 = args.gridset2home or get_home_grid_from_settings(os.path.join(args.output,"ExtractedGrids/extracted2/Settings0/settings.xml"))
-		
-		# Build navigation maps and find relevant XML files for each gridset
-		navigation_map2, relevant_xml_files_2 = build_navigation_map_and_find_relevant_files(os.path.join(args.output,"ExtractedGrids/extracted2/Grids", home_grid2, "grid.xml"))
+		# Extract home grid names, build navigation maps and find relevant pages for each gridset
+		home_grid2, navigation_map2, relevant_xml_files_2 = load_pageset(args.gridset2, os.path.join(args.output,"ExtractedGrids/extracted2"), args.gridset2home)
 	
 		# Process and save CSV data for each gridset
 		gridset1_data = process_gridset_for_csv(relevant_xml_files_1, navigation_map1, screen_dimensions, home_grid1,scan_time_per_unit, selection_time)
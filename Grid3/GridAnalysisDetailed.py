@@ -6,9 +6,15 @@ import math
 from collections import Counter
 from collections import deque
 from collections import defaultdict
+from collections import namedtuple
 import csv
 import subprocess
 import sys
+from GridGeometry import PageGeometry, page_movement_times
+from GridScanning import SCAN_PATTERNS, simulate_scanning, scanning_times
+
+# Scan pattern used for the block scanning effort; see GridScanning.SCAN_PATTERNS
+SCAN_PATTERN = 'row-column'
 
 
 def install_and_import_nltk():
@@ -55,6 +61,29 @@ def get_word_type(word):
     return word_type
 
 
+# What the analysis needs from a cell's text: its words, whether it is a phrase and its word type
+CellFeatures = namedtuple('CellFeatures', ['words', 'is_phrase', 'word_type'])
+
+# Features of every distinct cell text seen in this run, shared by all pages and gridsets
+feature_cache = {}
+
+
+def extract_cell_features(text):
+    """
+    Split and tag a cell's text once; repeats of the same text come from feature_cache.
+
+    Only single words are tagged (get_word_type), so a text costs at most one
+    tagging call the first time it is seen and none after that.
+    """
+    features = feature_cache.get(text)
+    if features is None:
+        words = tuple(text.split())
+        is_phrase = len(words) > 1
+        word_type = 'PHRASE' if is_phrase else get_word_type(text)
+        features = feature_cache[text] = CellFeatures(words, is_phrase, word_type)
+    return features
+
+
 def parse_xml(file_path):
     tree = ET.parse(file_path)
     root = tree.getroot()
@@ -190,7 +219,7 @@ def calculate_button_coordinates(button_position, grid_rows, grid_cols, screen_d
     return round(x, 2), round(y, 2)
 
 
-def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_position, screen_dimensions, home_grid, button_grid, navigation_map):
+def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_position, screen_dimensions, home_grid, button_grid, navigation_map, button_rectangle=None, start_position=None):
     """
     Calculate the effort score for a button in a gridset using direct selection technique.
 
@@ -202,6 +231,9 @@ def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_po
     :param home_grid: Name of the home grid.
     :param button_grid: Name of the grid where the button is located.
     :param navigation_map: A dictionary representing the navigation paths between grids.
+    :param button_rectangle: Optional (left, top, width, height) of the button from GridGeometry; when given,
+        the button's real size (spans and row/column sizes) and centre are used instead of one grid cell.
+    :param start_position: Optional (x, y) the distance is measured from (default: the bottom-right corner).
     :return: Total effort score for the button.
     """
     BUTTON_SIZE_WEIGHT = 0.003
@@ -218,17 +250,23 @@ def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_po
             f"Invalid button position: {button_position} in {button_grid}. Skipping this button.")
         return 0, 0  # Return default effort and hits
 
-    button_size = BUTTON_SIZE_WEIGHT * grid_rows * grid_cols
+    screen_width, screen_height = screen_dimensions
+    if button_rectangle is not None:
+        # How many buttons of this size would fill the screen
+        left, top, width, height = button_rectangle
+        button_size = BUTTON_SIZE_WEIGHT * (screen_width * screen_height) / (width * height) if width and height else 0
+        end_x, end_y = left + width / 2, top + height / 2
+    else:
+        button_size = BUTTON_SIZE_WEIGHT * grid_rows * grid_cols
+        end_x, end_y = calculate_button_coordinates(
+            (row, col), grid_rows, grid_cols, screen_dimensions)
     field_size = FIELD_SIZE_WEIGHT * total_visible_buttons
     # Calculate the linear scan position (assuming left-to-right, top-to-bottom scanning)
     linear_position = (row - 1) * grid_cols + col
     prior_scan = PRIOR_SCAN_WEIGHT * linear_position
 
-    button_coordinates = calculate_button_coordinates(
-        (row, col), grid_rows, grid_cols, screen_dimensions)
-    screen_width, screen_height = screen_dimensions
-    end_x, end_y = button_coordinates
-    start_x, start_y = screen_width, screen_height  # Default starting position
+    # Default starting position
+    start_x, start_y = start_position or (screen_width, screen_height)
     distance = math.sqrt(((start_x - end_x) / screen_width) **
                          2 + ((start_y - end_y) / screen_height) ** 2) / math.sqrt(2)
 
@@ -244,82 +282,42 @@ def calculate_grid_effort(grid_rows, grid_cols, total_visible_buttons, button_po
     return round(total_effort, 2), hits
 
 
-def group_cells_by_scanblock(all_cells):
-    """
-    Group cells by their ScanBlock attribute.
-    :param all_cells: List of all cell elements.
-    :return: Dictionary with block numbers as keys and lists of cells as values.
-    """
-    blocks = defaultdict(list)
-    for cell in all_cells:
-        # Default to '1' if not specified
-        block_num = cell.get('ScanBlock', '1')
-        blocks[block_num].append(cell)
-    return blocks
-
-
-def calculate_block_selection_effort(block_num, total_blocks, scan_time_per_unit):
-    """
-    Calculate the effort to select a block during the initial scanning phase.
-    :param block_num: The block number being selected.
-    :param total_blocks: Total number of scanning blocks on the page.
-    :param scan_time_per_unit: Scanning time per unit.
-    :return: The effort score for selecting the block.
+def calculate_block_scanning_effort(cell_data_list, scan_time_per_unit, selection_time, scan_pattern=None):
     """
-    return (block_num - 1) * scan_time_per_unit
+    Calculate the scanning effort for each cell of one page, scanning ScanBlocks first.
 
+    The scan order for the whole page is worked out once by GridScanning.simulate_scanning;
+    cells without a grid position get an effort of 0.
 
-def calculate_intra_block_effort(block_cells, scan_time_per_unit, selection_time):
-    """
-    Calculate the effort to select a specific cell within a block using row-column scanning.
-    :param block_cells: List of cells within the block.
-    :param scan_time_per_unit: Scanning time per unit.
-    :param selection_time: Time taken to make a selection.
-    :return: The total effort score within the block.
+    :param cell_data_list: List of dictionaries for one page's cells, with 'position' (0-based x, y) and 'ScanBlock'.
+    :param scan_time_per_unit: Time taken to scan each unit (block, row, column or cell).
+    :param selection_time: Time taken for each switch press.
+    :param scan_pattern: One of GridScanning.SCAN_PATTERNS (default: SCAN_PATTERN).
+    :return: cell_data_list, with 'Block Scanning Effort' and 'Block Scan Steps' added to each cell.
     """
-    intra_block_effort = 0
-    for cell in block_cells:
-        x = int(cell.get('X', '1'))  # Default to '1' if not specified
-        y = int(cell.get('Y', '1'))  # Default to '1' if not specified
-        button_position = (x, y)
-        intra_block_effort += calculate_scanning_effort(
-            button_position, scan_time_per_unit, selection_time)
-    return intra_block_effort
-
-
-def calculate_block_scanning_effort(cell_data_list, scan_time_per_unit, selection_time):
-    """
-    Calculate the scanning effort for each cell considering block scanning.
-
-    :param cell_data_list: List of dictionaries, each containing cell data including scan block information.
-    :param scan_time_per_unit: Time taken to scan each unit (block or cell).
-    :param selection_time: Time taken for the selection action.
-    :return: Updated cell_data_list with block scanning effort scores.
-    """
-    sorted_cells = sorted(cell_data_list, key=lambda x: int(x['ScanBlock']))
-    current_block = None
-    block_start_index = 0  # Index of the first cell in the current block
-
-    # In the calculate_block_scanning_effort function
-    for i, cell in enumerate(sorted_cells):
-        if cell['ScanBlock'] != current_block:
-            current_block = cell['ScanBlock']
-            block_start_index = i
-
-        cell_xy = cell['xy']
-        start_cell_xy = sorted_cells[block_start_index]['xy']
-
-        # Check if valid coordinates are present
-        if isinstance(cell_xy, tuple) and isinstance(start_cell_xy, tuple):
-            row_effort = (cell_xy[0] - start_cell_xy[0]) * scan_time_per_unit
-            col_effort = (cell_xy[1] - start_cell_xy[1]) * scan_time_per_unit
-            cell['Block Scanning Effort'] = row_effort + \
-                col_effort + selection_time
-        else:
-            # Default value if invalid coordinates
-            cell['Block Scanning Effort'] = 0
-
-    return sorted_cells
+    placed = [cell for cell in cell_data_list
+              if isinstance(cell['position'][0], int) and isinstance(cell['position'][1], int)]
+    blocks = []
+    for cell in placed:
+        try:
+            blocks.append(int(cell['ScanBlock']))
+        except (TypeError, ValueError):
+            blocks.append(1)
+
+    steps, presses = simulate_scanning(
+        [cell['position'][0] for cell in placed],
+        [cell['position'][1] for cell in placed],
+        blocks,
+        scan_pattern or SCAN_PATTERN)
+    times = scanning_times(steps, presses, scan_time_per_unit, selection_time)
+
+    for cell in cell_data_list:
+        cell['Block Scanning Effort'] = 0
+        cell['Block Scan Steps'] = 0
+    for i, cell in enumerate(placed):
+        cell['Block Scanning Effort'] = float(times[i])
+        cell['Block Scan Steps'] = int(steps[i])
+    return cell_data_list
 
 
 def calculate_scanning_effort(button_position, scan_time_per_unit, selection_time):
@@ -370,27 +368,76 @@ def initialize_grid_matrix(grid_rows, grid_cols):
     return [[None for _ in range(grid_cols)] for _ in range(grid_rows)]
 
 
-def find_first_empty_cell(grid_matrix):
-    """Find the first empty cell in the grid matrix."""
-    for y, row in enumerate(grid_matrix):
-        for x, cell in enumerate(row):
-            if cell is None:  # If cell is empty
-                return x, y
-    return 'N/A', 'N/A'  # Return 'N/A' if no empty cell is found
+class OccupancyGrid:
+    """
+    Tracks which cells of a page are taken, so auto-placed cells can be put in the first free space.
 
+    Each row (and column) is kept as a bitmap in a Python int with a bit set
+    for every free cell, so checking a span is a few bit operations rather than
+    a scan of the grid. Cells are only ever taken, never freed, so the first
+    free cell only moves forward; a pointer to it means each search starts
+    where the last one left off and placing a whole page is O(cells).
+    """
 
-def find_empty_position_in_row(grid_matrix, y):
-    for x, cell in enumerate(grid_matrix[y]):
-        if cell is None:
-            return x, y
-    return 'N/A', y
+    def __init__(self, grid_rows, grid_cols):
+        self.rows = grid_rows
+        self.cols = grid_cols
+        self.row_free = [(1 << grid_cols) - 1] * grid_rows
+        self.col_free = [(1 << grid_rows) - 1] * grid_cols
+        self.next_free_row = 0
+
+    @staticmethod
+    def _first_run(bits, length):
+        """Index of the lowest run of ``length`` set bits in ``bits``, or None."""
+        for shift in range(1, length):
+            bits &= bits >> shift
+        if not bits:
+            return None
+        return (bits & -bits).bit_length() - 1
+
+    def _span_bits(self, bitmaps, start, span):
+        """Cells free in all of bitmaps[start:start + span]."""
+        bits = -1
+        for bitmap in bitmaps[start:start + span]:
+            bits &= bitmap
+        return bits if start + span <= len(bitmaps) else 0
+
+    def occupy(self, x, y, column_span=1, row_span=1):
+        """Mark the cells covered by a cell at (x, y) as taken; parts off the grid are ignored."""
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + column_span, self.cols), min(y + row_span, self.rows)
+        if x0 >= x1 or y0 >= y1:
+            return
+        row_mask = ~(((1 << (x1 - x0)) - 1) << x0)
+        col_mask = ~(((1 << (y1 - y0)) - 1) << y0)
+        for row in range(y0, y1):
+            self.row_free[row] &= row_mask
+        for col in range(x0, x1):
+            self.col_free[col] &= col_mask
+        while self.next_free_row < self.rows and not self.row_free[self.next_free_row]:
+            self.next_free_row += 1
+
+    def first_free(self, column_span=1, row_span=1):
+        """First (x, y), in reading order, where a cell of this span fits, or None."""
+        for y in range(self.next_free_row, self.rows - row_span + 1):
+            x = self._first_run(self._span_bits(self.row_free, y, row_span), column_span)
+            if x is not None:
+                return x, y
+        return None
 
+    def free_in_row(self, y, column_span=1, row_span=1):
+        """First (x, y) in row y where a cell of this span fits, or None."""
+        if not 0 <= y < self.rows:
+            return None
+        x = self._first_run(self._span_bits(self.row_free, y, row_span), column_span)
+        return (x, y) if x is not None else None
 
-def find_empty_position_in_column(grid_matrix, x):
-    for y, row in enumerate(grid_matrix):
-        if row[x] is None:
-            return x, y
-    return x, 'N/A'
+    def free_in_column(self, x, column_span=1, row_span=1):
+        """First (x, y) in column x where a cell of this span fits, or None."""
+        if not 0 <= x < self.cols:
+            return None
+        y = self._first_run(self._span_bits(self.col_free, x, column_span), row_span)
+        return (x, y) if y is not None else None
 
 
 def extract_combined_cell_and_wordlist_contents(xml_root, grid_name, screen_dimensions):
@@ -402,47 +449,31 @@ def extract_combined_cell_and_wordlist_contents(xml_root, grid_name, screen_dime
     grid_rows = len(xml_root.findall(".//RowDefinitions/RowDefinition"))
     grid_cols = len(xml_root.findall(".//ColumnDefinitions/ColumnDefinition"))
 
-    # Initialize an empty grid matrix
-    grid_matrix = [[None for _ in range(grid_cols)] for _ in range(grid_rows)]
-
-    # Process cells with known positions
+    # Cells with known positions take their space first
+    occupancy = OccupancyGrid(grid_rows, grid_cols)
     for cell in xml_root.findall(".//Cell"):
         cell_data = process_cell(cell, grid_rows, grid_cols, screen_dimensions)
+        cell_x, cell_y = cell_data['Position']
+        if cell_x != 'N/A' and cell_y != 'N/A':
+            occupancy.occupy(cell_x, cell_y, cell_data['ColumnSpan'], cell_data['RowSpan'])
+        combined_contents.append(cell_data)
 
-        if cell_data['Position'] != ('N/A', 'N/A'):
-            adjusted_cell_x, adjusted_cell_y = cell_data['Position']
-            grid_matrix[adjusted_cell_y][adjusted_cell_x] = cell_data
-            combined_contents.append(cell_data)
-        else:
-            # Keep the cell data for the second pass
-            combined_contents.append(cell_data)
-
-    # Process cells with unknown positions in the second pass
+    # Then cells with unknown positions go in the first free space that fits them
     for cell_data in combined_contents:
-        # Initialize cell_x and cell_y to 'N/A'
-        cell_x, cell_y = 'N/A', 'N/A'
-
-        if cell_data['Position'] == ('N/A', 'N/A'):
-            # Both coordinates are missing
-            cell_x, cell_y = find_first_empty_cell(grid_matrix)
-        elif cell_data['Position'][0] == 'N/A':
-            # X coordinate is missing
-            _, cell_y = cell_data['Position']
-            cell_x, _ = find_empty_position_in_row(grid_matrix, cell_y)
-        elif cell_data['Position'][1] == 'N/A':
-            # Y coordinate is missing
-            cell_x, _ = cell_data['Position']
-            _, cell_y = find_empty_position_in_column(grid_matrix, cell_x)
+        cell_x, cell_y = cell_data['Position']
+        spans = (cell_data['ColumnSpan'], cell_data['RowSpan'])
+        if cell_x == 'N/A' and cell_y == 'N/A':
+            spot = occupancy.first_free(*spans)
+        elif cell_x == 'N/A':
+            spot = occupancy.free_in_row(cell_y, *spans)
+        elif cell_y == 'N/A':
+            spot = occupancy.free_in_column(cell_x, *spans)
+        else:
+            continue
 
-        if cell_x != 'N/A' and cell_y != 'N/A':
-            adjusted_cell_x = cell_x - 1
-            adjusted_cell_y = cell_y - 1
-            cell_data['Position'] = (adjusted_cell_x, adjusted_cell_y)
-            if 0 <= adjusted_cell_x < len(grid_matrix[0]) and 0 <= adjusted_cell_y < len(grid_matrix):
-                grid_matrix[adjusted_cell_y][adjusted_cell_x] = cell_data
-            else:
-                print(
-                    f"Cell position out of range for {grid_name}: ({adjusted_cell_x}, {adjusted_cell_y})")
+        if spot is not None:
+            cell_data['Position'] = spot
+            occupancy.occupy(*spot, *spans)
         else:
             print(f"No available position for cell in {grid_name}")
 
@@ -510,6 +541,9 @@ def process_cell(cell, grid_rows, grid_cols, screen_dimensions):
     height = cell.get('Height')  # May be None
 
     cell_data['Position'] = cell_position
+    cell_data['ColumnSpan'] = column_span
+    cell_data['RowSpan'] = row_span
+    cell_data['ScanBlock'] = scan_block
     return cell_data
 
 
@@ -534,13 +568,26 @@ def process_wordlist_item(wordlist_item, wordlist_positions, wordlist_grid_posit
     return wordlist_data
 
 
-def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time, consider_block_scanning=True):
+def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time, consider_block_scanning=True, scan_pattern=None):
     root = parse_xml(file)
     grid_name = get_grid_name_from_path(file)
 
     combined_contents = extract_combined_cell_and_wordlist_contents(
         root, grid_name, screen_dimensions)
 
+    # Button rectangles and Fitts' law movement times for the whole page at once
+    placed = [data for data in combined_contents
+              if isinstance(data['Position'][0], int) and isinstance(data['Position'][1], int)]
+    movement_times, (lefts, tops, widths, heights) = page_movement_times(
+        PageGeometry.from_xml(root, screen_dimensions),
+        [data['Position'][0] for data in placed],
+        [data['Position'][1] for data in placed],
+        [data.get('ColumnSpan', 1) for data in placed],
+        [data.get('RowSpan', 1) for data in placed],
+    )
+    page_geometry = {id(data): (float(movement_times[i]), (lefts[i], tops[i], widths[i], heights[i]))
+                     for i, data in enumerate(placed)}
+
     word_count = Counter()
     phrase_count = 0
     cell_data_list = []
@@ -548,16 +595,18 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
     num_cells = 0
     word_type_count = Counter()
 
+    # The same for every cell on the page
+    path_str = ' -> '.join(find_path(home_grid, grid_name, navigation_map))
+    rows = len(root.findall(".//RowDefinitions/RowDefinition"))
+    cols = len(root.findall(".//ColumnDefinitions/ColumnDefinition"))
+    cells = len(root.findall(".//Cell"))
+
     for data in combined_contents:
-        word_count.update(data['Text'].split())
-        phrase_count += 1 if len(data['Text'].split()) > 1 else 0
+        features = extract_cell_features(data['Text'])
+        word_count.update(features.words)
+        phrase_count += 1 if features.is_phrase else 0
         # Default to (1, 1) if not specified
         grid_position = data.get('XY', (1, 1))
-        path_to_button = find_path(home_grid, grid_name, navigation_map)
-        path_str = ' -> '.join(path_to_button)
-        rows = len(root.findall(".//RowDefinitions/RowDefinition"))
-        cols = len(root.findall(".//ColumnDefinitions/ColumnDefinition"))
-        cells = len(root.findall(".//Cell"))
         # Default to '1' if not specified
         scan_block = data.get('ScanBlock', '1')
         # Default to '1' if not specified
@@ -583,14 +632,14 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
             grid_position, scan_time_per_unit, selection_time
         )
 
+        movement_time, button_rectangle = page_geometry.get(id(data), (0, None))
         effort_score, hits = calculate_grid_effort(
-            rows, cols, cells, grid_position, screen_dimensions, home_grid, grid_name, navigation_map
+            rows, cols, cells, grid_position, screen_dimensions, home_grid, grid_name, navigation_map,
+            button_rectangle
         )
         total_hits += hits
 
-        word_type = 'PHRASE' if len(
-            data['Text'].split()) > 1 else get_word_type(data['Text'])
-        word_type_count[word_type] += 1
+        word_type_count[features.word_type] += 1
 
         # Add cell data including new attributes for block scanning
         cell_data = {
@@ -605,11 +654,12 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
             'path': path_str,
             'cell_type': data['CellType'],
             'cellText': data['CellText'],
-            'word_type': 'PHRASE' if len(data['Text'].split()) > 1 else get_word_type(data['Text']),
+            'word_type': features.word_type,
             'ScanBlock': scan_block,
             'ColumnSpan': column_span,
             'RowSpan': row_span,
-            'Regular Scanning Effort': regular_scanning_effort
+            'Regular Scanning Effort': regular_scanning_effort,
+            'Movement Time': round(movement_time, 3)
         }
         cell_data_list.append(cell_data)
         num_cells += 1
@@ -619,12 +669,12 @@ def process_single_grid_file(file, navigation_map, screen_dimensions, home_grid,
     # This function should modify each cell's data to include the block scanning effort
     if consider_block_scanning:
         calculate_block_scanning_effort(
-            cell_data_list, scan_time_per_unit, selection_time)
+            cell_data_list, scan_time_per_unit, selection_time, scan_pattern)
 
     return word_count, phrase_count, cell_data_list, total_hits, num_cells, word_type_count
 
 
-def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, navigation_map2, screen_dimensions, home_grid1, home_grid2, scan_time_per_unit, selection_time):
+def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, navigation_map2, screen_dimensions, home_grid1, home_grid2, scan_time_per_unit, selection_time, scan_pattern=None):
     # Initialize variables
     word_counts_1, phrase_counts_1, effort_scores_1, cell_data_1, total_hits_1, num_cells_1 = Counter(), 0, [
     ], [], 0, 0
@@ -636,7 +686,8 @@ def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, naviga
     # Process each file in gridset 1
     for file in grid_xml_files_1:
         word_count, phrase_count, cell_data, hits, num_cells, word_type_count = process_single_grid_file(
-            file, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time
+            file, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time,
+            scan_pattern=scan_pattern
         )
         word_counts_1.update(word_count)
         phrase_counts_1 += phrase_count
@@ -649,7 +700,8 @@ def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, naviga
     # Process each file in gridset 2
     for file in grid_xml_files_2:
         word_count, phrase_count, cell_data, hits, num_cells, word_type_count = process_single_grid_file(
-            file, navigation_map2, screen_dimensions, home_grid2, scan_time_per_unit, selection_time
+            file, navigation_map2, screen_dimensions, home_grid2, scan_time_per_unit, selection_time,
+            scan_pattern=scan_pattern
         )
         word_counts_2.update(word_count)
         phrase_counts_2 += phrase_count
@@ -701,7 +753,7 @@ def compare_gridsets(grid_xml_files_1, grid_xml_files_2, navigation_map1, naviga
     return comparison_results
 
 
-def analyze_single_gridset(grid_xml_files, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time):
+def analyze_single_gridset(grid_xml_files, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time, scan_pattern=None):
     word_counts, phrase_counts, cell_data, total_hits, num_cells = Counter(), 0, [
     ], 0, 0
     total_word_type_count = Counter()
@@ -709,7 +761,8 @@ def analyze_single_gridset(grid_xml_files, navigation_map, screen_dimensions, ho
     # Process each file in the gridset
     for file in grid_xml_files:
         word_count, phrase_count, cells, hits, cells_count, word_type_count = process_single_grid_file(
-            file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time)
+            file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time,
+            scan_pattern=scan_pattern)
         word_counts.update(word_count)
         phrase_counts += phrase_count
         cell_data.extend(cells)
@@ -734,14 +787,15 @@ def analyze_single_gridset(grid_xml_files, navigation_map, screen_dimensions, ho
     }
 
 
-def process_gridset_for_csv(grid_xml_files, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time):
+def process_gridset_for_csv(grid_xml_files, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time, scan_pattern=None):
     # Initialize list for CSV data
     csv_data = []
 
     # Process grid files
     for file in grid_xml_files:
         _, _, cell_data, _, _, _ = process_single_grid_file(
-            file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time
+            file, navigation_map, screen_dimensions, home_grid, scan_time_per_unit, selection_time,
+            scan_pattern=scan_pattern
         )
         for data in cell_data:
             csv_data.append({
@@ -750,6 +804,8 @@ def process_gridset_for_csv(grid_xml_files, navigation_map, screen_dimensions, h
                 'Regular Scanning Effort Score': data['Regular Scanning Effort'],
                 # Default to 0 if not present
                 'Block Scanning Effort Score': data.get('Block Scanning Effort', 0),
+                'Block Scan Steps': data.get('Block Scan Steps', 0),
+                'Movement Time': data['Movement Time'],
                 'Hits': data['hits'],
                 'Grid Name': data['grid_name'],
                 'Actual Position X': data['position_x'],
@@ -819,6 +875,8 @@ def main():
                         help='Override home grid name for the second gridset', default=None)
     parser.add_argument('--output', type=str,
                         help='output directory for csv files', default=None)
+    parser.add_argument('--scan-pattern', choices=SCAN_PATTERNS, default=SCAN_PATTERN,
+                        help='Scan pattern for the block scanning effort')
 
     args = parser.parse_args()
     screen_dimensions = (1920, 1080)  # Define screen dimensions
@@ -849,12 +907,12 @@ def main():
 
         # Process and save CSV data for each gridset
         gridset1_data = process_gridset_for_csv(
-            relevant_xml_files_1, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time)
+            relevant_xml_files_1, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time, args.scan_pattern)
         save_to_csv(gridset1_data, os.path.join(
             args.output, "gridset1_data.csv"))
 
         gridset2_data = process_gridset_for_csv(
-            relevant_xml_files_2, navigation_map2, screen_dimensions, home_grid2, scan_time_per_unit, selection_time)
+            relevant_xml_files_2, navigation_map2, screen_dimensions, home_grid2, scan_time_per_unit, selection_time, args.scan_pattern)
         save_to_csv(gridset2_data, os.path.join(
             args.output, 'gridset2_data.csv'))
 
@@ -878,17 +936,17 @@ def main():
 
         # Compare gridsets
         results = compare_gridsets(relevant_xml_files_1, relevant_xml_files_2, navigation_map1,
-                                   navigation_map2, screen_dimensions, home_grid1, home_grid2, scan_time_per_unit, selection_time)
+                                   navigation_map2, screen_dimensions, home_grid1, home_grid2, scan_time_per_unit, selection_time, args.scan_pattern)
 
     else:
         # Compare gridsets
         gridset_data = process_gridset_for_csv(
-            relevant_xml_files_1, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time)
+            relevant_xml_files_1, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time, args.scan_pattern)
         save_to_csv(gridset_data, 'gridset_data.csv')
 
         # Analyze single gridset
         results = analyze_single_gridset(
-            relevant_xml_files_1, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time)
+            relevant_xml_files_1, navigation_map1, screen_dimensions, home_grid1, scan_time_per_unit, selection_time, args.scan_pattern)
 
     # Print results
     for key, value in results.items():
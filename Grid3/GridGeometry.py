@@ -0,0 +1,154 @@
+"""
+Button geometry and a Fitts' law movement-time model for the grid analyzers.
+
+A page's rows and columns needn't all be the same size (RowDefinition Height
+and ColumnDefinition Width are relative weights) and a cell can span several of
+them (ColumnSpan/RowSpan), so a button's on-screen rectangle is worked out from
+the track edges rather than from rows x columns. All functions take NumPy
+arrays with one entry per button, so a whole page is handled in one call.
+
+Movement time follows Fitts' law (Shannon form, "smaller of" target width):
+
+	MT = FITTS_INTERCEPT + FITTS_SLOPE * log2(distance / min(width, height) + 1)
+
+The default constants are typical published values for touch and pointer
+selection; NuVoice/LAMAnalytics.py measures a user's real selection times if
+you want to fit your own.
+"""
+import numpy as np
+
+# Seconds, and seconds per bit of difficulty
+FITTS_INTERCEPT = 0.2
+FITTS_SLOPE = 0.15
+
+
+def track_weights(definitions, attribute):
+	"""
+	Relative sizes of a page's rows or columns.
+
+	:param definitions: RowDefinition or ColumnDefinition elements.
+	:param attribute: 'Height' or 'Width'. Missing or unreadable values count as 1.
+	"""
+	weights = []
+	for definition in definitions:
+		value = (definition.get(attribute) or '').rstrip('*')
+		try:
+			weight = float(value)
+		except ValueError:
+			weight = 1.0
+		weights.append(weight if weight > 0 else 1.0)
+	return np.array(weights, dtype=np.float64)
+
+
+def track_edges(weights, length):
+	"""Screen coordinates of the edges of each track: len(weights) + 1 values from 0 to length."""
+	edges = np.concatenate(([0.0], np.cumsum(weights)))
+	return edges * (length / edges[-1]) if edges[-1] else edges
+
+
+class PageGeometry:
+	"""The row and column edges of one page on a screen of the given size."""
+
+	def __init__(self, row_weights, col_weights, screen_dimensions):
+		screen_width, screen_height = screen_dimensions
+		self.screen_dimensions = screen_dimensions
+		self.row_edges = track_edges(np.asarray(row_weights, dtype=np.float64), screen_height)
+		self.col_edges = track_edges(np.asarray(col_weights, dtype=np.float64), screen_width)
+
+	@classmethod
+	def uniform(cls, grid_rows, grid_cols, screen_dimensions):
+		"""A page with equally sized rows and columns (e.g. an OBF board)."""
+		return cls(np.ones(max(grid_rows, 0)), np.ones(max(grid_cols, 0)), screen_dimensions)
+
+	@classmethod
+	def from_xml(cls, xml_root, screen_dimensions):
+		"""A Grid 3 page from its RowDefinitions and ColumnDefinitions."""
+		return cls(
+			track_weights(xml_root.findall(".//RowDefinitions/RowDefinition"), 'Height'),
+			track_weights(xml_root.findall(".//ColumnDefinitions/ColumnDefinition"), 'Width'),
+			screen_dimensions,
+		)
+
+	@property
+	def rows(self):
+		return len(self.row_edges) - 1
+
+	@property
+	def cols(self):
+		return len(self.col_edges) - 1
+
+	def rectangles(self, xs, ys, column_spans=1, row_spans=1):
+		"""
+		Screen rectangles of buttons at 0-based grid positions, clipped to the page.
+
+		A button that clipping leaves with no width or height (one placed outside
+		the defined rows or columns) is given one average cell's instead, so it
+		never scores as a zero-sized target.
+
+		:param xs: Column of each button.
+		:param ys: Row of each button.
+		:param column_spans: Columns each button covers (array or a single value).
+		:param row_spans: Rows each button covers (array or a single value).
+		:return: Tuple of arrays (left, top, width, height).
+		"""
+		xs = np.asarray(xs, dtype=np.int64)
+		ys = np.asarray(ys, dtype=np.int64)
+		first_col = np.clip(xs, 0, self.cols)
+		first_row = np.clip(ys, 0, self.rows)
+		last_col = np.clip(xs + np.maximum(np.asarray(column_spans, dtype=np.int64), 1), 0, self.cols)
+		last_row = np.clip(ys + np.maximum(np.asarray(row_spans, dtype=np.int64), 1), 0, self.rows)
+		left = self.col_edges[first_col]
+		top = self.row_edges[first_row]
+		width = self.col_edges[last_col] - left
+		height = self.row_edges[last_row] - top
+		screen_width, screen_height = self.screen_dimensions
+		width = np.where(width > 0, width, screen_width / max(self.cols, 1))
+		height = np.where(height > 0, height, screen_height / max(self.rows, 1))
+		return left, top, width, height
+
+	def centres(self, xs, ys, column_spans=1, row_spans=1):
+		"""Screen centre (x, y) arrays of buttons at 0-based grid positions."""
+		left, top, width, height = self.rectangles(xs, ys, column_spans, row_spans)
+		return left + width / 2, top + height / 2
+
+
+def index_of_difficulty(start_x, start_y, end_x, end_y, width, height):
+	"""Fitts' index of difficulty, in bits, of moving from start to targets of the given size."""
+	distance = np.hypot(np.subtract(end_x, start_x), np.subtract(end_y, start_y))
+	target = np.minimum(width, height)
+	with np.errstate(divide='ignore', invalid='ignore'):
+		ratio = np.where(target > 0, distance / target, 0.0)
+	return np.log2(ratio + 1)
+
+
+def movement_times(start_x, start_y, end_x, end_y, width, height, intercept=FITTS_INTERCEPT, slope=FITTS_SLOPE):
+	"""Predicted seconds to move from start to each target and select it."""
+	return intercept + slope * index_of_difficulty(start_x, start_y, end_x, end_y, width, height)
+
+
+def sequence_movement_times(left, top, width, height, start, intercept=FITTS_INTERCEPT, slope=FITTS_SLOPE):
+	"""
+	Seconds for each move in a sequence of selections: from ``start`` to the first target, then target to target.
+
+	:param left, top, width, height: Target rectangles in selection order.
+	:param start: (x, y) the pointer starts from.
+	"""
+	centre_x = np.asarray(left) + np.asarray(width) / 2
+	centre_y = np.asarray(top) + np.asarray(height) / 2
+	from_x = np.concatenate(([start[0]], centre_x[:-1]))
+	from_y = np.concatenate(([start[1]], centre_y[:-1]))
+	return movement_times(from_x, from_y, centre_x, centre_y, width, height, intercept, slope)
+
+
+def page_movement_times(geometry, xs, ys, column_spans=1, row_spans=1, start=None, intercept=FITTS_INTERCEPT, slope=FITTS_SLOPE):
+	"""
+	Seconds to reach each button on a page from a resting point (the screen centre by default).
+
+	:return: Tuple (movement times, (left, top, width, height)).
+	"""
+	rectangles = geometry.rectangles(xs, ys, column_spans, row_spans)
+	left, top, width, height = rectangles
+	if start is None:
+		start = (geometry.screen_dimensions[0] / 2, geometry.screen_dimensions[1] / 2)
+	times = movement_times(start[0], start[1], left + width / 2, top + height / 2, width, height, intercept, slope)
+	return times, rectangles
@@ -0,0 +1,138 @@
+"""
+Switch-scanning simulator for the grid analyzers.
+
+For every button on a page it works out how many highlight steps and how many
+switch presses it takes to reach it, for a given scan pattern:
+
+- linear: every button in reading order
+- row-column: rows top to bottom, then the buttons of the chosen row
+- column-row: columns left to right, then the buttons of the chosen column
+- elimination: the buttons (in reading order) are split in half, the user picks
+  a half, and so on until one button is left
+
+With more than one ScanBlock on a page the blocks are scanned first, in block
+number order, and the pattern then runs inside the chosen block. Only rows,
+columns and blocks that have buttons in them are highlighted.
+
+Everything is computed for a whole page at once on NumPy arrays.
+"""
+import numpy as np
+
+SCAN_PATTERNS = ('linear', 'row-column', 'column-row', 'elimination')
+
+
+def group_ranks(keys):
+	"""
+	For each entry, its position among the entries that share its key, in array order.
+
+	:param keys: 1-D integer array; entries must already be sorted so that equal keys are together.
+	"""
+	if not keys.size:
+		return keys.copy()
+	starts = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+	sizes = np.diff(np.concatenate((starts, [keys.size])))
+	return np.arange(keys.size) - np.repeat(starts, sizes)
+
+
+def dense_ranks(group, values):
+	"""
+	For each entry, how many distinct smaller ``values`` exist in the same ``group``.
+
+	Used to count the occupied rows (or columns, or blocks) scanned before an entry's own.
+	"""
+	# One key per (group, value); unique keys come back sorted, so each group's values are together and in order
+	width = values.max() + 1
+	keys, inverse = np.unique(group * width + values, return_inverse=True)
+	return group_ranks(keys // width)[inverse.reshape(-1)]
+
+
+def elimination_steps(order, group):
+	"""
+	Steps and presses for halving elimination scanning.
+
+	:param order: Position of each entry in reading order within its group.
+	:param group: Group of each entry (scanning happens inside a group).
+	"""
+	sizes = np.bincount(group)[group]
+	low = np.zeros_like(order)
+	high = sizes.copy()
+	steps = np.zeros_like(order)
+	presses = np.zeros_like(order)
+	while True:
+		active = high - low > 1
+		if not active.any():
+			return steps, presses
+		middle = (low + high + 1) // 2
+		second_half = active & (order >= middle)
+		# The first half is highlighted first; picking the second half costs one more step
+		steps += second_half
+		presses += active
+		low = np.where(second_half, middle, low)
+		high = np.where(active & ~second_half, middle, high)
+
+
+def simulate_scanning(xs, ys, blocks=None, pattern='row-column'):
+	"""
+	Highlight steps and switch presses to reach each button on one page.
+
+	Steps count the highlights moved past before the wanted one at every level
+	(so the first item of each level costs 0 steps); presses count the levels.
+
+	:param xs: 0-based column of each button.
+	:param ys: 0-based row of each button.
+	:param blocks: ScanBlock of each button (default: all in one block).
+	:param pattern: One of SCAN_PATTERNS.
+	:return: Tuple of arrays (steps, presses).
+	"""
+	if pattern not in SCAN_PATTERNS:
+		raise ValueError(f"Unknown scan pattern {pattern!r}; use one of {', '.join(SCAN_PATTERNS)}")
+	xs = np.asarray(xs, dtype=np.int64)
+	ys = np.asarray(ys, dtype=np.int64)
+	count = xs.size
+	if not count:
+		return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+	if blocks is None:
+		blocks = np.zeros(count, dtype=np.int64)
+	else:
+		# Blocks are scanned in number order; only blocks with buttons count
+		_, blocks = np.unique(np.asarray(blocks, dtype=np.int64), return_inverse=True)
+		blocks = blocks.reshape(-1)
+
+	steps = np.zeros(count, dtype=np.int64)
+	presses = np.zeros(count, dtype=np.int64)
+	if blocks.max() > 0:
+		steps += blocks
+		presses += 1
+
+	if pattern == 'column-row':
+		major, minor = xs, ys
+	else:
+		major, minor = ys, xs
+
+	# Reading order within each block: by block, then major, then minor
+	order = np.lexsort((minor, major, blocks))
+	rank_in_block = np.empty(count, dtype=np.int64)
+	rank_in_block[order] = group_ranks(blocks[order])
+
+	if pattern == 'linear':
+		steps += rank_in_block
+		presses += 1
+	elif pattern == 'elimination':
+		elimination, levels = elimination_steps(rank_in_block, blocks)
+		steps += elimination
+		presses += np.maximum(levels, 1)
+	else:
+		# Row (or column) first, then the button within it
+		steps += dense_ranks(blocks, major)
+		line = blocks * (major.max() + 1) + major
+		line_order = np.lexsort((minor, line))
+		rank_in_line = np.empty(count, dtype=np.int64)
+		rank_in_line[line_order] = group_ranks(line[line_order])
+		steps += rank_in_line
+		presses += 2
+	return steps, presses
+
+
+def scanning_times(steps, presses, scan_time_per_unit, selection_time):
+	"""Seconds to reach each button: each step waits one scan interval and each press takes selection_time."""
+	return steps * scan_time_per_unit + presses * selection_time
@@ -0,0 +1,229 @@
+"""
+Extract spoken phrases from Grid 3's history databases, only collecting what's new since the last run.
+
+Grid 3 keeps each user's history in Users/<user>/<lang>/Phrases/history.sqlite:
+PhraseHistory has a row (with a timestamp, in .NET ticks) every time a phrase
+is spoken, and PhraseId points at the phrase's text in Phrases.
+
+A watermark per user and language (the newest timestamp and PhraseHistory rowid
+seen) is kept in a JSON state file, and each run reads only rows past it:
+
+- on the timestamp, if the database has an index on it
+- otherwise on the rowid, which SQLite keeps in insertion order, so the
+  search is still a range scan of the table's own B-tree
+
+Databases are opened read-only and immutable (no locks, no journal), so this
+is meant for copies or for when Grid 3 isn't running; use --live otherwise.
+
+	python HistoryExtractor.py "C:\\Users\\Public\\Documents\\Smartbox\\Grid 3\\Users" --state watermarks.json --output history.csv
+"""
+import argparse
+import csv
+import datetime
+import json
+import os
+import sqlite3
+import sys
+import urllib.parse
+from collections import namedtuple
+
+# .NET DateTime ticks (100 ns since 0001-01-01) at the Unix epoch
+EPOCH_TICKS = 621355968000000000
+
+# Rows pulled from SQLite per fetchmany() call
+FETCH_BATCH_SIZE = 5000
+
+TEXT_COLUMNS = ('text', 'phrase', 'content', 'value')
+
+HistoryRow = namedtuple('HistoryRow', ['time', 'text', 'timestamp', 'rowid'])
+
+
+def connect_to_database(file_path, immutable=True):
+	"""Open a history.sqlite read-only; immutable also skips locking, for files nothing is writing to."""
+	uri = f"file:{urllib.parse.quote(os.path.abspath(file_path))}?mode=ro"
+	if immutable:
+		uri += "&immutable=1"
+	return sqlite3.connect(uri, uri=True)
+
+
+def table_columns(connection, table):
+	"""Column name (lower case) to real name, plus the INTEGER PRIMARY KEY column if the table has one."""
+	columns = {}
+	rowid_alias = None
+	for _, name, column_type, _, _, primary_key in connection.execute(f"PRAGMA table_info({table})"):
+		columns[name.lower()] = name
+		if primary_key == 1 and column_type.upper() == 'INTEGER':
+			rowid_alias = name
+	return columns, rowid_alias
+
+
+def is_indexed(connection, table, column):
+	"""Whether some index on ``table`` starts with ``column`` (so a range on it is an index search)."""
+	for index in connection.execute(f"PRAGMA index_list({table})").fetchall():
+		first = connection.execute(f"PRAGMA index_info({index[1]})").fetchone()
+		if first and first[2] and first[2].lower() == column.lower():
+			return True
+	return False
+
+
+def history_schema(connection):
+	"""
+	The column names this database uses.
+
+	:return: Dictionary with 'timestamp', 'phrase_id', 'text' and 'phrase_key' (the Phrases column PhraseId refers to).
+	"""
+	history, _ = table_columns(connection, 'PhraseHistory')
+	phrases, phrases_key = table_columns(connection, 'Phrases')
+	if not history or not phrases:
+		raise ValueError("Not a Grid 3 history database (no PhraseHistory/Phrases tables)")
+	timestamp = next((history[name] for name in history if 'time' in name or 'date' in name), None)
+	phrase_id = history.get('phraseid')
+	text = next((phrases[name] for name in TEXT_COLUMNS if name in phrases), None)
+	if not (timestamp and phrase_id and text):
+		raise ValueError(f"Unexpected history schema: PhraseHistory{sorted(history.values())}, Phrases{sorted(phrases.values())}")
+	return {'timestamp': timestamp, 'phrase_id': phrase_id, 'text': text, 'phrase_key': phrases.get('id', phrases_key or 'rowid')}
+
+
+def timestamp_to_seconds(value):
+	"""Epoch seconds for a history timestamp: .NET ticks, epoch (milli)seconds, or an ISO date string."""
+	if value is None:
+		return None
+	if isinstance(value, str):
+		try:
+			value = int(value)
+		except ValueError:
+			moment = datetime.datetime.fromisoformat(value.replace('Z', '+00:00'))
+			if moment.tzinfo is None:
+				moment = moment.replace(tzinfo=datetime.timezone.utc)
+			return moment.timestamp()
+	if value > 1e16:
+		return (value - EPOCH_TICKS) / 1e7
+	if value > 1e11:
+		return value / 1000
+	return float(value)
+
+
+def read_history(file_path, watermark=None, immutable=True):
+	"""
+	Yield a HistoryRow for each phrase spoken after ``watermark``, oldest first.
+
+	:param watermark: Dictionary with the 'timestamp' and 'rowid' of the last row already collected, or None for everything.
+	"""
+	connection = connect_to_database(file_path, immutable)
+	try:
+		schema = history_schema(connection)
+		timestamp = f"PhraseHistory.{schema['timestamp']}"
+		if not watermark:
+			where, parameters, order = "", (), timestamp
+		elif is_indexed(connection, 'PhraseHistory', schema['timestamp']):
+			where, parameters, order = f"WHERE {timestamp} > ?", (watermark['timestamp'],), timestamp
+		else:
+			where, parameters, order = "WHERE PhraseHistory.rowid > ?", (watermark['rowid'],), "PhraseHistory.rowid"
+		cursor = connection.execute(
+			f"SELECT PhraseHistory.rowid, {timestamp}, Phrases.{schema['text']} "
+			f"FROM PhraseHistory JOIN Phrases ON Phrases.{schema['phrase_key']} = PhraseHistory.{schema['phrase_id']} "
+			f"{where} ORDER BY {order}", parameters)
+		while True:
+			rows = cursor.fetchmany(FETCH_BATCH_SIZE)
+			if not rows:
+				break
+			for rowid, value, text in rows:
+				if text:
+					yield HistoryRow(timestamp_to_seconds(value), text, value, rowid)
+	finally:
+		connection.close()
+
+
+def find_history_files(users_directory):
+	"""
+	The history databases under a Grid 3 Users folder.
+
+	:return: List of (key, path) where key is "user/lang".
+	"""
+	found = []
+	for user in sorted(os.listdir(users_directory)):
+		user_path = os.path.join(users_directory, user)
+		if not os.path.isdir(user_path):
+			continue
+		for language in sorted(os.listdir(user_path)):
+			path = os.path.join(user_path, language, 'Phrases', 'history.sqlite')
+			if os.path.isfile(path):
+				found.append((f"{user}/{language}", path))
+	return found
+
+
+def history_file_key(path):
+	"""The "user/lang" key of one history database, from its <user>/<lang>/Phrases/history.sqlite path."""
+	language_path = os.path.dirname(os.path.dirname(os.path.abspath(path)))
+	return f"{os.path.basename(os.path.dirname(language_path))}/{os.path.basename(language_path)}"
+
+
+def load_watermarks(file_path):
+	if file_path and os.path.exists(file_path):
+		with open(file_path, encoding='utf-8') as f:
+			return json.load(f)
+	return {}
+
+
+def save_watermarks(watermarks, file_path):
+	"""Write the state file whole, then swap it in, so an interrupted run keeps the old watermarks."""
+	temporary = file_path + '.tmp'
+	with open(temporary, 'w', encoding='utf-8') as f:
+		json.dump(watermarks, f, indent=1, sort_keys=True)
+	os.replace(temporary, file_path)
+
+
+def collect(history_files, watermarks, immutable=True):
+	"""
+	Yield (key, HistoryRow) for the new rows of every database, moving each key's watermark on as rows are read.
+
+	:param history_files: List of (key, path) from find_history_files.
+	:param watermarks: Dictionary of key to watermark; updated in place.
+	"""
+	for key, path in history_files:
+		watermark = watermarks.get(key)
+		newest = dict(watermark) if watermark else {'timestamp': None, 'rowid': 0}
+		for row in read_history(path, watermark, immutable):
+			yield key, row
+			if newest['timestamp'] is None or (row.timestamp is not None and row.timestamp > newest['timestamp']):
+				newest['timestamp'] = row.timestamp
+			newest['rowid'] = max(newest['rowid'], row.rowid)
+		if newest['timestamp'] is not None:
+			watermarks[key] = newest
+
+
+def format_time(seconds):
+	if seconds is None:
+		return ''
+	return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Collect the new phrases from Grid 3 users' history.sqlite files.")
+	parser.add_argument('path', help='A Grid 3 Users folder, or one history.sqlite file')
+	parser.add_argument('--state', type=str, help='JSON file holding the per-user watermarks (updated after a successful run)', default=None)
+	parser.add_argument('--output', type=str, help='CSV file to append the new phrases to', default='grid3_history.csv')
+	parser.add_argument('--live', action='store_true', help="Don't open the databases as immutable (Grid 3 may be writing to them)")
+	args = parser.parse_args()
+
+	if os.path.isdir(args.path):
+		history_files = find_history_files(args.path)
+	else:
+		history_files = [(history_file_key(args.path), args.path)]
+	watermarks = load_watermarks(args.state)
+
+	write_header = not os.path.exists(args.output) or os.path.getsize(args.output) == 0
+	count = 0
+	with open(args.output, mode='a', newline='', encoding='utf-8') as file:
+		writer = csv.writer(file)
+		if write_header:
+			writer.writerow(['User', 'Time', 'Phrase'])
+		for key, row in collect(history_files, watermarks, not args.live):
+			writer.writerow([key, format_time(row.time), row.text])
+			count += 1
+	if args.state:
+		save_watermarks(watermarks, args.state)
+	print(f"Collected {count} new phrases from {len(history_files)} history files into {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+	main()
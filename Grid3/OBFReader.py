@@ -0,0 +1,184 @@
+"""
+Read Open Board Format boards (.obf) and board sets (.obz) for GridAnalysis.
+
+Boards are streamed one at a time straight out of the .obz zip (nothing is
+unpacked to disk) and reduced to OBFPage records: the board's grid size and
+the text, grid position and load_board link of each button. GridAnalysis turns
+those into the same cell dictionaries it builds from Grid 3 XML, so effort
+scores, the navigation BFS and the CSV outputs work unchanged.
+
+See "CoughDrop/obf_.obz Open Board File Formats.md" for the format.
+"""
+import json
+import os
+import zipfile
+from collections import deque
+
+
+class OBFPage:
+	"""
+	One board, reduced to what the analysis needs. Other non-Grid 3 readers
+	(e.g. Snap/SnapAnalysis.py) build these too, so GridAnalysis handles them the same way.
+
+	:ivar name: Page name (the board name, made unique within the board set).
+	:ivar rows: Number of grid rows.
+	:ivar cols: Number of grid columns.
+	:ivar cell_count: Number of buttons on the board.
+	:ivar cells: List of dictionaries with 'Text', 'X' (column), 'Y' (row) and 'LoadBoard' (page name or None),
+		and optionally 'Span' (columns, rows) for buttons covering more than one cell.
+	"""
+
+	def __init__(self, name, rows, cols, cell_count, cells):
+		self.name = name
+		self.rows = rows
+		self.cols = cols
+		self.cell_count = cell_count
+		self.cells = cells
+
+	def __repr__(self):
+		return f"OBFPage({self.name!r})"
+
+
+def is_obf_path(file_path):
+	return os.path.splitext(file_path)[1].lower() in ('.obf', '.obz')
+
+
+def board_to_page(board, name, resolve):
+	"""
+	Reduce an OBF board dictionary to an OBFPage.
+
+	:param board: Parsed .obf JSON.
+	:param name: Page name to use for this board.
+	:param resolve: Function mapping a button's load_board dictionary to the linked page (or None).
+	"""
+	grid = board.get('grid') or {}
+	order = grid.get('order') or []
+	rows = grid.get('rows') or len(order)
+	cols = grid.get('columns') or max((len(row) for row in order), default=0)
+	buttons = {str(button.get('id')): button for button in board.get('buttons', [])}
+
+	cells = []
+	for y, row in enumerate(order):
+		for x, button_id in enumerate(row):
+			button = buttons.get(str(button_id)) if button_id is not None else None
+			if button is None:
+				continue
+			cells.append({
+				'Text': (button.get('vocalization') or button.get('label') or '').strip(),
+				'X': x,
+				'Y': y,
+				'LoadBoard': resolve(button.get('load_board')),
+			})
+	return OBFPage(name, rows, cols, len(buttons), cells)
+
+
+def unique_page_name(board, taken):
+	"""Board names needn't be unique; add the id to repeats so pages stay distinct."""
+	name = (board.get('name') or str(board.get('id'))).strip()
+	if name in taken:
+		name = f"{name} [{board.get('id')}]"
+	taken.add(name)
+	return name
+
+
+class OBZReader:
+	"""
+	Stream boards out of an .obz (or a single .obf) without unpacking it.
+
+	Only the manifest is read up front; each board is parsed when it is visited
+	and only its OBFPage is kept.
+	"""
+
+	def __init__(self, file_path):
+		self.file_path = file_path
+		self.zip = None
+		self.members = set()
+		if os.path.splitext(file_path)[1].lower() == '.obz':
+			self.zip = zipfile.ZipFile(file_path, 'r')
+			self.members = set(self.zip.namelist())
+			with self.zip.open('manifest.json') as f:
+				manifest = json.load(f)
+			self.root = manifest['root']
+			self.board_paths = manifest.get('paths', {}).get('boards', {})
+		else:
+			self.root = file_path
+			self.board_paths = {}
+		self.page_names = {}  # board path -> page name
+		self.board_ids = {str(board_id): path for board_id, path in self.board_paths.items()}
+
+	def close(self):
+		if self.zip is not None:
+			self.zip.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def load_board(self, path):
+		if self.zip is None:
+			with open(path, encoding='utf-8') as f:
+				return json.load(f)
+		with self.zip.open(path) as f:
+			return json.load(f)
+
+	def resolve(self, load_board):
+		"""The board path a load_board link points at, or None if it's outside this board set."""
+		if not load_board or self.zip is None:
+			return None
+		path = self.board_ids.get(str(load_board.get('id'))) or load_board.get('path')
+		if path not in self.members:
+			return None
+		return path
+
+	def walk(self):
+		"""
+		Yield an OBFPage for every board reachable from the root, breadth first.
+
+		Each board's JSON is dropped as soon as it has been reduced. Links are
+		board paths at this point (names of boards not yet read aren't known);
+		build_navigation_map_and_find_relevant_pages turns them into page names.
+		"""
+		taken = set()
+		queue = deque([self.root])
+		seen = {self.root}
+		while queue:
+			path = queue.popleft()
+			try:
+				board = self.load_board(path)
+			except (KeyError, OSError, ValueError) as e:
+				print(f"Error reading board {path}: {e}")
+				continue
+			self.page_names[path] = unique_page_name(board, taken)
+			page = board_to_page(board, self.page_names[path], self.resolve)
+			del board
+
+			for cell in page.cells:
+				target = cell['LoadBoard']
+				if target is not None and target not in seen:
+					seen.add(target)
+					queue.append(target)
+			yield page
+
+
+def build_navigation_map_and_find_relevant_pages(file_path):
+	"""
+	The OBF counterpart of GridAnalysis.build_navigation_map_and_find_relevant_files.
+
+	:param file_path: Path to an .obz or .obf file.
+	:return: Tuple (home page name, navigation map of page name -> linked page names, list of OBFPage).
+	"""
+	with OBZReader(file_path) as reader:
+		pages = list(reader.walk())
+		home = reader.page_names.get(reader.root)
+		page_names = reader.page_names
+
+	navigation_map = {}
+	for page in pages:
+		for cell in page.cells:
+			# Links to boards that couldn't be read are dropped
+			cell['LoadBoard'] = page_names.get(cell['LoadBoard'])
+			if cell['LoadBoard']:
+				navigation_map.setdefault(page.name, []).append(cell['LoadBoard'])
+	return home, navigation_map, pages
@@ -0,0 +1,73 @@
+"""
+Scoring profiles: the device and user settings the effort scores depend on.
+
+A profile bundles the screen size, the switch-scanning timings and the weights
+of the direct-selection effort score. DEFAULT_PROFILE holds the values the
+analysis has always used; others are loaded from a JSON file such as
+scoring_profiles.json:
+
+	[
+		{"name": "eye gaze tablet", "screen_dimensions": [1280, 800], "selection_time": 1.0},
+		{"name": "switch scanning", "scan_time_per_unit": 1.5}
+	]
+
+(a {"profiles": [...]} object works too). Anything a profile leaves out comes
+from DEFAULT_PROFILE.
+"""
+import json
+from collections import namedtuple
+
+ScoringProfile = namedtuple('ScoringProfile', [
+	'name',
+	'screen_dimensions',  # (width, height) in pixels
+	'scan_time_per_unit',  # seconds per scan step
+	'selection_time',  # seconds per switch press
+	'button_size_weight',
+	'field_size_weight',
+	'prior_scan_weight',
+	'navigation_step_weight',
+	'fitts_intercept',  # seconds
+	'fitts_slope',  # seconds per bit
+])
+
+DEFAULT_PROFILE = ScoringProfile(
+	name='default',
+	screen_dimensions=(1920, 1080),
+	scan_time_per_unit=1,
+	selection_time=0.5,
+	button_size_weight=0.003,
+	field_size_weight=0.007,
+	prior_scan_weight=0.001,
+	navigation_step_weight=1.0,
+	fitts_intercept=0.2,
+	fitts_slope=0.15,
+)
+
+
+def profile_from_dict(values):
+	"""Build a ScoringProfile from a dictionary, filling gaps from DEFAULT_PROFILE."""
+	unknown = set(values) - set(ScoringProfile._fields)
+	if unknown:
+		raise ValueError(f"Unknown scoring profile settings: {', '.join(sorted(unknown))}")
+	if 'name' not in values:
+		raise ValueError("Every scoring profile needs a name")
+	profile = DEFAULT_PROFILE._replace(**values)
+	width, height = profile.screen_dimensions
+	return profile._replace(screen_dimensions=(width, height))
+
+
+def load_profiles(file_path):
+	"""
+	Read the scoring profiles in a JSON file.
+
+	:return: List of ScoringProfile, in file order.
+	"""
+	with open(file_path, encoding='utf-8') as f:
+		data = json.load(f)
+	if isinstance(data, dict):
+		data = data.get('profiles', [])
+	profiles = [profile_from_dict(values) for values in data]
+	names = [profile.name for profile in profiles]
+	if len(set(names)) != len(names):
+		raise ValueError("Scoring profile names must be unique")
+	return profiles
@@ -0,0 +1,218 @@
+"""
+Read TouchChat vocabularies (.ce exports, or a bare .c4v) for GridAnalysis.
+
+A .ce is a zip holding Images.c4s, Manifest.c4i, version.txt and <name>.c4v,
+all SQLite databases; the buttons, pages and links are in the .c4v (see
+TouchChat/README.md for the schema). SQLite can't open a database inside a zip,
+so the .c4v is streamed into a single temporary file - nothing else in the
+export is unpacked - and opened read-only. Pages come out as OBFPage records,
+so effort scores, the navigation BFS and the CSV outputs work unchanged.
+"""
+import os
+import shutil
+import sqlite3
+import tempfile
+import urllib.parse
+import zipfile
+from collections import deque
+
+from OBFReader import OBFPage
+
+# Rows pulled from SQLite per fetchmany() call
+FETCH_BATCH_SIZE = 5000
+
+# special_pages entry naming the vocabulary's home page
+HOME_PAGE_NAME = 'home'
+
+
+def is_touchchat_path(file_path):
+	return os.path.splitext(file_path)[1].lower() in ('.ce', '.c4v')
+
+
+def iter_rows(cursor, batch_size=FETCH_BATCH_SIZE):
+	while True:
+		rows = cursor.fetchmany(batch_size)
+		if not rows:
+			return
+		yield from rows
+
+
+def open_c4v(path):
+	"""Open a .c4v read-only; immutable tells SQLite nothing else will change it, so it skips locking."""
+	uri = f"file:{urllib.parse.quote(os.path.abspath(path))}?mode=ro&immutable=1"
+	return sqlite3.connect(uri, uri=True)
+
+
+class TouchChatVocabulary:
+	"""
+	The .c4v database of a TouchChat vocabulary, as a context manager.
+
+	For a .ce the .c4v member is copied from the zip in chunks into one
+	temporary file, which is deleted on close (or if it cannot be opened).
+	"""
+
+	def __init__(self, file_path):
+		self.file_path = file_path
+		self.temp_path = None
+		if os.path.splitext(file_path)[1].lower() == '.c4v':
+			self.connection = open_c4v(file_path)
+			return
+		with zipfile.ZipFile(file_path, 'r') as archive:
+			members = [info for info in archive.infolist() if info.filename.lower().endswith('.c4v')]
+			if not members:
+				raise ValueError(f"{file_path} has no .c4v vocabulary database")
+			fd, self.temp_path = tempfile.mkstemp(suffix='.c4v')
+			try:
+				with os.fdopen(fd, 'wb') as out, archive.open(members[0]) as member:
+					shutil.copyfileobj(member, out, 1024 * 1024)
+				self.connection = open_c4v(self.temp_path)
+			except BaseException:
+				os.remove(self.temp_path)
+				self.temp_path = None
+				raise
+
+	def close(self):
+		self.connection.close()
+		if self.temp_path is not None:
+			os.remove(self.temp_path)
+			self.temp_path = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc):
+		self.close()
+
+	def pages(self):
+		"""{page id: (resource rid, page name, rows, cols)}; the grid size covers every button box on the page."""
+		query = """
+		SELECT p.id, r.rid, r.name,
+			MAX(COALESCE(bbi.position_y, 0) + COALESCE(bbi.size_y, bb.layout_y, 0)),
+			MAX(COALESCE(bbi.position_x, 0) + COALESCE(bbi.size_x, bb.layout_x, 0))
+		FROM pages AS p
+		JOIN resources AS r ON r.id = p.resource_id
+		LEFT JOIN button_box_instances AS bbi ON bbi.page_id = p.id
+		LEFT JOIN button_boxes AS bb ON bb.id = bbi.button_box_id
+		GROUP BY p.id
+		"""
+		return {page_id: (rid, name, rows or 0, cols or 0) for page_id, rid, name, rows, cols in iter_rows(self.connection.execute(query))}
+
+	def home_page_id(self):
+		try:
+			row = self.connection.execute("SELECT page_id FROM special_pages WHERE lower(name) = ?", (HOME_PAGE_NAME,)).fetchone()
+		except sqlite3.OperationalError:
+			return None
+		return row[0] if row else None
+
+	def buttons(self):
+		"""
+		Stream the buttons placed on every page, ordered by page.
+
+		Buttons sit in button boxes: a cell's location is its index in the box's
+		layout_x by layout_y grid spanning span_x by span_y of its cells, and the
+		box is placed on the page by a button_box_instance (position and size in
+		page cells). Spans are scaled the same way and are at least one cell.
+
+		:return: Iterator of (page id, button resource id, label, message, page row, page column, row span, column span).
+		"""
+		query = """
+		SELECT bbi.page_id, b.resource_id, b.label, b.message,
+			COALESCE(bbi.position_y, 0) + (bbc.location / bb.layout_x) * COALESCE(bbi.size_y, bb.layout_y) / bb.layout_y,
+			COALESCE(bbi.position_x, 0) + (bbc.location % bb.layout_x) * COALESCE(bbi.size_x, bb.layout_x) / bb.layout_x,
+			MAX(COALESCE(bbc.span_y, 1) * COALESCE(bbi.size_y, bb.layout_y) / bb.layout_y, 1),
+			MAX(COALESCE(bbc.span_x, 1) * COALESCE(bbi.size_x, bb.layout_x) / bb.layout_x, 1)
+		FROM button_box_instances AS bbi
+		JOIN button_boxes AS bb ON bb.id = bbi.button_box_id
+		JOIN button_box_cells AS bbc ON bbc.button_box_id = bb.id
+		JOIN buttons AS b ON b.resource_id = bbc.resource_id
+		WHERE bb.layout_x > 0 AND bb.layout_y > 0 AND COALESCE(b.visible, 1) != 0
+		ORDER BY bbi.page_id, bbc.location
+		"""
+		return iter_rows(self.connection.execute(query))
+
+	def links(self):
+		"""
+		Button resource id -> target page id, for buttons with an action whose data names a page.
+
+		Navigation actions store the target page in action_data; it is matched
+		against page resource rids, then page names.
+		"""
+		query = """
+		SELECT a.resource_id, COALESCE(by_rid.id, by_name.id)
+		FROM actions AS a
+		JOIN action_data AS ad ON ad.action_id = a.id
+		LEFT JOIN (SELECT p.id, r.rid FROM pages AS p JOIN resources AS r ON r.id = p.resource_id) AS by_rid
+			ON by_rid.rid = ad.value
+		LEFT JOIN (SELECT MIN(p.id) AS id, r.name FROM pages AS p JOIN resources AS r ON r.id = p.resource_id GROUP BY r.name) AS by_name
+			ON by_name.name = ad.value
+		WHERE COALESCE(by_rid.id, by_name.id) IS NOT NULL
+		ORDER BY a.resource_id, a.rank
+		"""
+		links = {}
+		for resource_id, page_id in iter_rows(self.connection.execute(query)):
+			links.setdefault(resource_id, page_id)
+		return links
+
+
+def build_navigation_map_and_find_relevant_pages(file_path, home_page=None):
+	"""
+	The TouchChat counterpart of GridAnalysis.build_navigation_map_and_find_relevant_files.
+
+	:param file_path: Path to a .ce export or a .c4v database.
+	:param home_page: Name of the home page (default: the vocabulary's home special page, else the first page).
+	:return: Tuple (home page name, navigation map of page name -> linked page names, list of OBFPage).
+	"""
+	with TouchChatVocabulary(file_path) as vocabulary:
+		pages = vocabulary.pages()
+		if not pages:
+			return None, {}, []
+
+		# Page names needn't be unique; add the id to repeats so pages stay distinct
+		names = {}
+		taken = set()
+		for page_id, (_, name, _, _) in sorted(pages.items()):
+			name = (name or str(page_id)).strip()
+			if name in taken:
+				name = f"{name} [{page_id}]"
+			taken.add(name)
+			names[page_id] = name
+
+		if home_page is not None:
+			home_id = next((page_id for page_id, name in names.items() if name == home_page), None)
+		else:
+			home_id = vocabulary.home_page_id()
+		if home_id not in pages:
+			home_id = min(pages)
+
+		links = vocabulary.links()
+		page_cells = {}
+		for page_id, resource_id, label, message, row, col, row_span, col_span in vocabulary.buttons():
+			target = links.get(resource_id)
+			page_cells.setdefault(page_id, []).append({
+				'Text': (message or label or '').strip(),
+				'X': col,
+				'Y': row,
+				'Span': (col_span, row_span),
+				'LoadBoard': names[target] if target is not None else None,
+			})
+
+	# Keep only the pages reachable from home
+	by_name = {name: page_id for page_id, name in names.items()}
+	navigation_map = {}
+	relevant_pages = []
+	seen = {home_id}
+	queue = deque([home_id])
+	while queue:
+		page_id = queue.popleft()
+		_, _, rows, cols = pages[page_id]
+		cells = page_cells.pop(page_id, [])
+		relevant_pages.append(OBFPage(names[page_id], rows, cols, len(cells), cells))
+		for cell in cells:
+			target = cell['LoadBoard']
+			if target is None:
+				continue
+			navigation_map.setdefault(names[page_id], []).append(target)
+			if by_name[target] not in seen:
+				seen.add(by_name[target])
+				queue.append(by_name[target])
+	return names[home_id], navigation_map, relevant_pages
@@ -0,0 +1,112 @@
+"""Benchmark the per-cell feature stage of GridAnalysisDetailed on synthetic pages.
+
+Writes grid.xml pages of up to 10k cells (single words and phrases, with
+repeats), runs process_single_grid_file over them twice and counts the calls
+to get_word_type. The first pass must tag each distinct single-word text
+exactly once (phrases and repeats are never tagged); the second pass reads
+everything from the feature cache and must not tag anything. Exits non-zero
+if either count is wrong.
+
+    python bench_word_type.py
+    python bench_word_type.py --sizes 1000 10000 --no-tagger
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import GridAnalysisDetailed
+
+
+def synthetic_texts(size, vocabulary_ratio=0.5):
+    """The cell texts of a synthetic page, in cell order; every fourth cell is a phrase."""
+    vocabulary = max(1, int(size * vocabulary_ratio))
+    return [f"word{i % vocabulary}" if i % 4 else f"say word{i % vocabulary} now" for i in range(size)]
+
+
+def distinct_single_words(size):
+    """How many tagging calls a cold cache should make for a synthetic page."""
+    return len({text for text in synthetic_texts(size) if len(text.split()) == 1})
+
+
+def synthetic_grid_xml(size):
+    """A square-ish page of ``size`` text cells (see synthetic_texts)."""
+    cols = max(1, int(size ** 0.5))
+    rows = -(-size // cols)
+    cells = []
+    for i, text in enumerate(synthetic_texts(size)):
+        cells.append(
+            f'<Cell X="{i % cols}" Y="{i // cols}"><Content><Commands><Command ID="Action.InsertText">'
+            f'<Parameter Key="text"><p><s><r>{text}</r></s></p></Parameter></Command></Commands>'
+            f'<CaptionAndImage><Caption>{text}</Caption></CaptionAndImage></Content></Cell>')
+    return (
+        '<Grid><ColumnDefinitions>' + '<ColumnDefinition />' * cols + '</ColumnDefinitions>'
+        '<RowDefinitions>' + '<RowDefinition />' * rows + '</RowDefinitions>'
+        '<Cells>' + ''.join(cells) + '</Cells></Grid>')
+
+
+def write_page(directory, name, size):
+    page_dir = os.path.join(directory, 'Grids', name)
+    os.makedirs(page_dir)
+    path = os.path.join(page_dir, 'grid.xml')
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(synthetic_grid_xml(size))
+    return path
+
+
+def count_tagging_calls(path, name):
+    """Run one page through process_single_grid_file; return (tagging calls, cells, seconds)."""
+    calls = 0
+    tagger = GridAnalysisDetailed.get_word_type
+
+    def counting_tagger(word):
+        nonlocal calls
+        calls += 1
+        return tagger(word)
+
+    GridAnalysisDetailed.get_word_type = counting_tagger
+    try:
+        start = time.perf_counter()
+        _, _, cell_data, _, num_cells, _ = GridAnalysisDetailed.process_single_grid_file(
+            path, {}, (1920, 1080), name, 1, 0.5)
+        elapsed = time.perf_counter() - start
+    finally:
+        GridAnalysisDetailed.get_word_type = tagger
+    return calls, num_cells, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Count word-type tagging calls per cell in GridAnalysisDetailed.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 10000],
+                        help='Page sizes (number of cells) to run')
+    parser.add_argument('--no-tagger', action='store_true',
+                        help="Count calls without running NLTK's tagger (for machines without the NLTK data)")
+    args = parser.parse_args()
+
+    if args.no_tagger:
+        GridAnalysisDetailed.get_word_type = lambda word: 'NOUN'
+
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            name = f"page{size}"
+            path = write_page(directory, name, size)
+            GridAnalysisDetailed.feature_cache.clear()
+            cold_calls, cells, cold_time = count_tagging_calls(path, name)
+            warm_calls, _, warm_time = count_tagging_calls(path, name)
+            print(f"{size:>8} cells: cold {cold_calls:>6} tagging calls ({cold_calls / cells:.2f}/cell, {cold_time * 1000:8.1f} ms), "
+                  f"warm {warm_calls:>6} calls ({warm_time * 1000:8.1f} ms)")
+            expected = distinct_single_words(size)
+            if cold_calls != expected:
+                print(f"Expected {expected} tagging calls on a cold cache (one per distinct single word), got {cold_calls}.")
+                failed = True
+            if warm_calls:
+                print("Tagging calls on a warm cache.")
+                failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""Benchmark the cache-merge stage of the translator on synthetic wordlist pages.
+
+Builds pages of up to 50k translatable strings (with repeats and a warm cache
+holding half of them), runs split_cached/fill_translations and prints the time
+per string at each size. Exits non-zero if the scaling exponent - the slope of
+a least-squares fit of log(time) against log(size) over all the sizes, 1.0 for
+linear and 2.0 for the old list-membership merge - is too high.
+
+    python bench_cache_merge.py
+    python bench_cache_merge.py --sizes 1000 10000 50000
+"""
+import argparse
+import gc
+import math
+import sys
+import time
+
+from cache import split_cached, fill_translations
+
+
+def synthetic_page(size, vocabulary_ratio=0.8):
+    """Return ``size`` wordlist texts drawn from a vocabulary of ``size * vocabulary_ratio`` items."""
+    vocabulary = max(1, int(size * vocabulary_ratio))
+    return [f"word {i % vocabulary}" for i in range(size)]
+
+
+def warm_cache(texts):
+    """Cache every other distinct text, as if an earlier page had translated them."""
+    return {text: text.upper() for text in list(dict.fromkeys(texts))[::2]}
+
+
+def time_merge(texts, repeats=5):
+    best = float('inf')
+    for _ in range(repeats):
+        cache = warm_cache(texts)
+        new_translations = [text.upper() for text in dict.fromkeys(texts) if text not in cache]
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            translated, pending = split_cached(texts, cache)
+            fill_translations(translated, pending, new_translations, cache)
+            best = min(best, time.perf_counter() - start)
+        finally:
+            gc.enable()
+        assert None not in translated
+    return best
+
+
+def scaling_exponent(results):
+    """Least-squares slope of log(time) against log(size) over all (size, time) pairs."""
+    points = [(math.log(size), math.log(elapsed)) for size, elapsed in results if elapsed > 0]
+    if len(points) < 2:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the translation cache merge on synthetic pages.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[6250, 12500, 25000, 50000],
+                        help='Page sizes (number of strings) to time, smallest first')
+    parser.add_argument('--max-exponent', type=float, default=1.5,
+                        help='Largest acceptable exponent k in time ~ size**k')
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes:
+        elapsed = time_merge(synthetic_page(size))
+        results.append((size, elapsed))
+        print(f"{size:>8} strings: {elapsed * 1000:8.2f} ms ({elapsed / size * 1e9:7.1f} ns/string)")
+
+    exponent = scaling_exponent(results)
+    if exponent is None:
+        return
+    print(f"Scaling exponent: {exponent:.2f}")
+    if exponent > args.max_exponent:
+        print("Cache merge is scaling worse than linear.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
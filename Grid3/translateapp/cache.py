@@ -0,0 +1,47 @@
+"""Helpers for merging cached and freshly translated texts back into page order.
+
+Texts are addressed by their index in the page's list of translatable texts, so
+looking up and filling a page costs one dict operation per text no matter how
+many of them were already in the cache.
+"""
+
+_MISSING = object()
+
+
+def split_cached(texts, cache):
+    """Fill cache hits by index and group the remaining indices by text.
+
+    Returns ``(translated, pending)`` where ``translated`` has one slot per text
+    (``None`` for misses) and ``pending`` maps each uncached text to the list of
+    indices it occupies, in first-seen order.
+    """
+    translated = [None] * len(texts)
+    pending = {}
+    for i, text in enumerate(texts):
+        hit = cache.get(text, _MISSING)
+        if hit is _MISSING:
+            pending.setdefault(text, []).append(i)
+        else:
+            translated[i] = hit
+    return translated, pending
+
+
+def fill_translations(translated, pending, new_translations, cache):
+    """Write translations for ``pending`` texts into their slots and the cache.
+
+    ``new_translations`` must be in the same order as ``pending``'s keys.
+    """
+    for (text, indices), translation in zip(pending.items(), new_translations):
+        cache[text] = translation
+        for i in indices:
+            translated[i] = translation
+    return translated
+
+
+def map_translations(texts, unique_texts, translations):
+    """Map translations of ``unique_texts`` back onto ``texts``, keeping originals on failure."""
+    if translations and len(translations) == len(unique_texts):
+        translation_map = {orig: trans if trans else orig for orig, trans in zip(unique_texts, translations)}
+    else:
+        translation_map = {}
+    return [translation_map.get(text, text) for text in texts]
@@ -0,0 +1,176 @@
+"""Translate Grid3 gridsets from the command line, without a browser session.
+
+Examples:
+
+    python cli.py "Super Core 50.gridset" --target fr
+    python cli.py gridsets/ --target de --tool DeepL --api-key $DEEPL_API_KEY --output translated/
+
+Each input can be a .gridset file or a directory (searched recursively for
+.gridset files). Every page of every gridset is read before anything is
+translated, so each distinct string in the batch is sent to the translation
+service once, however many pages and gridsets share it.
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+from gridset_zip import count_grids
+from gridset_translator import logger, collect_gridset, translate_units, write_translated_gridset
+from translation_units import TranslationUnitStore
+from debug_log import start_debug_log, stop_debug_log
+
+
+def find_gridsets(paths):
+    """Expand files and directories into a sorted, de-duplicated list of .gridset paths."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                found.extend(os.path.join(root, f) for f in files if f.lower().endswith(".gridset"))
+        else:
+            found.append(path)
+    return sorted(dict.fromkeys(found))
+
+
+def output_path_for(gridset_path, output_dir, target_lang):
+    """``<name>-<target>.gridset`` next to the input, or in ``output_dir`` if given."""
+    name = f"{os.path.splitext(os.path.basename(gridset_path))[0]}-{target_lang}.gridset"
+    return os.path.join(output_dir or os.path.dirname(gridset_path), name)
+
+
+def format_rate(count, seconds, unit):
+    return f"{count / seconds:.1f} {unit}/s" if seconds > 0 else f"- {unit}/s"
+
+
+def print_page_stats(label, stats, elapsed):
+    print(
+        f"{label}: {stats['pages']} pages ({stats['pages_failed']} failed) "
+        f"in {elapsed:.1f}s - {format_rate(stats['pages'], elapsed, 'pages')}"
+    )
+
+
+def print_text_stats(stats, elapsed):
+    ratio = stats['texts'] / stats['unique_texts'] if stats['unique_texts'] else 1.0
+    print(
+        f"Strings: {stats['texts']} ({stats['unique_texts']} distinct, {ratio:.2f}x dedupe), "
+        f"{stats['api_texts']} sent to the translator "
+        f"({stats['api_chars']} of {stats['chars']} chars, {stats['chars'] - stats['api_chars']} saved) "
+        f"in {elapsed:.1f}s - {format_rate(stats['texts'], elapsed, 'strings')}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Translate one or more Grid3 .gridset files.')
+    parser.add_argument('gridsets', nargs='+', help='.gridset files or directories containing them')
+    parser.add_argument('--target', required=True, help='Target language (as named by the translation tool, e.g. fr or french)')
+    parser.add_argument('--source', default='en', help='Source language (default: en)')
+    parser.add_argument('--tool', choices=['Google', 'Microsoft', 'DeepL'], default='Google', help='Translation service to use')
+    parser.add_argument('--api-key', default=os.environ.get('TRANSLATOR_API_KEY'),
+                        help='API key for Microsoft or DeepL (default: $TRANSLATOR_API_KEY)')
+    parser.add_argument('--region', default=os.environ.get('TRANSLATOR_REGION'),
+                        help='Azure region for Microsoft (default: $TRANSLATOR_REGION)')
+    parser.add_argument('--output', help='Directory for translated gridsets (default: next to each input)', default=None)
+    parser.add_argument('--cdata', action='store_true', help='Write translated Parameter and WordList text as CDATA (captions always are)')
+    parser.add_argument('--no-rate-limit', action='store_true', help='Send requests as fast as the service allows')
+    parser.add_argument('--log-file', help='Write a full debug log to this file', default=None)
+    parser.add_argument('--quiet', action='store_true', help='Only print the summary for each gridset')
+    args = parser.parse_args()
+
+    if args.tool == 'Microsoft' and not (args.api_key and args.region):
+        parser.error("Microsoft Translator requires --api-key and --region.")
+    if args.tool == 'DeepL' and not args.api_key:
+        parser.error("DeepL requires --api-key.")
+
+    gridsets = find_gridsets(args.gridsets)
+    if not gridsets:
+        parser.error("No .gridset files found.")
+    if args.output:
+        os.makedirs(args.output, exist_ok=True)
+
+    # Errors always go to stderr; the full per-string log only if asked for
+    console = logging.StreamHandler()
+    console.setLevel(logging.WARNING)
+    console.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+    logger.addHandler(console)
+    log_handlers = []
+    if args.log_file:
+        _, log_handlers = start_debug_log(log_path=args.log_file)
+
+    store = TranslationUnitStore()
+    totals = Counter()
+    batch_start = time.perf_counter()
+    try:
+        # Read every gridset first so strings shared across the batch are translated once
+        collected = []
+        for index, gridset_path in enumerate(gridsets, start=1):
+            try:
+                pages = collect_gridset(gridset_path, store, gridset_key=gridset_path)
+            except Exception as e:
+                logger.error(f"Could not read {gridset_path}: {e}")
+                totals["gridsets_failed"] += 1
+                continue
+            if not args.quiet:
+                print(f"[{index}/{len(gridsets)}] Read {gridset_path} ({pages} pages)")
+            collected.append(gridset_path)
+
+        translate_start = time.perf_counter()
+
+        def show_translate_progress(done, total):
+            if not args.quiet:
+                elapsed = time.perf_counter() - translate_start
+                print(f"  Translated {done}/{total} strings ({format_rate(done, elapsed, 'strings')})", flush=True)
+
+        translate_units(
+            store,
+            args.tool,
+            args.source,
+            args.target,
+            args.api_key,
+            args.region,
+            rate_limit_enabled=not args.no_rate_limit,
+            stats=totals,
+            on_progress=show_translate_progress
+        )
+
+        for index, gridset_path in enumerate(collected, start=1):
+            destination = output_path_for(gridset_path, args.output, args.target)
+            total_pages = count_grids(gridset_path)
+            print(f"[{index}/{len(collected)}] {gridset_path} ({total_pages} pages) -> {destination}")
+
+            def show_progress(done, total, name):
+                if not args.quiet:
+                    elapsed = time.perf_counter() - start
+                    print(f"  {done}/{total} {name} ({format_rate(done, elapsed, 'pages')})", flush=True)
+
+            start = time.perf_counter()
+            try:
+                stats = write_translated_gridset(
+                    gridset_path,
+                    destination,
+                    store,
+                    gridset_key=gridset_path,
+                    on_progress=show_progress,
+                    use_cdata=args.cdata
+                )
+            except Exception as e:
+                logger.error(f"Could not translate {gridset_path}: {e}")
+                totals["gridsets_failed"] += 1
+                continue
+            print_page_stats("  Done", stats, time.perf_counter() - start)
+            totals.update(stats)
+    finally:
+        stop_debug_log(log_handlers)
+
+    elapsed = time.perf_counter() - batch_start
+    if len(gridsets) > 1:
+        print_page_stats(f"Batch of {len(gridsets)} gridsets", totals, elapsed)
+    print_text_stats(totals, elapsed)
+    if totals["gridsets_failed"] or totals["pages_failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Debug logging for the translator.
+
+Everything goes through the standard ``logging`` module. The full log is
+written to a file, while the Streamlit debug box only shows the most recent
+lines from a ring buffer and is redrawn at most every ``refresh_interval``
+seconds, so turning debug output on doesn't slow translation down.
+
+Log files go in one directory (``LOG_DIRECTORY``), and starting a log removes
+all but the most recent ``KEEP_LOGS`` files there, so runs don't leave a trail
+of temporary files behind.
+"""
+import logging
+import os
+import tempfile
+import time
+from collections import deque
+
+LOGGER_NAME = "gridset_translator"
+LOG_FORMAT = "%(asctime)s %(levelname)-7s %(message)s"
+UI_FORMAT = "%(levelname)s: %(message)s"
+
+LOG_DIRECTORY = os.path.join(tempfile.gettempdir(), "gridset-translator-logs")
+LOG_PREFIX = "gridset-translation-"
+KEEP_LOGS = 5
+
+logger = logging.getLogger(LOGGER_NAME)
+
+
+class StreamlitLogHandler(logging.Handler):
+    """Keep the last ``capacity`` records and redraw a Streamlit placeholder at a limited rate."""
+
+    def __init__(self, placeholder, capacity=500, refresh_interval=0.5, level=logging.DEBUG):
+        super().__init__(level)
+        self.placeholder = placeholder
+        self.buffer = deque(maxlen=capacity)
+        self.refresh_interval = refresh_interval
+        self._last_render = 0.0
+        self._dirty = False
+        self.setFormatter(logging.Formatter(UI_FORMAT))
+
+    def emit(self, record):
+        try:
+            self.buffer.append(self.format(record))
+        except Exception:
+            self.handleError(record)
+            return
+        self._dirty = True
+        # Always show problems straight away; everything else waits for the next refresh
+        if record.levelno >= logging.WARNING or time.monotonic() - self._last_render >= self.refresh_interval:
+            self.render()
+
+    def render(self):
+        if not self._dirty:
+            return
+        self.placeholder.text_area("Debug Log", "\n".join(self.buffer), height=300)
+        self._last_render = time.monotonic()
+        self._dirty = False
+
+    def flush(self):
+        self.render()
+
+
+class CallbackLogHandler(logging.Handler):
+    """Pass formatted records to ``show`` (e.g. ``st.error``) so the UI still surfaces engine errors."""
+
+    def __init__(self, show, level=logging.ERROR):
+        super().__init__(level)
+        self.show = show
+
+    def emit(self, record):
+        try:
+            self.show(self.format(record))
+        except Exception:
+            self.handleError(record)
+
+
+def new_log_path(directory=LOG_DIRECTORY, keep=KEEP_LOGS):
+    """Create an empty log file in ``directory`` after deleting all but the newest ``keep - 1`` old ones."""
+    os.makedirs(directory, exist_ok=True)
+    old_logs = []
+    for entry in os.scandir(directory):
+        if entry.name.startswith(LOG_PREFIX) and entry.name.endswith(".log") and entry.is_file():
+            old_logs.append((entry.stat().st_mtime, entry.path))
+    old_logs.sort(reverse=True)
+    for _, path in old_logs[max(keep - 1, 0):]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass  # e.g. still open in another session on Windows
+    handle, path = tempfile.mkstemp(prefix=LOG_PREFIX, suffix=".log", dir=directory)
+    os.close(handle)
+    return path
+
+
+def start_debug_log(placeholder=None, level=logging.DEBUG, log_path=None, capacity=500, refresh_interval=0.5):
+    """Attach a file handler (and a throttled UI handler if ``placeholder`` is given) to the translator logger.
+
+    Without ``log_path`` the log goes to a new file from ``new_log_path``.
+
+    :return: Tuple (path of the full log file, list of handlers to pass to ``stop_debug_log``).
+    """
+    if log_path is None:
+        log_path = new_log_path()
+
+    file_handler = logging.FileHandler(log_path, encoding="utf-8")
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handlers = [file_handler]
+    if placeholder is not None:
+        handlers.append(StreamlitLogHandler(placeholder, capacity=capacity, refresh_interval=refresh_interval))
+
+    for handler in handlers:
+        handler.setLevel(level)
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    return log_path, handlers
+
+
+def stop_debug_log(handlers):
+    """Flush (redrawing the UI one last time) and detach handlers from ``start_debug_log``."""
+    for handler in handlers:
+        handler.flush()
+        logger.removeHandler(handler)
+        handler.close()
+    if not logger.handlers:
+        logger.setLevel(logging.WARNING)
@@ -0,0 +1,290 @@
+"""Streaming extraction and rewrite of the translatable strings in a grid.xml.
+
+Extraction is a single ``iterparse`` pass that keeps a stack of open tags, so
+deciding whether an element is translatable needs no ``getparent()``/``find()``
+calls, and every element is freed as soon as it has been seen. It produces a
+compact table of ``ExtractedText(locator, kind, text, runs)`` rows where the
+locator is the element's position in document order.
+
+The rewrite is a second ``iterparse`` pass that copies the document to an
+``xmlfile`` writer as it goes, handing each element named in the table to a
+callback before it is written. Only the elements on the current path (plus
+whole translatable elements) are held in memory, so huge wordlist pages are
+never materialised as a full tree. Whitespace, CDATA sections and the original
+XML declaration are kept, and each element is detached from the tree before it
+is written so it picks up its ancestors' namespace declarations from the output
+rather than re-declaring them.
+"""
+import codecs
+import re
+from collections import namedtuple
+from lxml import etree as ET
+
+# kind is one of "caption", "simple" (plain Parameter text), "parameter" (rich
+# <p><s><r> Parameter text) or "wordlist"; runs is the per-word run metadata
+# from extract_runs (empty for captions and simple text).
+ExtractedText = namedtuple("ExtractedText", ["locator", "kind", "text", "runs"])
+
+EVENTS = ("start", "end", "comment", "pi")
+
+# How much of a page to look at for its XML declaration
+DECLARATION_PEEK = 1024
+
+
+def _rewind(source):
+    """Seek file objects back to the start so a source can be parsed twice."""
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+def _iterparse(source, **options):
+    return ET.iterparse(_rewind(source), events=EVENTS, remove_comments=False, **options)
+
+
+def read_declaration(source):
+    """The raw bytes of ``source``'s XML declaration (with any BOM and the whitespace after it).
+
+    Returns None if there isn't one, or if it names an encoding other than
+    UTF-8, which is what the rewrite writes.
+    """
+    if hasattr(source, "read"):
+        head = _rewind(source).read(DECLARATION_PEEK)
+    else:
+        with open(source, "rb") as f:
+            head = f.read(DECLARATION_PEEK)
+    start = len(codecs.BOM_UTF8) if head.startswith(codecs.BOM_UTF8) else 0
+    end = head.find(b"?>", start)
+    if not head.startswith(b"<?xml", start) or end < 0:
+        return None
+    encoding = re.search(rb"""encoding\s*=\s*["']([^"']+)""", head[start:end])
+    if encoding and encoding.group(1).lower() not in (b"utf-8", b"utf8"):
+        return None
+    end += 2
+    while head[end:end + 1] in (b" ", b"\t", b"\r", b"\n"):
+        end += 1
+    return head[:end]
+
+
+def is_translatable_start(element, parent_tag, parent_command_id):
+    """Decide at the start tag whether ``element`` may hold a translatable string."""
+    tag = element.tag
+    if tag == "Caption":
+        return True
+    if tag == "Parameter":
+        # Skip grid names in Jump.To commands
+        return element.get("Key") == "text" and not (parent_tag == "Command" and parent_command_id == "Jump.To")
+    if tag == "Text":
+        return parent_tag == "WordListItem"
+    return False
+
+
+def extract_runs(elem):
+    """Return (text, runs) for a rich text element: words joined by spaces, plus per-word run metadata.
+
+    ``runs`` has one ``('word', attributes of the enclosing <s>)`` or ``('space', {})``
+    entry per <r> element, which is what the rebuild step uses to put the
+    Image (etc.) attributes back on the translated words.
+    """
+    full_text = []
+    runs = []
+    for s_elem in elem.iter("s"):
+        meta = dict(s_elem.attrib)
+        for r_elem in s_elem.iterchildren("r"):
+            word = r_elem.text or ''
+            if word.strip():  # If it's an actual word
+                full_text.append(word.strip())
+                runs.append(('word', meta))
+            elif word:  # It's a space or other whitespace
+                full_text.append(' ')
+                runs.append(('space', {}))
+    return ' '.join(full_text).strip(), runs
+
+
+def classify(element):
+    """Return (kind, text, runs) for a complete translatable element, or None if it has nothing to translate."""
+    tag = element.tag
+    if tag == "Caption":
+        if element.text and element.text.strip():
+            return "caption", element.text.strip(), []
+    elif tag == "Parameter":
+        # For complex text parameters with <p><s><r> structure
+        if len(element) and (element.find('.//p') is not None or element.find('.//s') is not None):
+            text, runs = extract_runs(element)
+            if text:
+                return "parameter", text, runs
+        # For simple text parameters (like in Speech.SpeakNow)
+        elif element.text and element.text.strip():
+            return "simple", element.text, []
+    elif tag == "Text":
+        if element.find('.//r') is not None:
+            text, runs = extract_runs(element)
+            if text:
+                return "wordlist", text, runs
+    return None
+
+
+def extract_translatable_texts(source, on_error=None):
+    """Stream ``source`` (path or file object) once and return a list of ExtractedText rows.
+
+    :param on_error: Optional ``on_error(locator, path, exception)`` for elements that
+        couldn't be read; they are skipped.
+    """
+    rows = []
+    stack = []  # (tag, Command ID) of open elements
+    locator = -1
+    unit_depth = None  # depth of the translatable element we're inside, if any
+    for event, element in _iterparse(source, remove_blank_text=True):
+        if event == "start":
+            locator += 1
+            if unit_depth is None:
+                parent_tag, parent_id = stack[-1] if stack else (None, None)
+                if is_translatable_start(element, parent_tag, parent_id):
+                    unit_depth = len(stack)
+                    unit_locator = locator
+            stack.append((element.tag, element.get("ID") if element.tag == "Command" else None))
+        elif event == "end":
+            stack.pop()
+            if unit_depth is not None:
+                if len(stack) != unit_depth:
+                    continue  # still inside the translatable element; keep its subtree
+                unit_depth = None
+                try:
+                    found = classify(element)
+                    if found:
+                        rows.append(ExtractedText(unit_locator, *found))
+                except Exception as e:
+                    if on_error:
+                        on_error(unit_locator, "/".join(tag for tag, _ in stack + [(element.tag, None)]), e)
+            # Nothing else needs this element or its earlier siblings
+            element.clear()
+            parent = element.getparent()
+            if parent is not None:  # the root's siblings are a prolog comment or PI
+                while element.getprevious() is not None:
+                    del parent[0]
+    return rows
+
+
+def _detach(element):
+    """Take an element out of the tree (its tail goes with it) once nothing more will be added to it.
+
+    This frees it, and means lxml only declares the namespaces the element
+    itself uses when it is written, instead of copying every declaration in
+    scope onto it.
+    """
+    parent = element.getparent()
+    if parent is not None:
+        parent.remove(element)
+
+
+def rewrite_translated_xml(source, destination, locators, update):
+    """Stream ``source`` into ``destination``, calling ``update(locator, element, path)`` on listed elements.
+
+    :param destination: Writable binary file object.
+    :param locators: Container of locators (from extract_translatable_texts) to update.
+    :param update: Called with each complete element before it is written; it may
+        modify the element in place. ``path`` is a slash-separated tag path for messages.
+    """
+    declaration = read_declaration(source)
+    if declaration:
+        destination.write(declaration)
+    with ET.xmlfile(destination, encoding="utf-8") as xf:
+        if not declaration:
+            xf.write_declaration()
+        # One entry per open element: [element, open writer context or None, previous sibling awaiting its tail]
+        stack = []
+        locator = -1
+        atomic_depth = None  # depth of an element being kept whole (translatable unit)
+        atomic_locator = None
+        root_written = False
+
+        def open_parent():
+            """Start the innermost open element in the output (once its text is known) and flush a sibling tail."""
+            if not stack:
+                return
+            entry = stack[-1]
+            if entry[1] is None:
+                # Open every ancestor that hasn't been written yet, outermost first
+                for depth, ancestor in enumerate(stack):
+                    if ancestor[1] is not None:
+                        continue
+                    element = ancestor[0]
+                    parent_nsmap = stack[depth - 1][0].nsmap if depth else {}
+                    nsmap = {k: v for k, v in element.nsmap.items() if parent_nsmap.get(k) != v}
+                    ancestor[1] = xf.element(element.tag, dict(element.attrib), nsmap=nsmap or None)
+                    ancestor[1].__enter__()
+                    if element.text:
+                        xf.write(element.text)
+            if entry[2] is not None:
+                if entry[2].tail:
+                    xf.write(entry[2].tail)
+                entry[2] = None
+
+        def write_child(element):
+            _detach(element)
+            xf.write(element, with_tail=False)
+            if stack:
+                stack[-1][2] = element
+
+        def write_leaf(element):
+            """Write a childless element; one with a namespaced tag or attribute is opened in the
+            output's namespace context, as a detached copy would have to declare the prefix again."""
+            if not (element.tag.startswith("{") or any(name.startswith("{") for name in element.attrib)):
+                write_child(element)
+                return
+            with xf.element(element.tag, dict(element.attrib)):
+                if element.text:
+                    xf.write(element.text)
+            _detach(element)
+            if stack:
+                stack[-1][2] = element
+
+        for event, element in _iterparse(source, strip_cdata=False):
+            if atomic_depth is not None:
+                # Inside a translatable element: let the tree builder collect it
+                if event == "start":
+                    locator += 1
+                    stack.append([element, None, None])
+                elif event == "end":
+                    stack.pop()
+                    if len(stack) == atomic_depth:
+                        atomic_depth = None
+                        tail = element.tail  # update may clear() the element, tail included
+                        update(atomic_locator, element, "/".join(e[0].tag for e in stack + [[element]]))
+                        element.tail = tail
+                        open_parent()
+                        write_child(element)
+                continue
+
+            if event == "start":
+                locator += 1
+                if locator in locators:
+                    atomic_depth = len(stack)
+                    atomic_locator = locator
+                else:
+                    open_parent()
+                stack.append([element, None, None])
+            elif event == "end":
+                entry = stack.pop()
+                if entry[1] is not None:
+                    # Element had children: flush the last child's tail and close it
+                    if entry[2] is not None and entry[2].tail:
+                        xf.write(entry[2].tail)
+                    entry[1].__exit__(None, None, None)
+                    _detach(element)
+                    if stack:
+                        stack[-1][2] = element
+                else:
+                    # Leaf element: write it whole
+                    open_parent()
+                    write_leaf(element)
+                root_written = root_written or not stack
+            elif stack:  # comment or processing instruction
+                open_parent()
+                write_child(element)
+            else:
+                # Outside the root: one per line, as libxml2 writes a whole document
+                # (xmlfile won't write text there, so the newline goes straight out)
+                xf.flush()
+                node = ET.tostring(element, encoding="utf-8", with_tail=False)
+                destination.write(b"\n" + node if root_written else node + b"\n")
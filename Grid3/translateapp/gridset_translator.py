@@ -0,0 +1,444 @@
+"""Headless Grid3 gridset translation engine.
+
+Used by both the Streamlit app (main.py) and the command line (cli.py). Nothing
+in here touches Streamlit: progress goes through callbacks and problems are
+reported on the ``gridset_translator`` logger.
+"""
+from lxml import etree as ET
+from deep_translator import GoogleTranslator, MicrosoftTranslator, DeeplTranslator
+from collections import Counter
+import itertools
+import logging
+import tempfile
+import time
+from cache import split_cached, fill_translations, map_translations
+from gridset_zip import iter_grids, rewrite_gridset
+from grid_xml import extract_translatable_texts, rewrite_translated_xml
+from translation_units import TranslationUnitStore
+
+logger = logging.getLogger("gridset_translator")
+
+MAX_CACHE_SIZE = 1000
+
+# Translated pages bigger than this are spooled to a temporary file
+TRANSLATED_PAGE_SPOOL_SIZE = 8 * 1024 * 1024
+
+# Distinct strings sent to the translator per call, i.e. per progress report
+TRANSLATION_BATCH_SIZE = 100
+
+# Default cache shared by callers that don't bring their own
+translation_cache = {}
+
+def manage_cache(cache, max_size=MAX_CACHE_SIZE):
+    """Keep cache size under control by dropping the oldest entries in place"""
+    excess = len(cache) - max_size
+    if excess > 0:
+        for key in list(itertools.islice(cache, excess)):
+            del cache[key]
+
+def create_cdata(text):
+    return ET.CDATA(text)
+
+def rebuild_element_with_metadata(elem, translated_text, original_metadata, use_cdata=False):
+    """Rebuild either Parameter or WordList Text element structure with translated text and preserve metadata"""
+    if elem is None:
+        return
+        
+    if translated_text is None:
+        translated_text = ''
+    
+    try:
+        # Clear existing content while preserving attributes
+        attribs = dict(elem.attrib) if elem.attrib else {}
+        elem.clear()
+        for k, v in attribs.items():
+            if k is not None and v is not None:
+                elem.set(k, v)
+        
+        # Handle empty or whitespace-only translations
+        if not translated_text or not translated_text.strip():
+            # Create minimal valid structure
+            if len(elem.findall('.//p')) > 0:
+                p_elem = ET.SubElement(elem, 'p')
+                s_elem = ET.SubElement(p_elem, 's')
+            else:
+                s_elem = ET.SubElement(elem, 's')
+            r_elem = ET.SubElement(s_elem, 'r')
+            r_elem.text = ' '
+            return
+        
+        # Split the translated text into words, handling None or empty cases
+        words = [w for w in translated_text.strip().split() if w]
+        if not words:
+            words = [' ']
+        
+        # Check if we need a <p> wrapper (if original had one)
+        needs_p = len(elem.findall('.//p')) > 0
+        parent_elem = ET.SubElement(elem, 'p') if needs_p else elem
+        
+        meta_idx = 0
+        current_s = None
+        
+        for i, word in enumerate(words):
+            if word is None or not word.strip():
+                continue
+                
+            # Get metadata for this word
+            meta_data = {}
+            if meta_idx < len(original_metadata):
+                meta_type, meta_data = original_metadata[meta_idx]
+                
+                # Create new <s> element only if we need one (new word or different image)
+                if current_s is None or meta_type == 'word':
+                    current_s = ET.SubElement(parent_elem, 's')
+                    # Apply metadata (like Image attribute)
+                    for k, v in meta_data.items():
+                        if k is not None and v is not None:
+                            current_s.set(k, v)
+            
+            # Add the word
+            r_elem = ET.SubElement(current_s, 'r')
+            r_elem.text = create_cdata(word) if use_cdata else word
+            meta_idx += 1
+            
+            # Add space after word (except last word)
+            if i < len(words) - 1:
+                r_space = ET.SubElement(current_s, 'r')
+                r_space.text = create_cdata(' ')
+                meta_idx += 1
+    except Exception as e:
+        logger.error(f"Error rebuilding element: {e}")
+
+def translate_units(
+    store,
+    tool,
+    source_lang,
+    target_lang,
+    api_key=None,
+    region=None,
+    rate_limit_enabled=True,
+    cache=None,
+    stats=None,
+    max_cache_size=MAX_CACHE_SIZE,
+    on_progress=None
+):
+    """Translate every distinct text in ``store`` once, using and filling ``cache``.
+
+    ``stats`` is an optional Counter that receives texts (occurrences), chars
+    (their total length), unique_texts, cache_hits (distinct texts found in the
+    cache), api_texts and api_chars (what was actually sent to the service).
+    Uncached texts go to the translator ``TRANSLATION_BATCH_SIZE`` at a time,
+    and ``on_progress(done, total)`` is called after each batch.
+    """
+    if cache is None:
+        cache = translation_cache
+
+    logger.info("Translating collected texts...")
+    texts = store.texts()
+
+    # First pass: fill cache hits and group misses by text
+    translated_texts, pending = split_cached(texts, cache)
+    if stats is not None:
+        stats["texts"] += store.occurrences
+        stats["chars"] += store.occurrence_chars
+        stats["unique_texts"] += len(texts)
+        stats["cache_hits"] += len(texts) - len(pending)
+        stats["api_texts"] += len(pending)
+        stats["api_chars"] += sum(len(text) for text in pending)
+    if logger.isEnabledFor(logging.DEBUG):
+        for text, translated in zip(texts, translated_texts):
+            if text not in pending:
+                logger.debug("Cache hit: '%s' -> '%s'", text, translated)
+
+    # Translate uncached texts
+    if pending:
+        pending_texts = list(pending)
+        new_translations = []
+        for start in range(0, len(pending_texts), TRANSLATION_BATCH_SIZE):
+            batch = pending_texts[start:start + TRANSLATION_BATCH_SIZE]
+            new_translations.extend(translate_text(batch, tool, source_lang, target_lang, api_key, region, rate_limit_enabled))
+            if on_progress:
+                on_progress(len(new_translations), len(pending_texts))
+
+        # Update cache and translated_texts
+        fill_translations(translated_texts, pending, new_translations, cache)
+        for text, translation in zip(pending, new_translations):
+            logger.debug("Translated: '%s' -> '%s'", text, translation)
+
+        # Manage cache size
+        manage_cache(cache, max_cache_size)
+
+    store.set_translations(texts, translated_texts)
+    logger.info(
+        "%d texts, %d distinct (%.2fx dedupe), %d sent to the translator",
+        store.occurrences, len(texts), store.dedupe_ratio, len(pending)
+    )
+
+
+def collect_page(file, store, key):
+    """Pass 1 for one grid.xml: add its translatable texts to ``store`` under ``key``."""
+    def log_extract_error(locator, path, error):
+        logger.error("Error processing element #%d (%s): %s", locator, path, error)
+
+    rows = extract_translatable_texts(file, on_error=log_extract_error)
+    if logger.isEnabledFor(logging.DEBUG):
+        for row in rows:
+            logger.debug("Added %s text for translation: %s", row.kind, row.text)
+    store.add_page(key, rows)
+
+
+def write_translated_page(file, updates, use_cdata=False):
+    """Pass 2 for one grid.xml: stream it again, rebuilding each element in ``updates`` from its own row.
+
+    :param updates: ``{locator: (row, translation)}`` from ``TranslationUnitStore.page_updates``.
+    :param use_cdata: Write translated Parameter and WordList text as CDATA too (captions always are).
+    :return: File object with the translated page.
+    """
+    logger.info("Updating XML with translated texts...")
+
+    def update_element(locator, element, path):
+        row, translated = updates[locator]
+        try:
+            if row.kind in ["parameter", "wordlist"]:
+                rebuild_element_with_metadata(element, translated, row.runs, use_cdata)
+                logger.debug("Updated %s text with: %s", row.kind, translated)
+            elif row.kind == "caption":
+                # Handle None or empty translations for captions
+                if translated is None or not translated.strip():
+                    translated = row.text or ''  # Fallback to original text or empty string
+                element.text = create_cdata(translated.strip() + ' ')
+                logger.debug("Updated caption with CDATA: %s", translated)
+            else:  # simple
+                # Handle None or empty translations for simple text
+                if translated is None or not translated.strip():
+                    translated = row.text or ''  # Fallback to original text or empty string
+                element.text = create_cdata(translated) if use_cdata else translated
+                logger.debug("Updated element text: %s", translated)
+        except Exception as e:
+            logger.error("Error updating element #%d (%s): %s", locator, path, e)
+
+    # Small pages stay in memory, huge wordlist pages spill to disk
+    translated_xml = tempfile.SpooledTemporaryFile(max_size=TRANSLATED_PAGE_SPOOL_SIZE)
+    rewrite_translated_xml(file, translated_xml, updates, update_element)
+    translated_xml.seek(0)
+    logger.info("Modified XML saved successfully.")
+    return translated_xml
+
+
+def process_and_translate_xml(
+    file, 
+    tool, 
+    source_lang, 
+    target_lang, 
+    api_key=None, 
+    region=None, 
+    tweak_xml=False, 
+    rate_limit_enabled=True,
+    cache=None,
+    stats=None,
+    max_cache_size=MAX_CACHE_SIZE
+):
+    """Translate one grid.xml (path or seekable file object) and return it as a file object, or None on failure.
+
+    The page is streamed twice (collect, then rewrite) rather than held as a tree.
+    ``cache`` maps source texts to translations and is shared across calls;
+    ``stats`` is an optional Counter, as for ``translate_units``. With
+    ``tweak_xml`` the translated texts are written as CDATA.
+    """
+    try:
+        logger.info("Parsing XML and collecting translatable texts...")
+        store = TranslationUnitStore()
+        collect_page(file, store, None)
+        translate_units(store, tool, source_lang, target_lang, api_key, region, rate_limit_enabled,
+                        cache=cache, stats=stats, max_cache_size=max_cache_size)
+        return write_translated_page(file, store.page_updates(None), use_cdata=tweak_xml)
+    except Exception as e:
+        logger.error(f"Error processing XML: {e}")
+        return None
+
+def translate_text(text_list, tool, source_lang, target_lang, api_key=None, region=None, rate_limit_enabled=False):
+    try:
+        if not text_list:  # Handle empty list case
+            return []
+
+        # Deduplicate texts before translation to reduce API calls (keeps first-seen order)
+        unique_texts = list(dict.fromkeys(text for text in text_list if text))  # Filter out None/empty values
+        if not unique_texts:  # If no valid texts after filtering
+            return text_list
+
+        if tool == "Google":
+            translator = GoogleTranslator(source=source_lang, target=target_lang)
+            if rate_limit_enabled:
+                batch_size = 10
+                translated_texts = [''] * len(unique_texts)
+                
+                for i in range(0, len(unique_texts), batch_size):
+                    batch = unique_texts[i:i + batch_size]
+                    try:
+                        translations = translator.translate_batch(batch)
+                        # Ensure translations list matches batch size
+                        if translations and len(translations) == len(batch):
+                            translated_texts[i:i + len(batch)] = translations
+                        else:
+                            # If translation failed, use original texts
+                            translated_texts[i:i + len(batch)] = batch
+                    except Exception as batch_error:
+                        logger.error(f"Batch translation error: {batch_error}")
+                        # Use original texts for failed batch
+                        translated_texts[i:i + len(batch)] = batch
+                    
+                    if i + batch_size < len(unique_texts):
+                        time.sleep(0.5)
+                
+                # Map back to original order with fallback
+                return map_translations(text_list, unique_texts, translated_texts)
+            else:
+                try:
+                    translations = translator.translate_batch(unique_texts)
+                    return map_translations(text_list, unique_texts, translations)
+                except Exception as e:
+                    logger.error(f"Bulk translation error: {e}")
+                    return text_list
+                    
+        elif tool == "Microsoft":
+            if api_key and region:
+                try:
+                    translator = MicrosoftTranslator(api_key=api_key, source=source_lang, target=target_lang, region=region)
+                    translations = translator.translate_batch(unique_texts)
+                    return map_translations(text_list, unique_texts, translations)
+                except Exception as e:
+                    logger.error(f"Microsoft translation error: {e}")
+                    return text_list
+            else:
+                raise ValueError("Microsoft Translator requires both api_key and region.")
+                
+        elif tool == "DeepL":
+            if api_key:
+                try:
+                    translator = DeeplTranslator(api_key=api_key, source=source_lang, target=target_lang)
+                    translations = translator.translate_batch(unique_texts)
+                    return map_translations(text_list, unique_texts, translations)
+                except Exception as e:
+                    logger.error(f"DeepL translation error: {e}")
+                    return text_list
+            else:
+                raise ValueError("DeepL requires an api_key.")
+        else:
+            raise ValueError(f"Unknown translation tool: {tool}")
+    except Exception as e:
+        logger.error(f"Translation error: {e}")
+        return text_list  # Return original texts if translation fails
+
+# Function to get supported languages
+def get_supported_languages(tool, api_key=None, region=None):
+    try:
+        if tool == "Google":
+            return GoogleTranslator().get_supported_languages()
+        elif tool == "Microsoft":
+            if not api_key:
+                return []
+            return MicrosoftTranslator(api_key=api_key).get_supported_languages()
+        elif tool == "DeepL":
+            if not api_key:
+                return []
+            return DeeplTranslator(api_key=api_key).get_supported_languages()
+    except Exception as e:
+        logger.error(f"Error fetching supported languages: {e}")
+        return []
+
+def collect_gridset(source, store, gridset_key=None):
+    """Pass 1 for a gridset: add the texts of every grid page to ``store``.
+
+    Pages are keyed ``(gridset_key, member name)`` so one store can hold a whole
+    batch of gridsets. Pages that can't be read are logged and left out, and
+    ``write_translated_gridset`` then copies them unchanged.
+
+    :return: Number of pages collected.
+    """
+    collected = 0
+    for name, grid_file in iter_grids(source):
+        logger.info("Collecting texts from: %s", name)
+        try:
+            collect_page(grid_file, store, (gridset_key, name))
+            collected += 1
+        except Exception as e:
+            logger.error(f"Error reading file {name}: {e}")
+    return collected
+
+
+def write_translated_gridset(source, destination, store, gridset_key=None, stats=None, on_progress=None, use_cdata=False):
+    """Pass 2 for a gridset: stream ``source`` into ``destination`` with the translations in ``store``.
+
+    Pages with nothing to translate are copied across as they are, as are pages
+    that failed, which are counted in ``pages_failed``. ``use_cdata`` is passed
+    on to ``write_translated_page``.
+
+    :return: Counter with pages/pages_failed.
+    """
+    if stats is None:
+        stats = Counter()
+
+    def translate_grid(name, grid_file):
+        """Translate one grid.xml; returning None keeps the original page."""
+        key = (gridset_key, name)
+        if not store.has_page(key):
+            logger.error(f"Failed to translate: {name}")
+            stats["pages_failed"] += 1
+            return None
+        logger.info("Translating file: %s", name)
+        updates = store.page_updates(key)
+        store.drop_page(key)
+        if not updates:
+            stats["pages"] += 1
+            return None
+        try:
+            translated_xml = write_translated_page(grid_file, updates, use_cdata)
+        except Exception as e:
+            logger.error(f"Error translating file {name}: {e}")
+            stats["pages_failed"] += 1
+            return None
+        stats["pages"] += 1
+        return translated_xml
+
+    rewrite_gridset(source, destination, translate_grid, on_progress=on_progress)
+    return stats
+
+
+def translate_gridset(
+    source,
+    destination,
+    tool,
+    source_lang,
+    target_lang,
+    api_key=None,
+    region=None,
+    tweak_xml=False,
+    rate_limit_enabled=True,
+    cache=None,
+    stats=None,
+    max_cache_size=MAX_CACHE_SIZE,
+    on_progress=None,
+    on_translate_progress=None
+):
+    """Translate every grid page of a gridset, streaming ``source`` into ``destination``.
+
+    Every page is read first so each distinct text is translated once for the
+    whole gridset; pages that fail to translate are copied across unchanged.
+
+    :param source: Path or file object of the .gridset to translate.
+    :param destination: Path or seekable file object for the translated .gridset.
+    :param tweak_xml: Write translated Parameter and WordList text as CDATA (captions always are).
+    :param on_progress: Optional ``on_progress(done, total, name)`` called after each page.
+    :param on_translate_progress: Optional ``on_translate_progress(done, total)`` called
+        after each batch of strings is translated (see ``translate_units``).
+    :return: Counter with pages/pages_failed plus the text counts from translate_units.
+    """
+    if stats is None:
+        stats = Counter()
+
+    store = TranslationUnitStore()
+    collect_gridset(source, store)
+    translate_units(store, tool, source_lang, target_lang, api_key, region, rate_limit_enabled,
+                    cache=cache, stats=stats, max_cache_size=max_cache_size, on_progress=on_translate_progress)
+    write_translated_gridset(source, destination, store, stats=stats, on_progress=on_progress, use_cdata=tweak_xml)
+    return stats
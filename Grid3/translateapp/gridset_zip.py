@@ -0,0 +1,100 @@
+"""Stream a gridset (zip) into a new gridset, rewriting only the grid pages.
+
+Members that are not rewritten are streamed from the input zip to the output
+zip in fixed-size chunks through zipfile's public open() API, so neither the
+archive nor its assets are ever extracted to disk or held in memory. Only one
+grid.xml is parsed at a time, which bounds peak memory by the largest single
+grid file.
+"""
+import shutil
+import zipfile
+
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def is_grid_xml(name):
+    """True for ``Grids/<page>/grid.xml`` members."""
+    parts = name.replace('\\', '/').split('/')
+    return len(parts) == 3 and parts[0] == "Grids" and parts[2] == "grid.xml"
+
+
+def copy_member(zin, zout, info):
+    """Copy one member by streaming it through inflate/deflate a chunk at a time.
+
+    Stored members stay stored; everything else is written deflated. Setting
+    the size up front lets zipfile pick zip64 headers when they're needed.
+    """
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new_info.compress_type = zipfile.ZIP_STORED if info.compress_type == zipfile.ZIP_STORED else zipfile.ZIP_DEFLATED
+    new_info.external_attr = info.external_attr
+    new_info.comment = info.comment
+    new_info.file_size = info.file_size
+    with zin.open(info) as src, zout.open(new_info, "w") as dst:
+        shutil.copyfileobj(src, dst, COPY_CHUNK_SIZE)
+
+
+def write_member(zout, info, data):
+    """Write rewritten ``data`` (bytes or a readable file object) under ``info``'s name."""
+    new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+    new_info.compress_type = zipfile.ZIP_DEFLATED
+    new_info.external_attr = info.external_attr
+    if isinstance(data, (bytes, bytearray)):
+        zout.writestr(new_info, data)
+        return
+    with zout.open(new_info, "w") as dst:
+        shutil.copyfileobj(data, dst, COPY_CHUNK_SIZE)
+
+
+def count_grids(source, is_grid=is_grid_xml):
+    """Number of members ``rewrite_gridset`` would pass to its callback (reads the central directory only)."""
+    with zipfile.ZipFile(source, "r") as zin:
+        return sum(1 for info in zin.infolist() if is_grid(info.filename))
+
+
+def iter_grids(source, is_grid=is_grid_xml):
+    """Yield ``(name, open member file)`` for each grid page, one at a time."""
+    with zipfile.ZipFile(source, "r") as zin:
+        for info in zin.infolist():
+            if is_grid(info.filename):
+                with zin.open(info) as grid_file:
+                    yield info.filename, grid_file
+
+
+def rewrite_gridset(source, destination, rewrite_grid, is_grid=is_grid_xml, on_progress=None):
+    """Stream ``source`` into ``destination``, passing each grid page through ``rewrite_grid``.
+
+    :param source: Path or seekable file object of the input gridset.
+    :param destination: Path or seekable file object for the output gridset.
+    :param rewrite_grid: Called as ``rewrite_grid(name, grid_file)`` with an open
+        member file; returns the new content (bytes or file object), or None to
+        keep the original grid unchanged.
+    :param is_grid: Predicate selecting which member names are rewritten.
+    :param on_progress: Optional ``on_progress(done, total, name)`` called after each grid.
+    :return: Tuple (grids rewritten, grids kept unchanged, other members copied).
+    """
+    rewritten = kept = copied = 0
+    with zipfile.ZipFile(source, "r") as zin, zipfile.ZipFile(destination, "w", zipfile.ZIP_DEFLATED) as zout:
+        infos = zin.infolist()
+        total = sum(1 for info in infos if is_grid(info.filename))
+        done = 0
+        for info in infos:
+            if not is_grid(info.filename):
+                copy_member(zin, zout, info)
+                copied += 1
+                continue
+
+            with zin.open(info) as grid_file:
+                new_content = rewrite_grid(info.filename, grid_file)
+            if new_content is None:
+                copy_member(zin, zout, info)
+                kept += 1
+            else:
+                write_member(zout, info, new_content)
+                if hasattr(new_content, "close"):
+                    new_content.close()
+                rewritten += 1
+
+            done += 1
+            if on_progress:
+                on_progress(done, total, info.filename)
+    return rewritten, kept, copied
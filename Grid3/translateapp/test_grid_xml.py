@@ -0,0 +1,64 @@
+"""Tests for the streaming grid.xml extraction and rewrite.
+
+    python -m pytest test_grid_xml.py
+"""
+import io
+
+from grid_xml import extract_translatable_texts, rewrite_translated_xml
+
+PAGE = b"""\xef\xbb\xbf<?xml version="1.0" encoding="utf-8"?>
+<!-- exported by Grid 3 -->
+<Grid xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance">
+  <Cells>
+    <Cell X="1">
+      <Content>
+        <Commands>
+          <Command ID="Jump.To">
+            <Parameter Key="grid">Home</Parameter>
+          </Command>
+          <Command ID="Action.InsertText">
+            <Parameter Key="text"><p><s Image="[widgit]hello.emf"><r>good</r><r><![CDATA[ ]]></r><r>morning</r></s></p></Parameter>
+          </Command>
+        </Commands>
+        <CaptionAndImage>
+          <Caption><![CDATA[hello ]]></Caption>
+        </CaptionAndImage>
+      </Content>
+    </Cell>
+  </Cells>
+</Grid>"""
+
+
+def rewrite(page, update=lambda locator, element, path: None):
+    rows = extract_translatable_texts(io.BytesIO(page))
+    output = io.BytesIO()
+    rewrite_translated_xml(io.BytesIO(page), output, {row.locator for row in rows}, update)
+    return rows, output.getvalue()
+
+
+def test_extract_with_prolog_comment():
+    rows = extract_translatable_texts(io.BytesIO(PAGE))
+    assert [(row.kind, row.text) for row in rows] == [("parameter", "good   morning"), ("caption", "hello")]
+    assert rows[0].runs[0] == ("word", {"Image": "[widgit]hello.emf"})
+
+
+def test_untranslated_round_trip_is_unchanged():
+    _, output = rewrite(PAGE)
+    assert output == PAGE
+
+
+def test_namespaces_are_not_redeclared():
+    page = PAGE.replace(b'<Cell X="1">', b'<Cell X="1"><Image xsi:nil="true">x</Image>')
+    _, output = rewrite(page)
+    assert output.count(b"xmlns:xsi") == 1
+    assert b'<Image xsi:nil="true">x</Image>' in output
+
+
+def test_translated_caption():
+    def update(locator, element, path):
+        if element.tag == "Caption":
+            element.text = "bonjour "
+
+    _, output = rewrite(PAGE, update)
+    assert b"<Caption>bonjour </Caption>\n" in output
+    assert output.startswith(PAGE[:PAGE.index(b"<Grid")])
@@ -0,0 +1,55 @@
+"""Translation units shared by every page in a translation job.
+
+A unit is one distinct source text. Each place it appears on a page is an
+occurrence: the ExtractedText row from grid_xml, which carries that element's
+own run metadata (the ``<s Image=...>`` attributes). Keeping the two apart means
+a text is translated once per job however many pages and gridsets use it,
+while every element is still rebuilt with its own images.
+"""
+
+
+class TranslationUnitStore:
+    """Distinct texts of a job plus the occurrences of each text, grouped by page."""
+
+    def __init__(self):
+        self.translations = {}  # text -> translation (None until translated), in first-seen order
+        self.pages = {}  # page key -> list of ExtractedText occurrences
+        self.occurrences = 0
+        self.occurrence_chars = 0
+
+    def add_page(self, key, rows):
+        """Record the rows extracted from one page; ``key`` is any hashable page identifier."""
+        self.pages[key] = rows
+        for row in rows:
+            self.translations.setdefault(row.text, None)
+        self.occurrences += len(rows)
+        self.occurrence_chars += sum(len(row.text) for row in rows)
+
+    def has_page(self, key):
+        return key in self.pages
+
+    def texts(self):
+        """Distinct texts in first-seen order."""
+        return list(self.translations)
+
+    def set_translations(self, texts, translations):
+        for text, translation in zip(texts, translations):
+            self.translations[text] = translation
+
+    def page_updates(self, key):
+        """``{locator: (row, translation)}`` for one page, as used by the rewrite pass."""
+        translations = self.translations
+        return {row.locator: (row, translations[row.text]) for row in self.pages.get(key, ())}
+
+    def drop_page(self, key):
+        """Forget a page's occurrences once it has been written (its units stay)."""
+        self.pages.pop(key, None)
+
+    @property
+    def unique_chars(self):
+        return sum(len(text) for text in self.translations)
+
+    @property
+    def dedupe_ratio(self):
+        """Occurrences per distinct text (1.0 means nothing was shared)."""
+        return self.occurrences / len(self.translations) if self.translations else 1.0
@@ -0,0 +1,266 @@
+"""
+Selection-rate analytics over LAM logs.
+
+One pass over the events (from LAMParser) fills compact columns - event time,
+kind and location id - and reconstructs the utterances at the same time.
+Everything else is worked out on those columns with NumPy:
+
+- inter-selection intervals: the time between consecutive LOC hits, ignoring
+  pauses longer than --idle seconds and gaps across RECORD OFF
+- words per minute over the time spent composing each message
+- correction rate: DEL hits per LOC hit
+- hits per key location (e.g. J5)
+- all of the above per day, week or hour bucket
+
+The median interval and the extra time taken by a hit that follows a page
+change (its median interval less the overall median), both in seconds, are
+printed as measured values for GridAnalysis's selection_time and per-step
+navigation weight. The navigation weight is clamped at 0, since a page change
+can't make the next hit cheaper, and is left out when fewer than
+MIN_CALIBRATION_SAMPLES hits follow a page change.
+"""
+import argparse
+import csv
+import sys
+from array import array
+
+import numpy as np
+
+from LAMParser import DELETE_LABELS, iter_events, reconstruct_utterances, format_time
+
+# Event kinds stored in the kind column
+HIT, DELETE, PAGE_CHANGE, RECORD_OFF, OTHER = range(5)
+
+BUCKET_SECONDS = {'hour': 60 * 60, 'day': 24 * 60 * 60, 'week': 7 * 24 * 60 * 60}
+
+# Pauses longer than this (seconds) are breaks, not time spent selecting
+DEFAULT_IDLE_SECONDS = 60
+
+# Hits after a page change needed before a navigation step weight is reported
+MIN_CALIBRATION_SAMPLES = 5
+
+
+class EventColumns:
+	"""Columns of event time, kind and location id, filled one event at a time."""
+
+	def __init__(self):
+		self.times = array('d')
+		self.kinds = array('b')
+		self.locations = array('i')  # index into location_names, -1 if none
+		self.location_ids = {}
+		self.location_names = []
+
+	def add(self, event):
+		if event.code == 'LOC':
+			kind = DELETE if (event.label or '').upper() in DELETE_LABELS else HIT
+			location = self.location_ids.get(event.location)
+			if location is None:
+				location = self.location_ids[event.location] = len(self.location_names)
+				self.location_names.append(event.location)
+		else:
+			if event.code == 'CTL' and event.text.startswith('Page transition'):
+				kind = PAGE_CHANGE
+			elif event.code == 'RECORD' and event.text == 'OFF':
+				kind = RECORD_OFF
+			else:
+				kind = OTHER
+			location = -1
+		self.times.append(event.time)
+		self.kinds.append(kind)
+		self.locations.append(location)
+
+	def record(self, events):
+		"""Pass ``events`` through unchanged, adding each to the columns on the way."""
+		for event in events:
+			self.add(event)
+			yield event
+
+	def to_numpy(self):
+		return np.frombuffer(self.times, dtype=np.float64), np.frombuffer(self.kinds, dtype=np.int8), np.frombuffer(self.locations, dtype=np.int32)
+
+
+def collect(events):
+	"""
+	Read the events once, returning the event columns and utterance columns.
+
+	:return: Tuple (EventColumns, dict of NumPy arrays 'start', 'end', 'words', 'corrections').
+	"""
+	columns = EventColumns()
+	starts, ends, words, corrections = array('d'), array('d'), array('i'), array('i')
+	for utterance in reconstruct_utterances(columns.record(events)):
+		starts.append(utterance.start)
+		ends.append(utterance.end)
+		words.append(len(utterance.text.split()))
+		corrections.append(utterance.corrections)
+	utterances = {
+		'start': np.frombuffer(starts, dtype=np.float64),
+		'end': np.frombuffer(ends, dtype=np.float64),
+		'words': np.frombuffer(words, dtype=np.int32),
+		'corrections': np.frombuffer(corrections, dtype=np.int32),
+	}
+	return columns, utterances
+
+
+def selection_intervals(times, kinds, idle_seconds):
+	"""
+	Time between consecutive key hits (LOC, including DEL), skipping breaks.
+
+	:return: Tuple (hit times, intervals, follows_page_change) where intervals[i]
+		is the time from the previous hit to hit i+1 (NaN for breaks and for the
+		first hit after RECORD OFF) and follows_page_change[i] says whether a page
+		changed between them.
+	"""
+	is_hit = (kinds == HIT) | (kinds == DELETE)
+	hit_index = np.flatnonzero(is_hit)
+	hit_times = times[hit_index]
+	intervals = np.diff(hit_times)
+
+	# Count page changes and RECORD OFFs seen so far at every event; a difference between two hits means one happened between them
+	page_changes = np.cumsum(kinds == PAGE_CHANGE)[hit_index]
+	record_offs = np.cumsum(kinds == RECORD_OFF)[hit_index]
+	follows_page_change = np.diff(page_changes) > 0
+	broken = (np.diff(record_offs) > 0) | (intervals > idle_seconds) | (intervals < 0)
+	intervals = np.where(broken, np.nan, intervals)
+	return hit_times, intervals, follows_page_change
+
+
+def words_per_minute(utterances):
+	"""Words per minute over the composing time of each utterance (NaN for single-selection messages)."""
+	minutes = (utterances['end'] - utterances['start']) / 60
+	with np.errstate(divide='ignore', invalid='ignore'):
+		return np.where(minutes > 0, utterances['words'] / minutes, np.nan)
+
+
+def nan_stat(function, values):
+	values = values[~np.isnan(values)]
+	return round(float(function(values)), 3) if values.size else None
+
+
+def summarise(columns, utterances, idle_seconds=DEFAULT_IDLE_SECONDS):
+	"""Overall figures for a set of logs."""
+	times, kinds, locations = columns.to_numpy()
+	_, intervals, follows_page_change = selection_intervals(times, kinds, idle_seconds)
+	hits = int(np.count_nonzero(kinds == HIT))
+	deletes = int(np.count_nonzero(kinds == DELETE))
+	composing = utterances['end'] - utterances['start']
+	total_minutes = composing[composing > 0].sum() / 60
+
+	median_interval = nan_stat(np.median, intervals)
+	after_page_change = intervals[follows_page_change]
+	median_after_page_change = nan_stat(np.median, after_page_change)
+	navigation_step_weight = None
+	if median_interval is not None and np.count_nonzero(~np.isnan(after_page_change)) >= MIN_CALIBRATION_SAMPLES:
+		navigation_step_weight = round(max(median_after_page_change - median_interval, 0.0), 3)
+	return {
+		'Events': int(times.size),
+		'Selections': hits + deletes,
+		'Utterances': int(utterances['words'].size),
+		'Words': int(utterances['words'].sum()),
+		'Median inter-selection interval (s)': median_interval,
+		'Mean inter-selection interval (s)': nan_stat(np.mean, intervals),
+		'90th percentile interval (s)': nan_stat(lambda v: np.percentile(v, 90), intervals),
+		'Words per minute': round(float(utterances['words'][composing > 0].sum() / total_minutes), 2) if total_minutes else None,
+		'Median utterance words per minute': nan_stat(np.median, words_per_minute(utterances)),
+		'Correction rate': round(deletes / (hits + deletes), 4) if hits + deletes else None,
+		'Median interval after a page change (s)': median_after_page_change,
+		# Measured values for GridAnalysis's selection_time and NAVIGATION_STEP_WEIGHT
+		'Calibrated selection_time': median_interval,
+		'Calibrated navigation step weight (s)': navigation_step_weight,
+	}
+
+
+def location_frequencies(columns):
+	"""Hits per key location, most used first."""
+	_, kinds, locations = columns.to_numpy()
+	counts = np.bincount(locations[kinds == HIT], minlength=len(columns.location_names))
+	order = np.argsort(-counts, kind='stable')
+	return [(columns.location_names[i], int(counts[i])) for i in order if counts[i]]
+
+
+def bucket_summaries(columns, utterances, bucket='day', idle_seconds=DEFAULT_IDLE_SECONDS):
+	"""
+	Per-bucket figures, one row per hour, day or week that has events.
+
+	:return: List of dictionaries, oldest bucket first.
+	"""
+	size = BUCKET_SECONDS[bucket]
+	times, kinds, _ = columns.to_numpy()
+	if not times.size:
+		return []
+	hit_times, intervals, _ = selection_intervals(times, kinds, idle_seconds)
+
+	event_buckets = (times // size).astype(np.int64)
+	buckets = np.unique(event_buckets)
+	count = buckets.size
+
+	def per_bucket(keys, weights=None):
+		return np.bincount(np.searchsorted(buckets, keys), weights=weights, minlength=count)
+
+	hits = per_bucket(event_buckets[kinds == HIT])
+	deletes = per_bucket(event_buckets[kinds == DELETE])
+
+	# Intervals belong to the bucket of the hit that ends them
+	interval_buckets = (hit_times[1:] // size).astype(np.int64)
+	valid = ~np.isnan(intervals)
+	interval_count = per_bucket(interval_buckets[valid])
+	interval_total = per_bucket(interval_buckets[valid], intervals[valid])
+
+	utterance_buckets = (utterances['start'] // size).astype(np.int64)
+	composing = utterances['end'] - utterances['start']
+	timed = composing > 0
+	words = per_bucket(utterance_buckets, utterances['words'])
+	utterance_count = per_bucket(utterance_buckets)
+	timed_words = per_bucket(utterance_buckets[timed], utterances['words'][timed])
+	timed_minutes = per_bucket(utterance_buckets[timed], composing[timed] / 60)
+
+	with np.errstate(divide='ignore', invalid='ignore'):
+		mean_interval = interval_total / interval_count
+		wpm = timed_words / timed_minutes
+		correction_rate = deletes / (hits + deletes)
+
+	def value(number, digits):
+		return round(float(number), digits) if np.isfinite(number) else None
+
+	return [{
+		'Bucket': format_time(float(buckets[i] * size)),
+		'Selections': int(hits[i] + deletes[i]),
+		'Utterances': int(utterance_count[i]),
+		'Words': int(words[i]),
+		'Mean inter-selection interval (s)': value(mean_interval[i], 3),
+		'Words per minute': value(wpm[i], 2),
+		'Correction rate': value(correction_rate[i], 4),
+	} for i in range(count)]
+
+
+def save_to_csv(data, filename):
+	with open(filename, mode='w', newline='', encoding='utf-8') as file:
+		writer = csv.DictWriter(file, fieldnames=data[0].keys())
+		writer.writeheader()
+		for row in data:
+			writer.writerow(row)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Selection rates, WPM and key use from NuVoice LAM logs.')
+	parser.add_argument('logs', nargs='+', help='LAM log files, oldest first')
+	parser.add_argument('--bucket', choices=sorted(BUCKET_SECONDS), default='day', help='Period for the time-bucketed summary')
+	parser.add_argument('--idle', type=float, default=DEFAULT_IDLE_SECONDS, help='Pauses longer than this many seconds are not counted as selection time')
+	parser.add_argument('--output', type=str, help='Output directory for csv files', default=None)
+	args = parser.parse_args()
+
+	columns, utterances = collect(iter_events(args.logs))
+	for key, value in summarise(columns, utterances, args.idle).items():
+		print(f"{key}: {value}")
+	frequencies = location_frequencies(columns)
+	print(f"Most used locations: {frequencies[:20]}")
+
+	if args.output:
+		buckets = bucket_summaries(columns, utterances, args.bucket, args.idle)
+		if buckets:
+			save_to_csv(buckets, f"{args.output}/lam_{args.bucket}_summary.csv")
+		if frequencies:
+			save_to_csv([{'Location': location, 'Hits': hits} for location, hits in frequencies], f"{args.output}/lam_locations.csv")
+		print(f"Wrote summaries to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+	main()
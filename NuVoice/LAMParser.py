@@ -0,0 +1,227 @@
+"""
+Parse PRC NuVoice LAM (Language Activity Monitoring) logs into events and utterances.
+
+A LAM log is a preamble followed by days of events:
+
+	*[YY-MM-DD=21-05-13]*
+	15:48:08.352 LOC =F2 [ ]
+	15:48:08.378 SPE "l"
+
+Every line is parsed on its own, so logs spanning years are streamed in
+constant memory. Event times are made absolute by adding the time of day to
+the last date header; they are seconds since the epoch, reading the device's
+local clock as if it were UTC, so they can be subtracted and bucketed directly.
+
+See LAM-example.txt in the root of this repo for a full example.
+"""
+import argparse
+import calendar
+import csv
+import datetime
+import sys
+from collections import namedtuple
+
+# code is LOC (a key hit at location, e.g. "H4", with its label if it has one),
+# SPE/PAG/??? (text the hit produced), CTL (a device message such as a page
+# transition) or RECORD (text is ON or OFF). Fields a code doesn't use are None.
+LAMEvent = namedtuple('LAMEvent', ['time', 'code', 'location', 'label', 'text'])
+
+# One reconstructed message: the text built up between utterance boundaries
+Utterance = namedtuple('Utterance', ['start', 'end', 'text', 'selections', 'corrections'])
+
+# Event codes whose quoted text goes into the message being composed
+TEXT_CODES = {'SPE', '???'}
+
+# Event codes whose quoted text is a whole stored message (e.g. a quick message)
+MESSAGE_CODES = {'PAG'}
+
+# LOC labels that finish the message being composed
+UTTERANCE_END_LABELS = {'CLEAR', 'SPEAK'}
+
+# LOC labels that delete the last character of the message being composed
+DELETE_LABELS = {'DEL', 'DELETE', 'BACKSPACE'}
+
+SECONDS_PER_DAY = 24 * 60 * 60
+
+
+def parse_date_header(line):
+	"""
+	The epoch seconds at midnight of a "*[YY-MM-DD=21-05-13]*" header, or None if the line isn't one.
+	"""
+	if not line.startswith('*[YY-MM-DD='):
+		return None
+	try:
+		year, month, day = line[11:19].split('-')
+		return calendar.timegm((2000 + int(year), int(month), int(day), 0, 0, 0))
+	except ValueError:
+		return None
+
+
+def parse_time_of_day(text):
+	"""Seconds since midnight for "HH:MM:SS.mmm", or None."""
+	if len(text) != 12 or text[2] != ':' or text[5] != ':' or text[8] != '.':
+		return None
+	try:
+		return int(text[0:2]) * 3600 + int(text[3:5]) * 60 + int(text[6:8]) + int(text[9:12]) / 1000
+	except ValueError:
+		return None
+
+
+def parse_lam(lines):
+	"""
+	Yield a LAMEvent for every event line in ``lines`` (any iterable of strings, e.g. an open file).
+
+	The preamble and unrecognised lines are skipped. If the clock jumps back by
+	more than half a day with no new date header, the log is taken to have run
+	past midnight.
+	"""
+	day = None
+	last_time = None
+	for line in lines:
+		line = line.rstrip('\r\n')
+		if line.startswith('*['):
+			midnight = parse_date_header(line)
+			if midnight is not None:
+				day = midnight
+				last_time = None
+			continue
+		if day is None:
+			continue
+		seconds = parse_time_of_day(line[:12])
+		if seconds is None:
+			continue
+		time = day + seconds
+		if last_time is not None and time < last_time - SECONDS_PER_DAY / 2:
+			day += SECONDS_PER_DAY
+			time += SECONDS_PER_DAY
+		last_time = time
+
+		code, _, rest = line[13:].partition(' ')
+		if code == 'LOC':
+			# "=H4" or "=F1 [REST]"
+			location, _, label = rest.partition(' ')
+			label = label.strip()
+			if label.startswith('[') and label.endswith(']'):
+				label = label[1:-1].strip()
+			yield LAMEvent(time, code, location.lstrip('='), label or None, None)
+		elif code == 'RECORD':
+			yield LAMEvent(time, code, None, None, rest.strip())
+		else:
+			# SPE "h", CTL "Page transition ..." etc: the text between the outer quotes
+			start = rest.find('"')
+			end = rest.rfind('"')
+			text = rest[start + 1:end] if 0 <= start < end else rest.strip()
+			yield LAMEvent(time, code, None, None, text)
+
+
+def read_lam_file(file_path):
+	"""Stream the LAMEvents of one log file."""
+	with open(file_path, encoding='utf-8', errors='replace') as f:
+		yield from parse_lam(f)
+
+
+def reconstruct_utterances(events):
+	"""
+	Rebuild the messages composed in a stream of LAMEvents.
+
+	Text from SPE and ??? events is appended as it is produced; a DEL key
+	removes the last character (and counts as a correction). A CLEAR or SPEAK
+	key, RECORD OFF or the end of the log finishes the message; key hits since
+	the previous message count as its selections. PAG events are stored
+	messages and become utterances of their own, one selection each; one
+	sent while a message is being composed is held until that message
+	finishes, so utterances come out in start order. Only the open message and
+	those stored messages are held, so memory doesn't grow with the log.
+
+	:return: Iterator of Utterance(start, end, text, selections, corrections) in start order; blank messages are dropped.
+	"""
+	text = []
+	start = end = None
+	selections = corrections = 0
+	stored = []
+
+	def finish():
+		utterance = ''.join(text).strip()
+		if utterance:
+			yield Utterance(start, end, utterance, selections, corrections)
+		yield from stored
+
+	for event in events:
+		boundary = False
+		if event.code in TEXT_CODES:
+			if start is None:
+				start = event.time
+			text.append(event.text)
+			end = event.time
+		elif event.code in MESSAGE_CODES:
+			if event.text.strip():
+				utterance = Utterance(event.time, event.time, event.text.strip(), 1, 0)
+				if start is None:
+					yield utterance
+				else:
+					stored.append(utterance)
+		elif event.code == 'LOC':
+			label = (event.label or '').upper()
+			selections += 1
+			if label in DELETE_LABELS:
+				if text:
+					text[-1] = text[-1][:-1]
+					if not text[-1]:
+						text.pop()
+					corrections += 1
+					end = event.time
+			elif label in UTTERANCE_END_LABELS:
+				boundary = True
+		elif event.code == 'RECORD' and event.text == 'OFF':
+			boundary = True
+
+		if boundary:
+			yield from finish()
+			text = []
+			start = end = None
+			selections = corrections = 0
+			stored = []
+
+	yield from finish()
+
+
+def write_corpus(utterances, filename):
+	"""
+	Write utterances to a CSV message history, one row per message, as they arrive.
+
+	:return: Number of utterances written.
+	"""
+	count = 0
+	with open(filename, mode='w', newline='', encoding='utf-8') as file:
+		writer = csv.writer(file)
+		writer.writerow(['Start', 'End', 'Utterance', 'Selections', 'Corrections'])
+		for utterance in utterances:
+			writer.writerow([format_time(utterance.start), format_time(utterance.end), utterance.text, utterance.selections, utterance.corrections])
+			count += 1
+	return count
+
+
+EPOCH = datetime.datetime(1970, 1, 1)
+
+
+def format_time(time):
+	"""Render an event time as "YYYY-MM-DD HH:MM:SS.mmm"."""
+	return (EPOCH + datetime.timedelta(milliseconds=round(time * 1000))).isoformat(' ', 'milliseconds')
+
+
+def iter_events(file_paths):
+	for file_path in file_paths:
+		yield from read_lam_file(file_path)
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Turn NuVoice LAM logs into a message-history corpus.')
+	parser.add_argument('logs', nargs='+', help='LAM log files, oldest first')
+	parser.add_argument('--output', type=str, help='CSV file to write the corpus to', default='lam_corpus.csv')
+	args = parser.parse_args()
+
+	count = write_corpus(reconstruct_utterances(iter_events(args.logs)), args.output)
+	print(f"Wrote {count} utterances to {args.output}", file=sys.stderr)
+
+if __name__ == "__main__":
+	main()
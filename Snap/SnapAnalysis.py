@@ -1,5 +1,49 @@
 import sqlite3
 import argparse
+import csv
+import importlib.util
+import os
+import sys
+import urllib.parse
+from collections import deque
+
+GRID3_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Grid3')
+
+# Grid 3 modules import these siblings by plain name, so they're loaded first
+GRID3_DEPENDENCIES = {
+	'GridAnalysis': ('OBFReader', 'TouchChatReader', 'GridGeometry', 'ScoringProfiles'),
+	'TouchChatReader': ('OBFReader',),
+}
+
+
+def import_grid3_module(name):
+	"""
+	Import one of the Grid 3 analysis modules by file path, without putting Grid3 on sys.path.
+
+	Each module is registered in sys.modules under its own name, so the plain
+	"from OBFReader import OBFPage" in GridAnalysis gets the same module (and
+	OBFPage class) as this script.
+	"""
+	if name in sys.modules:
+		return sys.modules[name]
+	for dependency in GRID3_DEPENDENCIES.get(name, ()):
+		import_grid3_module(dependency)
+	spec = importlib.util.spec_from_file_location(name, os.path.join(GRID3_DIRECTORY, f"{name}.py"))
+	module = importlib.util.module_from_spec(spec)
+	sys.modules[name] = module
+	try:
+		spec.loader.exec_module(module)
+	except BaseException:
+		del sys.modules[name]
+		raise
+	return module
+
+
+# Effort scoring and the CSV columns come from the Grid 3 analysis so the outputs can be compared directly
+OBFPage = import_grid3_module('OBFReader').OBFPage
+GridAnalysis = import_grid3_module('GridAnalysis')
+DEFAULT_PROFILE = import_grid3_module('ScoringProfiles').DEFAULT_PROFILE
+
 
 def save_to_csv(data, filename):
 	"""
@@ -15,93 +59,255 @@ def save_to_csv(data, filename):
 			writer.writerow(row)
 
 
+# Rows pulled from SQLite per fetchmany() call
+FETCH_BATCH_SIZE = 5000
+
+# (table, column) pairs the queries look rows up by
+JOIN_KEYS = [
+	("ElementReference", "Id"),
+	("ElementReference", "PageId"),
+	("ElementPlacement", "ElementReferenceId"),
+	("Button", "ElementReferenceId"),
+	("Page", "UniqueId"),
+]
+
+
 def connect_to_database(file_path):
-	""" Connect to the SQLite database and return a connection object. """
-	return sqlite3.connect(file_path)
+	""" Open the .sps read-only; immutable tells SQLite nothing else will change it, so it skips locking. """
+	uri = f"file:{urllib.parse.quote(os.path.abspath(file_path))}?mode=ro&immutable=1"
+	return sqlite3.connect(uri, uri=True)
 
-def extract_data_from_snap_db(connection):
-	""" Extract relevant data from the database for analysis. """
-	cursor = connection.cursor()
-	
-	# Extracting button labels and corresponding page titles
-	query = """
-	SELECT b.Label, p.Title 
-	FROM Button AS b
-	JOIN ButtonPageLink AS bpl ON b.Id = bpl.ButtonId
-	JOIN Page AS p ON bpl.PageUniqueId = p.UniqueId
+def iter_rows(cursor, batch_size=FETCH_BATCH_SIZE):
+	""" Iterate a cursor's results in fetchmany batches rather than materialising them all. """
+	while True:
+		rows = cursor.fetchmany(batch_size)
+		if not rows:
+			return
+		yield from rows
+
+def is_indexed(connection, table, column):
+	""" True if ``column`` is the rowid or the leading column of an index on ``table``. """
+	for _, name, column_type, _, _, pk in connection.execute(f'PRAGMA table_info("{table}")'):
+		if name == column and pk == 1 and column_type.upper() == "INTEGER":
+			return True
+	for index in connection.execute(f'PRAGMA index_list("{table}")').fetchall():
+		first_column = connection.execute(f'PRAGMA index_info("{index[1]}")').fetchone()
+		if first_column and first_column[2] == column:
+			return True
+	return False
+
+def prepare_join_tables(connection):
 	"""
-	cursor.execute(query)
-	button_page_data = cursor.fetchall()
+	Make sure every join key in JOIN_KEYS can be looked up by index.
 
-	# Example of additional data extraction and processing
-	# ...
+	The .sps is opened read-only and SQLite won't put a TEMP index on a main
+	table, so for a key with no index only that column and the rowid are copied
+	(inside SQLite, not Python) into an indexed TEMP table; join_on looks the
+	key up there and goes back to the row by rowid.
 
-	return button_page_data
+	:return: Dictionary of (table, column) -> TEMP key table, or None where the table's own index is used.
+	"""
+	tables = {}
+	for table, column in JOIN_KEYS:
+		if is_indexed(connection, table, column):
+			tables[(table, column)] = None
+			continue
+		key_table = f"temp_{table}_by_{column}"
+		connection.execute(f'CREATE TEMP TABLE IF NOT EXISTS {key_table} AS SELECT "{column}", rowid AS row_id FROM "{table}"')
+		connection.execute(f'CREATE INDEX IF NOT EXISTS temp.{key_table}_idx ON {key_table}("{column}")')
+		tables[(table, column)] = key_table
+	return tables
+
+def join_on(tables, table, column, alias, value, kind="JOIN"):
+	""" SQL joining ``table`` as ``alias`` on ``alias.column = value``, through its TEMP key table if it has one. """
+	key_table = tables[(table, column)]
+	if key_table is None:
+		return f'{kind} "{table}" AS {alias} ON {alias}."{column}" = {value}'
+	return (f'{kind} {key_table} AS {alias}_key ON {alias}_key."{column}" = {value} '
+			f'{kind} "{table}" AS {alias} ON {alias}.rowid = {alias}_key.row_id')
+
+def parse_pair(value, default):
+	""" Parse a "a,b" string such as GridDimension, GridPosition or GridSpan into a tuple of ints. """
+	try:
+		a, b = value.split(',')
+		return int(a), int(b)
+	except (AttributeError, ValueError):
+		return default
 
-def extract_cell_data_from_snap_db(connection):
-	""" Extract cell data from the database for analysis. """
+def extract_pages_from_snap_db(connection):
+	""" Return {page id: (unique id, title, rows, cols)} for every page. """
+	pages = {}
+	for page_id, unique_id, title, grid_dimension in iter_rows(connection.execute("SELECT Id, UniqueId, Title, GridDimension FROM Page")):
+		rows, cols = parse_pair(grid_dimension, (0, 0))
+		pages[page_id] = (unique_id, title, rows, cols)
+	return pages
+
+def extract_page_links_from_snap_db(connection, tables):
+	""" Page-to-page links (source page id, target page id), worked out in SQL from ButtonPageLink. """
+	query = f"""
+	SELECT DISTINCT er.PageId, target.Id
+	FROM ButtonPageLink AS bpl
+	JOIN Button AS b ON b.Id = bpl.ButtonId
+	{join_on(tables, "ElementReference", "Id", "er", "b.ElementReferenceId")}
+	{join_on(tables, "Page", "UniqueId", "target", "bpl.PageUniqueId")}
+	"""
+	return iter_rows(connection.execute(query))
+
+def extract_cell_data_from_snap_db(connection, tables):
+	"""
+	Stream the buttons placed on each page, ordered by page.
+
+	Buttons reach the grid through Page -> ElementReference -> ElementPlacement.
+	A page can have several layouts (PageLayoutId), one per screen size; only the
+	first layout of each page is used so buttons aren't counted more than once.
+	A button can have several ButtonPageLink rows; only its first (lowest rowid)
+	is used, so each placed button comes back once. Both choices are made in SQL.
+
+	:return: Iterator of (page id, label, message, grid position, grid span, target page id or None).
+	"""
+	query = f"""
+	WITH first_layout AS (
+		SELECT er.PageId AS PageId, MIN(ep.PageLayoutId) AS PageLayoutId
+		FROM ElementPlacement AS ep
+		{join_on(tables, "ElementReference", "Id", "er", "ep.ElementReferenceId")}
+		GROUP BY er.PageId
+	),
+	first_link AS (
+		SELECT ButtonId, MIN(rowid) AS LinkRowId
+		FROM ButtonPageLink
+		GROUP BY ButtonId
+	)
+	SELECT
+		er.PageId,
+		b.Label,
+		b.Message,
+		ep.GridPosition,
+		ep.GridSpan,
+		target.Id
+	FROM first_layout AS fl
+	{join_on(tables, "ElementReference", "PageId", "er", "fl.PageId")}
+	{join_on(tables, "ElementPlacement", "ElementReferenceId", "ep", "er.Id")} AND ep.PageLayoutId = fl.PageLayoutId
+	{join_on(tables, "Button", "ElementReferenceId", "b", "er.Id")}
+	LEFT JOIN first_link AS link ON link.ButtonId = b.Id
+	LEFT JOIN ButtonPageLink AS bpl ON bpl.rowid = link.LinkRowId
+	{join_on(tables, "Page", "UniqueId", "target", "bpl.PageUniqueId", "LEFT JOIN")}
+	ORDER BY er.PageId
+	"""
+	return iter_rows(connection.execute(query))
+
+def get_home_page_unique_id(connection):
+	""" The pageset's home page from PageSetProperties, if the database has it. """
 	cursor = connection.cursor()
-	
-	# SQL query to extract data related to cells (buttons) and their placement
-	query = """
-	SELECT 
-		b.Label AS text, 
-		bp.GridPosition AS position,
-		p.Title AS grid_name
-	FROM Button AS b
-	JOIN ButtonPlacement AS bp ON b.Id = bp.ButtonId
-	JOIN Page AS p ON bp.PageLayoutId = p.Id
+	cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'PageSetProperties'")
+	if cursor.fetchone() is None:
+		return None
+	try:
+		cursor.execute("SELECT DefaultHomePageUniqueId FROM PageSetProperties")
+	except sqlite3.OperationalError:
+		return None
+	row = cursor.fetchone()
+	return row[0] if row else None
+
+def build_navigation_map_and_find_relevant_pages(connection, home_page=None):
+	"""
+	The Snap counterpart of GridAnalysis.build_navigation_map_and_find_relevant_files.
+
+	The page graph comes from SQL first, so the home-page search only holds
+	page ids; buttons are then streamed page by page and only those on pages
+	reachable from home are kept, as OBFPage records that GridAnalysis scores
+	exactly like Grid 3 pages.
+
+	:param home_page: Title of the home page (default: the pageset's home page, else the first page).
+	:return: Tuple (home page name, navigation map of page name -> linked page names, list of OBFPage).
 	"""
-	cursor.execute(query)
-	cell_data = cursor.fetchall()
-
-	# Convert data into a list of dictionaries
-	cell_data_list = []
-	for text, position, grid_name in cell_data:
-		cell_data_dict = {
-			'text': text,
-			'grid_name': grid_name,
-			'position': position,
-			# Additional fields like 'effort_score', 'hits', etc. can be calculated or added here
-			# 'effort_score': calculate_effort_score(...),
-			# 'hits': ...,
-			# ...
-		}
-		cell_data_list.append(cell_data_dict)
-
-	return cell_data_list
-	
-def analyze_snap_data(button_page_data):
-	""" Analyze the extracted data and return statistics or insights. """
-	# Example analysis: Count of buttons per page
-	page_button_count = {}
-	for label, page_title in button_page_data:
-		if page_title in page_button_count:
-			page_button_count[page_title] += 1
-		else:
-			page_button_count[page_title] = 1
-
-	# More complex analysis can be added here
-	# ...
-
-	return page_button_count
-
-
-def process_snap_gridset(file_path):
-	""" Process a Snap gridset file and return statistics. """
-	with connect_to_database(file_path) as connection:
-		button_page_data = extract_data_from_snap_db(connection)
-		statistics = analyze_snap_data(button_page_data)
-	
-	return statistics
+	tables = prepare_join_tables(connection)
+	pages = extract_pages_from_snap_db(connection)
+
+	# Titles needn't be unique; add the id to repeats so pages stay distinct
+	names = {}
+	taken = set()
+	by_unique_id = {}
+	for page_id, (unique_id, title, _, _) in pages.items():
+		name = (title or str(page_id)).strip()
+		if name in taken:
+			name = f"{name} [{page_id}]"
+		taken.add(name)
+		names[page_id] = name
+		by_unique_id[unique_id] = page_id
+
+	if home_page is not None:
+		home_id = next((page_id for page_id, name in names.items() if name == home_page), None)
+	else:
+		home_id = by_unique_id.get(get_home_page_unique_id(connection))
+	if home_id is None:
+		home_id = min(pages) if pages else None
+	if home_id is None:
+		return None, {}, []
+
+	links = {}
+	for source, target in extract_page_links_from_snap_db(connection, tables):
+		links.setdefault(source, []).append(target)
+
+	navigation_map = {}
+	reachable = [home_id]
+	seen = {home_id}
+	queue = deque([home_id])
+	while queue:
+		page_id = queue.popleft()
+		for target in links.get(page_id, []):
+			navigation_map.setdefault(names[page_id], []).append(names[target])
+			if target not in seen:
+				seen.add(target)
+				reachable.append(target)
+				queue.append(target)
+
+	page_cells = {}
+	for page_id, label, message, grid_position, grid_span, target in extract_cell_data_from_snap_db(connection, tables):
+		if page_id not in seen:
+			continue
+		row, col = parse_pair(grid_position, (0, 0))
+		row_span, col_span = parse_pair(grid_span, (1, 1))
+		page_cells.setdefault(page_id, []).append({
+			'Text': (message or label or '').strip(),
+			'X': col,
+			'Y': row,
+			'Span': (max(col_span, 1), max(row_span, 1)),
+			'LoadBoard': names[target] if target is not None else None,
+		})
+
+	relevant_pages = []
+	for page_id in reachable:
+		_, _, rows, cols = pages[page_id]
+		cells = page_cells.pop(page_id, [])
+		relevant_pages.append(OBFPage(names[page_id], rows, cols, len(cells), cells))
+	return names[home_id], navigation_map, relevant_pages
+
 
 def main():
 	parser = argparse.ArgumentParser(description='Analyse the language content of Snap SPS files.')
 	parser.add_argument('snap', type=str, help='Path to the first .sps file')
+	parser.add_argument('--home', type=str, help='Override the home page title', default=None)
+	parser.add_argument('--output', type=str, help='output directory for csv files', default='.')
 	args = parser.parse_args()
+	screen_dimensions = DEFAULT_PROFILE.screen_dimensions
+	scan_time_per_unit = DEFAULT_PROFILE.scan_time_per_unit
+	selection_time = DEFAULT_PROFILE.selection_time
 
 	# Main logic for processing a Snap gridset
-	snap_stats = process_snap_gridset(args.snap)
+	connection = connect_to_database(args.snap)
+	try:
+		home_page, navigation_map, relevant_pages = build_navigation_map_and_find_relevant_pages(connection, args.home)
+	finally:
+		connection.close()
+
+	# Same columns as GridAnalysis.process_gridset_for_csv, so Snap and Grid 3 CSVs line up
+	snap_data = GridAnalysis.process_gridset_for_csv(relevant_pages, navigation_map, screen_dimensions, home_page, scan_time_per_unit, selection_time)
+	if snap_data:
+		save_to_csv(snap_data, os.path.join(args.output, 'snap_data.csv'))
+
+	results = GridAnalysis.analyze_single_gridset(relevant_pages, navigation_map, screen_dimensions, home_page, scan_time_per_unit, selection_time)
+	for key, value in results.items():
+		print(f"{key}: {value}")
 
 if __name__ == "__main__":
 	main()
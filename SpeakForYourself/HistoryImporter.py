@@ -0,0 +1,257 @@
+"""
+Importer for Speak for Yourself history exports (HistoryData.csv).
+
+Each row is a word or message, what was done with it and when:
+
+	"Word or Utterance","Operation","Date and Time"
+	"play","Selected word","Feb 17, 2021 9:57:37 AM"
+	"play go","Deleted message","Feb 17, 2021 9:59:18 AM"
+	"Babble on","Mar 23, 2021 2:14:15 PM"
+
+(toggles such as Babble on/off have no word column). Rows are streamed into
+columns - epoch seconds (the device's local clock, stored as if it were UTC),
+a word id into an interned word list and an operation code - so a history can
+be filtered by time window without building an object per event.
+
+	python HistoryImporter.py HistoryData.csv --start 2021-02-17 --end 2021-02-18
+"""
+import argparse
+import calendar
+import csv
+import datetime
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter, namedtuple
+
+TIMESTAMP_FORMAT = '%b %d, %Y %I:%M:%S %p'
+MONTHS = {name: number for number, name in enumerate(calendar.month_abbr) if name}
+
+# Operations seen in exports; others get codes after these as they turn up
+OPERATIONS = ('Selected word', 'Deleted message', 'Spoke message', 'Selected QWERTY', 'Babble on', 'Babble off')
+
+HistoryEvent = namedtuple('HistoryEvent', ['time', 'word', 'operation'])
+
+
+class TimestampParser:
+	"""
+	Epoch seconds for "Feb 17, 2021 9:57:37 AM" timestamps.
+
+	The date ("Feb 17, 2021") and the time of day ("9:57:37 AM") are each looked
+	up in a cache, so a timestamp usually costs two dictionary lookups. Anything
+	that doesn't fit the fixed format falls back to strptime with TIMESTAMP_FORMAT,
+	and a timestamp neither can read gives None.
+	"""
+
+	def __init__(self):
+		self.midnights = {}
+		self.times_of_day = {}
+
+	def __call__(self, text):
+		split = text.find(',') + 6  # after ", YYYY"
+		try:
+			return self.midnights[text[:split]] + self.times_of_day[text[split + 1:]]
+		except KeyError:
+			return self.parse(text, split)
+
+	def parse(self, text, split):
+		date, clock = text[:split], text[split + 1:]
+		try:
+			month, day, year = date.replace(',', '').split(' ')
+			midnight = calendar.timegm((int(year), MONTHS[month], int(day), 0, 0, 0))
+			time_of_day, meridiem = clock.split(' ')
+			hours, minutes, seconds = (int(part) for part in time_of_day.split(':'))
+			if meridiem not in ('AM', 'PM') or not (1 <= hours <= 12 and 0 <= minutes < 60 and 0 <= seconds < 60):
+				raise ValueError(text)
+		except (ValueError, KeyError):
+			try:
+				return calendar.timegm(datetime.datetime.strptime(text, TIMESTAMP_FORMAT).timetuple())
+			except ValueError:
+				return None
+		self.midnights[date] = midnight
+		self.times_of_day[clock] = (hours % 12 + (12 if meridiem == 'PM' else 0)) * 3600 + minutes * 60 + seconds
+		return midnight + self.times_of_day[clock]
+
+
+def parse_rows(lines, parse_timestamp=None):
+	"""
+	Yield (epoch seconds, word or None, operation) for every row of a HistoryData.csv export.
+
+	The header and blank lines are passed over. A row with the wrong number of
+	columns or a timestamp that can't be read yields None instead, so callers
+	can skip it and count it.
+
+	:param lines: Any iterable of lines, e.g. a file opened with newline=''.
+	"""
+	parse_timestamp = parse_timestamp or TimestampParser()
+	for row in csv.reader(lines):
+		if len(row) == 3:
+			word, operation, timestamp = row
+		elif len(row) == 2:
+			word = None
+			operation, timestamp = row
+		else:
+			if row:
+				yield None
+			continue
+		if timestamp == 'Date and Time':
+			continue
+		seconds = parse_timestamp(timestamp)
+		yield None if seconds is None else (seconds, word, operation)
+
+
+def iter_history(lines, parse_timestamp=None):
+	"""Yield a HistoryEvent for every readable row of a HistoryData.csv export (see parse_rows)."""
+	for row in parse_rows(lines, parse_timestamp):
+		if row is not None:
+			yield HistoryEvent(*row)
+
+
+class HistoryColumns:
+	"""
+	Events as columns of epoch seconds, word ids (-1 for none) and operation codes.
+
+	:ivar skipped: Number of rows load passed over because they couldn't be read.
+	"""
+
+	def __init__(self):
+		self.times = array('q')
+		self.words = array('i')
+		self.operations = array('b')
+		self.word_list = []
+		self.word_ids = {}
+		self.operation_list = list(OPERATIONS)
+		self.operation_codes = {operation: code for code, operation in enumerate(OPERATIONS)}
+		self.ordered = True
+		self.skipped = 0
+
+	def __len__(self):
+		return len(self.times)
+
+	def add(self, event):
+		self._append(event.time, event.word, event.operation)
+
+	def _append(self, seconds, word, operation):
+		"""Append one event: intern its word and operation and note whether time order still holds."""
+		if word is None:
+			word_id = -1
+		else:
+			word_id = self.word_ids.get(word)
+			if word_id is None:
+				word_id = self.word_ids[word] = len(self.word_list)
+				self.word_list.append(word)
+		code = self.operation_codes.get(operation)
+		if code is None:
+			code = self.operation_codes[operation] = len(self.operation_list)
+			self.operation_list.append(operation)
+		if self.times and seconds < self.times[-1]:
+			self.ordered = False
+		self.times.append(seconds)
+		self.words.append(word_id)
+		self.operations.append(code)
+
+	def extend(self, events):
+		for event in events:
+			self.add(event)
+		return self
+
+	def load(self, lines, parse_timestamp=None):
+		"""Append the rows of a HistoryData.csv export (from parse_rows, without building events), counting unreadable ones in skipped."""
+		append = self._append
+		for row in parse_rows(lines, parse_timestamp):
+			if row is None:
+				self.skipped += 1
+				continue
+			append(*row)
+		return self
+
+	def sort(self):
+		"""Put the events in time order (exports are, but merged files may not be)."""
+		if self.ordered:
+			return
+		order = sorted(range(len(self.times)), key=self.times.__getitem__)
+		self.times = array('q', (self.times[i] for i in order))
+		self.words = array('i', (self.words[i] for i in order))
+		self.operations = array('b', (self.operations[i] for i in order))
+		self.ordered = True
+
+	def window(self, start=None, end=None):
+		"""The index range of events with start <= time < end (either may be None for open-ended)."""
+		self.sort()
+		first = 0 if start is None else bisect_left(self.times, start)
+		last = len(self.times) if end is None else bisect_left(self.times, end)
+		return range(first, max(first, last))
+
+	def events(self, start=None, end=None):
+		"""Yield the HistoryEvents in a time window."""
+		for i in self.window(start, end):
+			word = self.words[i]
+			yield HistoryEvent(self.times[i], self.word_list[word] if word >= 0 else None, self.operation_list[self.operations[i]])
+
+	def operation_counts(self, start=None, end=None):
+		indices = self.window(start, end)
+		counts = Counter(self.operations[indices.start:indices.stop])
+		return {self.operation_list[code]: count for code, count in counts.most_common()}
+
+	def word_counts(self, operation='Selected word', start=None, end=None):
+		"""How often each word was used in a time window, most used first."""
+		code = self.operation_codes.get(operation)
+		indices = self.window(start, end)
+		counts = Counter(word for word, op in zip(self.words[indices.start:indices.stop], self.operations[indices.start:indices.stop]) if op == code and word >= 0)
+		return [(self.word_list[word], count) for word, count in counts.most_common()]
+
+
+def read_history(file_paths):
+	"""Load one or more HistoryData.csv files into a HistoryColumns, in time order."""
+	columns = HistoryColumns()
+	parse_timestamp = TimestampParser()
+	for file_path in file_paths:
+		with open(file_path, newline='', encoding='utf-8-sig') as f:
+			columns.load(f, parse_timestamp)
+	columns.sort()
+	return columns
+
+
+def format_time(seconds):
+	return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def parse_date_argument(text):
+	"""Epoch seconds for an ISO date or date-time given on the command line."""
+	if text is None:
+		return None
+	return calendar.timegm(datetime.datetime.fromisoformat(text).timetuple())
+
+
+def main():
+	parser = argparse.ArgumentParser(description='Load Speak for Yourself history exports and summarise them.')
+	parser.add_argument('files', nargs='+', help='HistoryData.csv files')
+	parser.add_argument('--start', type=str, help='Only events from this date/time on (e.g. 2021-02-17)', default=None)
+	parser.add_argument('--end', type=str, help='Only events before this date/time (e.g. 2021-03-01)', default=None)
+	parser.add_argument('--output', type=str, help='CSV file to write the events in the window to', default=None)
+	args = parser.parse_args()
+
+	started = time.perf_counter()
+	columns = read_history(args.files)
+	elapsed = time.perf_counter() - started
+	print(f"Loaded {len(columns)} events ({len(columns.word_list)} distinct words) in {elapsed * 1000:.1f} ms", file=sys.stderr)
+	if columns.skipped:
+		print(f"Skipped {columns.skipped} rows that couldn't be read", file=sys.stderr)
+
+	start, end = parse_date_argument(args.start), parse_date_argument(args.end)
+	window = columns.window(start, end)
+	if window:
+		print(f"{len(window)} events from {format_time(columns.times[window.start])} to {format_time(columns.times[window.stop - 1])}")
+	print(f"Operations: {columns.operation_counts(start, end)}")
+	print(f"Most used words: {columns.word_counts(start=start, end=end)[:20]}")
+
+	if args.output:
+		with open(args.output, mode='w', newline='', encoding='utf-8') as file:
+			writer = csv.writer(file)
+			writer.writerow(['Word or Utterance', 'Operation', 'Date and Time'])
+			for event in columns.events(start, end):
+				writer.writerow([event.word or '', event.operation, format_time(event.time)])
+
+if __name__ == "__main__":
+	main()